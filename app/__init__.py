@@ -6,11 +6,19 @@ import warnings
 
 from flask import Flask
 
-from . import compat  # noqa: F401
+from . import cache, compat, security, serialization  # noqa: F401
 from .api import api_bp
 from .config import BaseConfig
 from .errors import register_error_handlers
 from .extensions import supabase_client
+from .services import (
+    availability_index,
+    fleet_calendar,
+    idempotency,
+    password_hasher,
+    payment_outbox,
+    token_revocation,
+)
 
 warnings.filterwarnings(
     "ignore",
@@ -43,6 +51,15 @@ def create_app(config_object: type[BaseConfig] = BaseConfig) -> Flask:
 def configure_extensions(app: Flask) -> None:
     """Inicializar las extensiones de la aplicacion."""
     supabase_client.init_app(app)
+    cache.init_app(app)
+    security.init_app(app)
+    availability_index.init_app(app)
+    fleet_calendar.init_app(app)
+    token_revocation.init_app(app)
+    password_hasher.init_app(app)
+    idempotency.init_app(app)
+    payment_outbox.init_app(app)
+    serialization.init_app(app)
 
 
 def register_blueprints(app: Flask) -> None:
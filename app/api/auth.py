@@ -6,12 +6,15 @@ from http import HTTPStatus
 
 from flask import jsonify, request
 
+from app.api.decorators import require_auth, require_roles
 from app.services import (
     AuthService,
     DatosInvalidosError,
     UserService,
     UsuarioExistenteError,
     CredencialesInvalidasError,
+    RefreshTokenInvalidoError,
+    ServicioSaturadoError,
 )
 
 from . import api_bp
@@ -42,6 +45,8 @@ def registrar_usuario():
         return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
     except UsuarioExistenteError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.CONFLICT
+    except ServicioSaturadoError as exc:
+        return _respuesta_saturada(exc)
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
@@ -67,7 +72,72 @@ def iniciar_sesion():
         resultado = auth_service.autenticar(email=email, password=password)
     except CredencialesInvalidasError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.UNAUTHORIZED
+    except ServicioSaturadoError as exc:
+        return _respuesta_saturada(exc)
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
     return jsonify(resultado)
+
+
+@api_bp.post("/auth/refresh")
+def renovar_sesion():
+    """Emitir un nuevo token de acceso a partir de un token de renovacion."""
+    payload = request.get_json(silent=True) or {}
+
+    try:
+        resultado = auth_service.renovar(payload.get("refresh_token") or "")
+    except RefreshTokenInvalidoError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.UNAUTHORIZED
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+
+    return jsonify(resultado)
+
+
+@api_bp.post("/auth/logout")
+def cerrar_sesion():
+    """Revocar el token de renovacion, los emitidos a partir de el y el token de acceso enviado."""
+    payload = request.get_json(silent=True) or {}
+    refresh_token = payload.get("refresh_token")
+    if not refresh_token:
+        return jsonify({"error": "Debes proporcionar el token de renovacion."}), HTTPStatus.BAD_REQUEST
+
+    auth_header = request.headers.get("Authorization", "")
+    access_token = auth_header.split(" ", 1)[1].strip() if auth_header.startswith("Bearer ") else None
+    try:
+        auth_service.cerrar_sesion(refresh_token, access_token)
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+
+    return "", HTTPStatus.NO_CONTENT
+
+
+@api_bp.patch("/admin/users/<user_id>/role")
+@require_auth
+@require_roles("administrador")
+def cambiar_rol_usuario(user_id: str):
+    """Cambiar el rol de un usuario; su perfil en cache y sus tokens sin estado se invalidan."""
+    payload = request.get_json(silent=True) or {}
+    rol = payload.get("rol")
+    if not rol:
+        return jsonify({"error": "Debes indicar el rol deseado."}), HTTPStatus.BAD_REQUEST
+
+    try:
+        usuario = user_service.cambiar_rol(user_id, rol)
+    except DatosInvalidosError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+
+    if usuario is None:
+        return jsonify({"error": "Usuario no encontrado."}), HTTPStatus.NOT_FOUND
+
+    return jsonify({"id": usuario.id, "email": usuario.email, "nombre": usuario.nombre, "rol": usuario.rol})
+
+
+def _respuesta_saturada(exc: ServicioSaturadoError):
+    respuesta = jsonify({"error": str(exc)})
+    respuesta.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+    respuesta.headers["Retry-After"] = str(exc.retry_after)
+    return respuesta
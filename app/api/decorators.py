@@ -1,15 +1,28 @@
 """Decoradores reutilizables para los endpoints de la API."""
 
+import hashlib
 from functools import wraps
+from http import HTTPStatus
 from typing import Any, Callable, Iterable, TypeVar
 
-from flask import g, jsonify, request
+from flask import current_app, g, jsonify, request
 
+from app.cache import obtener_cache
 from app.repositories import UserRepository
 from app.security import JWTError, decode_token
+from app.services.idempotency import (
+    ClaveReutilizadaError,
+    RespuestaGuardada,
+    SolicitudEnCursoError,
+    obtener_almacen,
+)
+from app.services.token_revocation import obtener_lista_revocacion
 
 F = TypeVar("F", bound=Callable[..., Any])
 
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+_MAX_LONGITUD_CLAVE = 255
+
 
 class PermisoDenegadoError(Exception):
     """Se lanza cuando un usuario no posee el rol requerido."""
@@ -37,16 +50,30 @@ def require_auth(func: F) -> F:
         if not user_id:
             return jsonify({"error": "Token sin identificador de usuario."}), 401
 
-        user_repo = UserRepository()
-        try:
-            usuario = user_repo.obtener_por_id(user_id)
-        except RuntimeError as exc:
-            return jsonify({"error": str(exc)}), 503
+        usuario = None
+        if current_app.config.get("JWT_STATELESS_AUTH") and payload.get("rol"):
+            revocaciones = obtener_lista_revocacion()
+            revocado = revocaciones.esta_revocado(payload) if revocaciones is not None else None
+            if revocado:
+                return jsonify({"error": "El token fue revocado."}), 401
+            if revocado is False:
+                usuario = _usuario_desde_claims(payload)
+
+        cache = obtener_cache("usuarios")
+        if usuario is None and cache is not None:
+            usuario = cache.get(user_id)
         if usuario is None:
-            return jsonify({"error": "Usuario no encontrado."}), 401
-
-        usuario.pop("password_hash", None)
-        g.current_user = usuario
+            user_repo = UserRepository()
+            try:
+                usuario = user_repo.obtener_por_id(user_id)
+            except RuntimeError as exc:
+                return jsonify({"error": str(exc)}), 503
+            if usuario is None:
+                return jsonify({"error": "Usuario no encontrado."}), 401
+            if cache is not None:
+                cache.set(user_id, usuario)
+
+        g.current_user = dict(usuario)
         g.current_token_payload = payload
 
         return func(*args, **kwargs)
@@ -54,6 +81,15 @@ def require_auth(func: F) -> F:
     return wrapper  # type: ignore[return-value]
 
 
+def _usuario_desde_claims(payload: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": str(payload["sub"]),
+        "email": payload.get("email"),
+        "nombre": payload.get("nombre"),
+        "rol": payload["rol"],
+    }
+
+
 def require_roles(*roles: Iterable[str]) -> Callable[[F], F]:
     """Asegurar que el usuario autenticado posee alguno de los roles dados."""
 
@@ -75,3 +111,89 @@ def require_roles(*roles: Iterable[str]) -> Callable[[F], F]:
         return wrapper  # type: ignore[return-value]
 
     return decorator
+
+
+def idempotente(func: F) -> F:
+    """Repetir la respuesta original cuando se reintenta con la misma ``Idempotency-Key``.
+
+    Va despues de ``require_auth``: la clave se guarda por usuario y endpoint
+    junto con una huella del cuerpo. Un reintento recibe el mismo status y
+    cuerpo con ``Idempotent-Replayed: true``; si la primera solicitud sigue en
+    curso, el reintento la espera. Las respuestas 5xx y las excepciones no se
+    guardan para que el cliente pueda reintentar. Sin encabezado el endpoint se
+    comporta como siempre.
+    """
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any):
+        clave = request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+        almacen = obtener_almacen()
+        if not clave or almacen is None:
+            return func(*args, **kwargs)
+        if len(clave) > _MAX_LONGITUD_CLAVE:
+            return (
+                jsonify({"error": f"{IDEMPOTENCY_HEADER} admite como maximo {_MAX_LONGITUD_CLAVE} caracteres."}),
+                HTTPStatus.BAD_REQUEST,
+            )
+
+        usuario = getattr(g, "current_user", None) or {}
+        clave_completa = f"{usuario.get('id')}:{request.method}:{request.path}:{clave}"
+        huella = _huella_solicitud()
+        ttl = float(current_app.config.get("IDEMPOTENCY_TTL_SECONDS", 86400))
+        espera = float(current_app.config.get("IDEMPOTENCY_WAIT_SECONDS", 10))
+
+        try:
+            guardada = almacen.iniciar(clave_completa, huella, ttl=ttl, espera=espera)
+        except ClaveReutilizadaError as exc:
+            return jsonify({"error": str(exc)}), HTTPStatus.UNPROCESSABLE_ENTITY
+        except SolicitudEnCursoError as exc:
+            respuesta = jsonify({"error": str(exc)})
+            respuesta.status_code = HTTPStatus.CONFLICT
+            respuesta.headers["Retry-After"] = "1"
+            return respuesta
+        if guardada is not None:
+            respuesta = current_app.response_class(
+                guardada.cuerpo,
+                status=guardada.status,
+                mimetype=guardada.mimetype,
+                headers=list(guardada.headers),
+            )
+            respuesta.headers["Idempotent-Replayed"] = "true"
+            return respuesta
+
+        try:
+            respuesta = current_app.make_response(func(*args, **kwargs))
+        except BaseException:
+            almacen.abandonar(clave_completa)
+            raise
+        if respuesta.status_code >= 500 or respuesta.is_streamed:
+            almacen.abandonar(clave_completa)
+            return respuesta
+        encabezados = tuple((nombre, valor) for nombre, valor in respuesta.headers.items() if nombre == "Location")
+        almacen.completar(
+            clave_completa,
+            RespuestaGuardada(respuesta.status_code, respuesta.get_data(), respuesta.mimetype, encabezados),
+            ttl=ttl,
+        )
+        return respuesta
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _huella_solicitud() -> str:
+    """Resumen del cuerpo para detectar una clave reutilizada con otros datos."""
+    digest = hashlib.sha256()
+    if request.mimetype != "multipart/form-data":
+        # get_data(cache=True) conserva el cuerpo para que el endpoint lo vuelva a leer.
+        digest.update(request.get_data(cache=True))
+        return digest.hexdigest()
+    # El separador multipart cambia en cada envio: se resumen los campos ya parseados.
+    for nombre, valor in sorted(request.form.items(multi=True)):
+        digest.update(f"{nombre}={valor}\x1f".encode("utf-8"))
+    for nombre, archivo in sorted(request.files.items(multi=True), key=lambda par: (par[0], par[1].filename or "")):
+        digest.update(f"{nombre}:{archivo.filename}\x1f".encode("utf-8"))
+        posicion = archivo.stream.tell()
+        for bloque in iter(lambda: archivo.stream.read(64 * 1024), b""):
+            digest.update(bloque)
+        archivo.stream.seek(posicion)
+    return digest.hexdigest()
@@ -7,7 +7,11 @@ from typing import Any, Dict
 
 from flask import current_app, jsonify
 
+from app import cache
+from app.api.decorators import require_auth, require_roles
 from app.extensions import supabase_client
+from app.services.password_hasher import obtener_hasher
+from app.services.payment_outbox import obtener_procesador_pagos
 
 from . import api_bp
 
@@ -25,3 +29,19 @@ def health_check() -> Any:
         },
     }
     return jsonify(response)
+
+
+@api_bp.get("/health/metrics")
+@require_auth
+@require_roles("administrador")
+def health_metrics() -> Any:
+    """Exponer contadores internos de las caches, del hashing de contrasenas y de los cobros."""
+    hasher = obtener_hasher()
+    procesador = obtener_procesador_pagos()
+    return jsonify(
+        {
+            "caches": cache.estadisticas(),
+            "hash_contrasenas": hasher.metricas() if hasher is not None else None,
+            "cobros_pendientes": procesador.metricas() if procesador is not None else None,
+        }
+    )
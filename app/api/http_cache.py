@@ -0,0 +1,39 @@
+"""Validacion condicional (ETag / If-None-Match) para endpoints publicos de lectura."""
+
+import hashlib
+from typing import Any, Callable, Iterable
+
+from flask import Response, current_app, request
+
+
+def etag_de(*partes: Any) -> str:
+    """ETag fuerte a partir de valores que identifican una version del recurso."""
+    digest = hashlib.sha256()
+    for parte in partes:
+        digest.update(parte if isinstance(parte, bytes) else str(parte).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:32]
+
+
+def responder_con_etag(
+    etag: str,
+    construir: Callable[[], Any],
+    *,
+    max_age: int,
+    vary: Iterable[str] = ("Accept-Encoding",),
+) -> Response:
+    """Responder ``304`` si el cliente ya tiene ``etag``; si no, construir la respuesta.
+
+    ``construir`` solo se invoca cuando hace falta el cuerpo, de modo que un
+    ``304`` no serializa nada. Ambas respuestas llevan ``ETag``,
+    ``Cache-Control`` publico (apto para una CDN) y ``Vary``.
+    """
+    if request.if_none_match.contains(etag):
+        respuesta = current_app.response_class(status=304)
+    else:
+        respuesta = current_app.make_response(construir())
+    respuesta.set_etag(etag)
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = max_age
+    respuesta.vary.update(vary)
+    return respuesta
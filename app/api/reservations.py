@@ -2,12 +2,12 @@ from __future__ import annotations
 
 """Endpoints relacionados con las reservas de los usuarios."""
 
-from dataclasses import asdict
 from http import HTTPStatus
 
-from flask import jsonify, g, request
+from flask import jsonify, g, request, url_for
 
-from app.api.decorators import require_auth, require_roles
+from app.api.decorators import idempotente, require_auth, require_roles
+from app.serialization import serializar, serializar_lista
 from app.services import ReservationService
 
 from . import api_bp
@@ -31,8 +31,9 @@ def listar_reservas():
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
     respuesta = {
-        "items": [asdict(reserva) for reserva in resultado["items"]],
+        "items": serializar_lista(resultado["items"]),
         "total": resultado["total"],
+        "total_strategy": resultado.get("total_strategy"),
         "limit": limit,
         "offset": offset,
     }
@@ -68,8 +69,8 @@ def obtener_reserva(reserva_id: str):
     vehiculo = detalle.get("vehicle")
     return jsonify(
         {
-            "reserva": asdict(detalle["reserva"]),
-            "vehicle": asdict(vehiculo) if vehiculo is not None else None,
+            "reserva": serializar(detalle["reserva"]),
+            "vehicle": serializar(vehiculo) if vehiculo is not None else None,
         }
     )
 
@@ -77,6 +78,7 @@ def obtener_reserva(reserva_id: str):
 @api_bp.post("/reservations")
 @require_auth
 @require_roles("cliente", "administrador")
+@idempotente
 def crear_reserva():
     """Crear una reserva para el usuario autenticado."""
     usuario = g.current_user
@@ -98,14 +100,45 @@ def crear_reserva():
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
     respuesta = {
-        "reserva": asdict(resultado["reserva"]),
-        "pago": asdict(resultado["pago"]),
+        "reserva": serializar(resultado["reserva"]),
+        "pago": serializar(resultado["pago"]),
     }
     monto = respuesta["pago"].get("amount")
     if monto is not None:
         respuesta["pago"]["amount"] = str(monto)
 
-    return jsonify(respuesta), HTTPStatus.CREATED
+    if resultado["pago"].status != ReservationService.PAGO_PENDIENTE:
+        return jsonify(respuesta), HTTPStatus.CREATED
+    # Cobro diferido: la reserva ya existe y el pago se sigue en Location.
+    ubicacion = url_for("api.obtener_pago_reserva", reserva_id=resultado["reserva"].id)
+    return jsonify(respuesta), HTTPStatus.ACCEPTED, {"Location": ubicacion}
+
+
+@api_bp.get("/reservations/<reserva_id>/payment")
+@require_auth
+@require_roles("cliente", "administrador")
+def obtener_pago_reserva(reserva_id: str):
+    """Consultar el estado del pago de una reserva (pendiente, pagado, fallido...)."""
+    usuario = g.current_user
+
+    try:
+        pago = reservation_service.obtener_pago(
+            reserva_id,
+            usuario["id"],
+            is_admin=str(usuario.get("rol", "")).lower() == "administrador",
+        )
+    except ValueError as exc:
+        mensaje = str(exc)
+        if "permiso" in mensaje.lower():
+            return jsonify({"error": mensaje}), HTTPStatus.FORBIDDEN
+        return jsonify({"error": mensaje}), HTTPStatus.NOT_FOUND
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+
+    respuesta = serializar(pago)
+    if respuesta.get("amount") is not None:
+        respuesta["amount"] = str(respuesta["amount"])
+    return jsonify({"pago": respuesta})
 
 
 @api_bp.post("/reservations/<reserva_id>/cancel")
@@ -116,7 +149,7 @@ def cancelar_reserva(reserva_id: str):
     usuario = g.current_user
 
     try:
-        reserva = reservation_service.cancelar_reserva(
+        resultado = reservation_service.cancelar_reserva(
             reserva_id,
             usuario["id"],
             is_admin=usuario["rol"].lower() == "administrador",
@@ -126,4 +159,6 @@ def cancelar_reserva(reserva_id: str):
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
-    return jsonify(asdict(reserva))
+    # Los campos de la reserva siguen en la raiz; el pago reembolsado va en "pago".
+    pago = resultado.get("pago")
+    return jsonify({**serializar(resultado["reserva"]), "pago": serializar(pago) if pago is not None else None})
@@ -2,14 +2,15 @@ from __future__ import annotations
 
 """Endpoints relacionados con vehiculos."""
 
-from dataclasses import asdict
 from datetime import datetime, date
 from http import HTTPStatus
 from typing import Iterable, Optional
 
-from flask import g, jsonify, request
+from flask import current_app, g, jsonify, request
 
-from app.api.decorators import require_auth, require_roles
+from app.api.decorators import idempotente, require_auth, require_roles
+from app.api.http_cache import etag_de, responder_con_etag
+from app.serialization import respuesta_con_items_crudos, serializar, serializar_lista
 from app.services import ReservationService, VehicleService
 
 from . import api_bp
@@ -17,6 +18,8 @@ from . import api_bp
 vehicle_service = VehicleService()
 reservation_service = ReservationService()
 
+_MAX_RANGOS_DISPONIBILIDAD = 20
+
 
 def _parse_positive_int(value: str | None, default: int) -> int:
     try:
@@ -44,6 +47,38 @@ def _parse_date(value: Optional[str]) -> Optional[date]:
         raise ValueError("Las fechas deben tener el formato AAAA-MM-DD.") from exc
 
 
+def _parse_campos(value: Optional[str], default: Optional[tuple[str, ...]]) -> Optional[tuple[str, ...]]:
+    """Interpretar ``fields=``: lista separada por comas, o ``all`` para el registro completo."""
+    if value is None or not value.strip():
+        return default
+    if value.strip().lower() in {"all", "*"}:
+        return None
+    return tuple(campo.strip() for campo in value.split(",") if campo.strip())
+
+
+def _serializar_vehiculos(vehicles, campos: Optional[tuple[str, ...]]) -> list[dict]:
+    if campos is None:
+        return serializar_lista(vehicles)
+    return serializar_lista(vehicles, ("id", "price_per_day", *campos))
+
+
+def _max_age_vehiculos() -> int:
+    return int(current_app.config.get("VEHICLE_HTTP_MAX_AGE_SECONDS", 30))
+
+
+def _responder_pagina(resultado: dict, campos: Optional[tuple[str, ...]]):
+    envoltura = {
+        "total": resultado["total"],
+        "total_strategy": resultado.get("total_strategy"),
+        "limit": resultado["limit"],
+        "offset": resultado["offset"],
+        "next_cursor": resultado.get("next_cursor"),
+    }
+    if isinstance(resultado["items"], bytes):
+        return respuesta_con_items_crudos(resultado["items"], **envoltura)
+    return jsonify({"items": _serializar_vehiculos(resultado["items"], campos), **envoltura})
+
+
 def _obtener_payload(*claves: str, default: Optional[str] = None) -> Optional[str]:
     """Obtener un valor desde form-data o JSON usando varios alias."""
     for clave in claves:
@@ -82,11 +117,32 @@ def _obtener_archivos(claves: Iterable[str]) -> list:
 def list_vehicle_cities():
     """Obtener el catalogo de ciudades disponibles para filtros."""
     try:
-        ciudades = vehicle_service.listar_ciudades()
+        catalogo = vehicle_service.obtener_catalogo_ciudades()
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+
+    ciudades = catalogo["ciudades"]
+    return responder_con_etag(
+        str(catalogo["etag"]),
+        lambda: jsonify({"items": [ciudad["nombre"] for ciudad in ciudades], "ciudades": ciudades}),
+        max_age=int(current_app.config.get("CITY_CATALOG_MAX_AGE_SECONDS", 300)),
+    )
+
+
+@api_bp.get("/vehicles/cities/suggest")
+def suggest_vehicle_cities():
+    """Autocompletar ciudades por prefijo sin consultar la base en cada tecla."""
+    prefijo = request.args.get("q", "")
+    limit = min(max(_parse_positive_int(request.args.get("limit"), 8), 1), 10)
+    try:
+        sugerencias = vehicle_service.sugerir_ciudades(prefijo, limit)
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
-    return jsonify({"items": ciudades})
+    respuesta = jsonify({"q": prefijo, "items": sugerencias})
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = int(current_app.config.get("CITY_CATALOG_MAX_AGE_SECONDS", 300))
+    return respuesta
 
 
 @api_bp.get("/vehicles")
@@ -120,6 +176,8 @@ def list_vehicles():
     if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
         return jsonify({"error": "La fecha de inicio no puede ser posterior a la fecha final."}), HTTPStatus.BAD_REQUEST
 
+    campos = _parse_campos(request.args.get("fields"), VehicleService.CAMPOS_RESUMEN)
+
     try:
         resultado = vehicle_service.buscar_vehiculos(
             ciudad=ciudad,
@@ -130,17 +188,19 @@ def list_vehicles():
             fecha_fin=fecha_fin,
             limit=limit,
             offset=offset,
+            cursor=request.args.get("cursor"),
+            campos=campos,
+            crudo=current_app.config.get("VEHICLE_LIST_PASSTHROUGH", False),
         )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
-    respuesta = {
-        "items": [asdict(vehicle) for vehicle in resultado["items"]],
-        "total": resultado["total"],
-        "limit": resultado["limit"],
-        "offset": resultado["offset"],
-    }
-    return jsonify(respuesta)
+    etag = resultado.get("etag")
+    if etag is None:
+        return _responder_pagina(resultado, campos)
+    return responder_con_etag(str(etag), lambda: _responder_pagina(resultado, campos), max_age=_max_age_vehiculos())
 
 
 @api_bp.get("/vehicles/<vehicle_id>")
@@ -154,14 +214,80 @@ def get_vehicle(vehicle_id: str):
     if vehicle is None:
         return jsonify({"error": "Vehiculo no encontrado"}), HTTPStatus.NOT_FOUND
 
-    return jsonify(asdict(vehicle))
+    # updated_at lo mantiene un trigger (migracion 013); sin el se usa el contenido.
+    etag = etag_de("vehiculo", vehicle.id, vehicle.updated_at) if vehicle.updated_at else None
+    if etag is None:
+        etag = etag_de(current_app.json.dumps(serializar(vehicle)))
+    return responder_con_etag(etag, lambda: jsonify(serializar(vehicle)), max_age=_max_age_vehiculos())
+
+
+@api_bp.post("/vehicles/availability:batch")
+@require_auth
+@require_roles("cliente", "anfitrion", "administrador")
+def get_vehicles_availability_batch():
+    """Disponibilidad de varios vehiculos en una sola solicitud.
+
+    Recibe ``vehicle_ids`` y, opcionalmente, ``ranges`` (``start_date`` /
+    ``end_date``). Sin rangos responde las reservas de cada vehiculo como
+    ``GET /vehicles/<id>/availability``; con rangos responde ``libre`` con un
+    booleano por rango.
+    """
+    payload = request.get_json(silent=True) or {}
+    vehicle_ids = payload.get("vehicle_ids")
+    rangos = payload.get("ranges") or []
+    maximo = int(current_app.config.get("VEHICLE_AVAILABILITY_BATCH_MAX_IDS", 100))
+
+    if not isinstance(vehicle_ids, list) or not vehicle_ids:
+        return jsonify({"error": "Debes enviar vehicle_ids como una lista no vacia."}), HTTPStatus.BAD_REQUEST
+    if len(vehicle_ids) > maximo:
+        return jsonify({"error": f"Se admiten como maximo {maximo} vehiculos por solicitud."}), HTTPStatus.BAD_REQUEST
+    if (
+        not isinstance(rangos, list)
+        or len(rangos) > _MAX_RANGOS_DISPONIBILIDAD
+        or not all(isinstance(rango, dict) for rango in rangos)
+    ):
+        return (
+            jsonify({"error": f"ranges debe ser una lista de hasta {_MAX_RANGOS_DISPONIBILIDAD} objetos con start_date y end_date."}),
+            HTTPStatus.BAD_REQUEST,
+        )
+
+    try:
+        items = reservation_service.obtener_disponibilidad_vehiculos(
+            vehicle_ids,
+            rangos=[(rango.get("start_date"), rango.get("end_date")) for rango in rangos],
+            incluir_historial=bool(payload.get("include_past")),
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
+    except RuntimeError as exc:  # pragma: no cover - propagacion generica
+        return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+
+    return jsonify({"items": items})
 
 
 @api_bp.get("/vehicles/<vehicle_id>/availability")
 @require_auth
 @require_roles("cliente", "anfitrion", "administrador")
 def get_vehicle_availability(vehicle_id: str):
-    """Obtener las reservas existentes de un vehiculo para validar disponibilidad."""
+    """Obtener las reservas existentes de un vehiculo para validar disponibilidad.
+
+    Con ``mes=AAAA-MM`` responde un calendario compacto del mes con un caracter
+    por dia (``1`` ocupado, ``0`` libre) en lugar del listado de reservas.
+    """
+    mes = request.args.get("mes")
+    if mes:
+        try:
+            periodo = datetime.strptime(mes, "%Y-%m")
+        except ValueError:
+            return jsonify({"error": "El mes debe tener el formato AAAA-MM."}), HTTPStatus.BAD_REQUEST
+        try:
+            dias = reservation_service.obtener_calendario_mensual(vehicle_id, periodo.year, periodo.month)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
+        except RuntimeError as exc:  # pragma: no cover - propagacion generica
+            return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
+        return jsonify({"vehicle_id": vehicle_id, "mes": periodo.strftime("%Y-%m"), "dias": dias})
+
     include_past = request.args.get("include_past", "").lower() in {"1", "true", "yes"}
 
     try:
@@ -185,6 +311,7 @@ def get_vehicle_availability(vehicle_id: str):
 @api_bp.post("/vehicles")
 @require_auth
 @require_roles("administrador")
+@idempotente
 def create_vehicle():
     """Registrar un vehiculo y dejarlo pendiente de validacion."""
     usuario = getattr(g, "current_user", None) or {}
@@ -214,7 +341,7 @@ def create_vehicle():
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
-    return jsonify(asdict(vehicle)), HTTPStatus.CREATED
+    return jsonify(serializar(vehicle)), HTTPStatus.CREATED
 
 
 @api_bp.get("/admin/vehicles/<vehicle_id>")
@@ -230,7 +357,7 @@ def admin_get_vehicle(vehicle_id: str):
     if vehicle is None:
         return jsonify({"error": "Vehiculo no encontrado"}), HTTPStatus.NOT_FOUND
 
-    return jsonify(asdict(vehicle))
+    return jsonify(serializar(vehicle))
 
 
 @api_bp.get("/admin/vehicles")
@@ -242,6 +369,7 @@ def admin_list_vehicles():
     offset = _parse_positive_int(request.args.get("offset"), 0)
     estado = request.args.get("estado") or request.args.get("status")
     ciudad = request.args.get("ciudad")
+    campos = _parse_campos(request.args.get("fields"), None)
 
     try:
         resultado = vehicle_service.listar_admin(
@@ -249,20 +377,16 @@ def admin_list_vehicles():
             ciudad=ciudad,
             limit=limit,
             offset=offset,
+            cursor=request.args.get("cursor"),
+            campos=campos,
+            crudo=current_app.config.get("VEHICLE_LIST_PASSTHROUGH", False),
         )
     except ValueError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.BAD_REQUEST
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
-    return jsonify(
-        {
-            "items": [asdict(vehicle) for vehicle in resultado["items"]],
-            "total": resultado["total"],
-            "limit": resultado["limit"],
-            "offset": resultado["offset"],
-        }
-    )
+    return _responder_pagina(resultado, campos)
 
 
 @api_bp.patch("/vehicles/<vehicle_id>/status")
@@ -287,4 +411,4 @@ def update_vehicle_status(vehicle_id: str):
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), HTTPStatus.SERVICE_UNAVAILABLE
 
-    return jsonify(asdict(vehicle))
+    return jsonify(serializar(vehicle))
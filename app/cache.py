@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+"""Caches en memoria con expiracion y limite de tamano por aplicacion."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import current_app
+
+EXTENSION_KEY = "caches"
+
+# nombre de la cache -> (clave de configuracion del tamano, clave de configuracion del TTL)
+CACHE_SETTINGS: Dict[str, Tuple[str, str]] = {
+    "usuarios": ("AUTH_USER_CACHE_MAX_ENTRIES", "AUTH_USER_CACHE_TTL_SECONDS"),
+    "tokens": ("JWT_DECODE_CACHE_MAX_ENTRIES", "JWT_DECODE_CACHE_TTL_SECONDS"),
+    "conteos": ("LISTING_COUNT_CACHE_MAX_ENTRIES", "LISTING_COUNT_CACHE_TTL_SECONDS"),
+    "busquedas": ("VEHICLE_SEARCH_CACHE_MAX_ENTRIES", "VEHICLE_SEARCH_CACHE_TTL_SECONDS"),
+    "ciudades": ("CITY_CATALOG_CACHE_MAX_ENTRIES", "CITY_CATALOG_CACHE_TTL_SECONDS"),
+}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU acotada cuyas entradas expiran tras ``ttl_seconds``."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = max(int(maxsize), 0)
+        self.ttl_seconds = max(float(ttl_seconds), 0.0)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entrada = self._data.get(key, _MISSING)
+            if entrada is _MISSING:
+                self.misses += 1
+                return default
+            expira, valor = entrada
+            if expira <= self._clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            entrada = self._data.pop(key, None)
+        return None if entrada is None else entrada[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def invalidar_donde(self, predicado: Callable[[Hashable], bool]) -> int:
+        """Descartar las entradas cuya clave cumple ``predicado``; retorna cuantas."""
+        with self._lock:
+            claves = [clave for clave in self._data if predicado(clave)]
+            for clave in claves:
+                del self._data[clave]
+            self.invalidations += len(claves)
+        return len(claves)
+
+    def stats(self) -> Dict[str, Any]:
+        consultas = self.hits + self.misses
+        return {
+            "entradas": len(self._data),
+            "max_entradas": self.maxsize,
+            "ttl_segundos": self.ttl_seconds,
+            "aciertos": self.hits,
+            "fallos": self.misses,
+            "tasa_aciertos": round(self.hits / consultas, 4) if consultas else 0.0,
+            "desalojos": self.evictions,
+            "invalidaciones": self.invalidations,
+        }
+
+
+def init_app(app) -> None:
+    """Crear las caches configuradas para la aplicacion."""
+    app.extensions[EXTENSION_KEY] = {
+        nombre: TTLCache(
+            int(app.config.get(clave_tamano, 0)),
+            float(app.config.get(clave_ttl, 0)),
+        )
+        for nombre, (clave_tamano, clave_ttl) in CACHE_SETTINGS.items()
+    }
+
+
+def obtener_cache(nombre: str) -> Optional[TTLCache]:
+    """Retornar la cache habilitada con ese nombre en la aplicacion activa."""
+    try:
+        caches = current_app.extensions.get(EXTENSION_KEY) or {}
+    except RuntimeError:
+        return None
+    cache = caches.get(nombre)
+    if cache is None or not cache.enabled:
+        return None
+    return cache
+
+
+def estadisticas() -> Dict[str, Dict[str, Any]]:
+    """Resumen de aciertos, fallos y desalojos de todas las caches."""
+    caches = current_app.extensions.get(EXTENSION_KEY) or {}
+    return {nombre: cache.stats() for nombre, cache in caches.items()}
@@ -34,13 +34,83 @@ class BaseConfig:
     JWT_SECRET = os.getenv("JWT_SECRET") or SUPABASE_JWT_SECRET or "dev-secret-change-me"
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
     JWT_ACCESS_TOKEN_EXPIRES_MIN = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES_MIN", "60"))
+    JWT_REFRESH_TOKEN_EXPIRES_DAYS = int(os.getenv("JWT_REFRESH_TOKEN_EXPIRES_DAYS", "30"))
+    JWT_DECODE_CACHE_MAX_ENTRIES = int(os.getenv("JWT_DECODE_CACHE_MAX_ENTRIES", "4096"))
+    JWT_DECODE_CACHE_TTL_SECONDS = float(os.getenv("JWT_DECODE_CACHE_TTL_SECONDS", "300"))
+    JWT_STATELESS_AUTH = _env_bool("JWT_STATELESS_AUTH", False)
+    JWT_REVOCATION_REFRESH_SECONDS = float(os.getenv("JWT_REVOCATION_REFRESH_SECONDS", "30"))
+
+    # Metodo y costo del KDF en formato werkzeug, p. ej. "scrypt:32768:8:1" o
+    # "pbkdf2:sha256:600000". Usa ``python -m benchmarks.password_hash`` para calibrarlo.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "8"))
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+    PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "2"))
+
+    # Respuestas de POST /api/reservations y POST /api/vehicles con Idempotency-Key.
+    # IDEMPOTENCY_STORE acepta "modulo:Clase" de un AlmacenIdempotencia compartido
+    # (necesario con varios workers); vacio usa un almacen en memoria por proceso.
+    IDEMPOTENCY_ENABLED = _env_bool("IDEMPOTENCY_ENABLED", True)
+    IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "")
+    IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+    # Cobro diferido (migracion 016): la reserva responde 202 con el pago "pendiente" y
+    # PAYMENT_OUTBOX_WORKERS hilos lo cobran. PAYMENT_PROVIDER acepta "modulo:Clase" de
+    # una PasarelaPagos; vacio usa la pasarela simulada.
+    PAYMENT_ASYNC = _env_bool("PAYMENT_ASYNC", True)
+    PAYMENT_PROVIDER = os.getenv("PAYMENT_PROVIDER", "")
+    PAYMENT_SIMULATED_LATENCY_SECONDS = float(os.getenv("PAYMENT_SIMULATED_LATENCY_SECONDS", "0"))
+    PAYMENT_OUTBOX_WORKERS = int(os.getenv("PAYMENT_OUTBOX_WORKERS", "2"))
+    PAYMENT_OUTBOX_BATCH_SIZE = int(os.getenv("PAYMENT_OUTBOX_BATCH_SIZE", "10"))
+    PAYMENT_OUTBOX_POLL_SECONDS = float(os.getenv("PAYMENT_OUTBOX_POLL_SECONDS", "5"))
+    PAYMENT_OUTBOX_LOCK_SECONDS = int(os.getenv("PAYMENT_OUTBOX_LOCK_SECONDS", "60"))
+    PAYMENT_MAX_ATTEMPTS = int(os.getenv("PAYMENT_MAX_ATTEMPTS", "5"))
+
+    AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+    AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "2048"))
 
     JSON_SORT_KEYS = False
+    # Codificar las respuestas con orjson cuando esta instalado (ver app/serialization.py).
+    JSON_FAST_BACKEND = _env_bool("JSON_FAST_BACKEND", True)
+    # Reenviar tal cual el JSON de PostgREST en los listados de vehiculos sin fechas,
+    # sin construir modelos; depende de la API interna de postgrest-py (ver ejecutar_crudo).
+    VEHICLE_LIST_PASSTHROUGH = _env_bool("VEHICLE_LIST_PASSTHROUGH", False)
     VEHICLE_MIN_YEAR = int(os.getenv("VEHICLE_MIN_YEAR", "2015"))
     VEHICLE_IMAGE_MAX_MB = float(os.getenv("VEHICLE_IMAGE_MAX_MB", "3"))
     VEHICLE_IMAGE_BUCKET = os.getenv("VEHICLE_IMAGE_BUCKET", "vehicle-images")
     VEHICLE_DEFAULT_CURRENCY = os.getenv("VEHICLE_DEFAULT_CURRENCY", "USD")
 
+    # Total de los listados paginados: "exact", "planned" (estimacion del planificador)
+    # o "cached" (conteo exacto reutilizado durante LISTING_COUNT_CACHE_TTL_SECONDS).
+    LISTING_COUNT_STRATEGY = os.getenv("LISTING_COUNT_STRATEGY", "cached")
+    LISTING_COUNT_CACHE_TTL_SECONDS = float(os.getenv("LISTING_COUNT_CACHE_TTL_SECONDS", "30"))
+    LISTING_COUNT_CACHE_MAX_ENTRIES = int(os.getenv("LISTING_COUNT_CACHE_MAX_ENTRIES", "1024"))
+
+    VEHICLE_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("VEHICLE_SEARCH_CACHE_TTL_SECONDS", "30"))
+    VEHICLE_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("VEHICLE_SEARCH_CACHE_MAX_ENTRIES", "512"))
+
+    CITY_CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CITY_CATALOG_CACHE_TTL_SECONDS", "300"))
+    CITY_CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CITY_CATALOG_CACHE_MAX_ENTRIES", "8"))
+    CITY_CATALOG_MAX_AGE_SECONDS = int(os.getenv("CITY_CATALOG_MAX_AGE_SECONDS", "300"))
+    # max-age de GET /api/vehicles y /api/vehicles/<id>; ambos responden 304 con If-None-Match.
+    VEHICLE_HTTP_MAX_AGE_SECONDS = int(os.getenv("VEHICLE_HTTP_MAX_AGE_SECONDS", "30"))
+
+    # Vehiculos por solicitud en POST /api/vehicles/availability:batch.
+    VEHICLE_AVAILABILITY_BATCH_MAX_IDS = int(os.getenv("VEHICLE_AVAILABILITY_BATCH_MAX_IDS", "100"))
+
+    AVAILABILITY_INDEX_ENABLED = _env_bool("AVAILABILITY_INDEX_ENABLED", True)
+    AVAILABILITY_INDEX_TTL_SECONDS = float(os.getenv("AVAILABILITY_INDEX_TTL_SECONDS", "60"))
+    # Tras recargas fallidas durante este tiempo el indice se descarta y se consulta la base.
+    AVAILABILITY_INDEX_MAX_STALE_SECONDS = float(os.getenv("AVAILABILITY_INDEX_MAX_STALE_SECONDS", "300"))
+    FLEET_CALENDAR_ENABLED = _env_bool("FLEET_CALENDAR_ENABLED", False)
+    FLEET_CALENDAR_HORIZON_DAYS = int(os.getenv("FLEET_CALENDAR_HORIZON_DAYS", "365"))
+    FLEET_CALENDAR_TTL_SECONDS = float(os.getenv("FLEET_CALENDAR_TTL_SECONDS", "300"))
+    # Tras recargas fallidas durante este tiempo el calendario se descarta y se consulta la base.
+    FLEET_CALENDAR_MAX_STALE_SECONDS = float(os.getenv("FLEET_CALENDAR_MAX_STALE_SECONDS", "1500"))
+
 
 class TestConfig(BaseConfig):
     """Configuracion especifica para pruebas."""
@@ -48,3 +118,6 @@ class TestConfig(BaseConfig):
     TESTING = True
     DEBUG = True
     JWT_SECRET = "test-secret"
+    AVAILABILITY_INDEX_ENABLED = False
+    PASSWORD_HASH_WORKERS = 0
+    PAYMENT_ASYNC = False
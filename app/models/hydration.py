@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+"""Construccion de modelos de dominio a partir de filas de Supabase.
+
+``Modelo(**fila)`` falla con ``TypeError`` en cuanto la tabla gana una
+columna que la dataclass no conoce. :class:`Hidratador` genera una sola vez
+por modelo una funcion que lee solo los campos conocidos, aplica los valores
+por defecto de la dataclass y convierte fechas, ``Decimal`` y textos
+obligatorios en la misma pasada. Las columnas desconocidas se ignoran y se
+registran una vez por proceso.
+"""
+
+import dataclasses
+import logging
+import threading
+import typing
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, FrozenSet, Generic, Iterable, List, Mapping, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M")
+
+
+def _fecha(valor: Any) -> Any:
+    if valor is None or isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _decimal(valor: Any) -> Any:
+    if valor is None or isinstance(valor, Decimal):
+        return valor
+    return Decimal(str(valor))
+
+
+def _texto(valor: Any) -> str:
+    return valor if type(valor) is str else str(valor)
+
+
+def _conversion(anotacion: Any, obligatorio: bool) -> Optional[str]:
+    opcional = typing.get_origin(anotacion) is typing.Union and type(None) in typing.get_args(anotacion)
+    if opcional:
+        argumentos = [arg for arg in typing.get_args(anotacion) if arg is not type(None)]
+        anotacion = argumentos[0] if len(argumentos) == 1 else anotacion
+    if anotacion is date:
+        return "_fecha"
+    if anotacion is Decimal:
+        return "_decimal"
+    if anotacion is str and obligatorio and not opcional:
+        return "_texto"
+    return None
+
+
+class Hidratador(Generic[M]):
+    """Convierte diccionarios en instancias de la dataclass ``modelo``.
+
+    El constructor se genera por conjunto de columnas recibidas (las filas de
+    una misma consulta comparten columnas) y lee cada valor por indice, sin
+    ``dict.get`` ni argumentos por nombre. ``si_vacio`` indica valores que
+    reemplazan a ``None`` o a la cadena vacia en campos concretos (p. ej. el
+    estado por defecto de una reserva).
+    """
+
+    def __init__(self, modelo: type[M], *, si_vacio: Optional[Mapping[str, Any]] = None) -> None:
+        self.modelo = modelo
+        self._campos = dataclasses.fields(modelo)
+        self._tipos = typing.get_type_hints(modelo)
+        self._si_vacio = dict(si_vacio or {})
+        self._conocidas: FrozenSet[str] = frozenset(campo.name for campo in self._campos)
+        self._ignoradas: FrozenSet[str] = frozenset()
+        self._constructores: Dict[FrozenSet[str], Callable[[Mapping[str, Any]], M]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def columnas_ignoradas(self) -> FrozenSet[str]:
+        """Columnas recibidas que el modelo no conoce."""
+        return self._ignoradas
+
+    def __call__(self, registro: Mapping[str, Any]) -> M:
+        return self._constructor(registro)(registro)
+
+    def lista(self, registros: Iterable[Mapping[str, Any]]) -> List[M]:
+        """Hidratar un resultado completo con el constructor de su primera fila."""
+        registros = list(registros)
+        if not registros:
+            return []
+        construir = self._constructor(registros[0])
+        try:
+            return [construir(registro) for registro in registros]
+        except KeyError:
+            # Filas con columnas distintas: cada una usa su propio constructor.
+            return [self(registro) for registro in registros]
+
+    def _constructor(self, registro: Mapping[str, Any]) -> Callable[[Mapping[str, Any]], M]:
+        columnas = frozenset(registro.keys())
+        construir = self._constructores.get(columnas)
+        if construir is None:
+            with self._lock:
+                construir = self._constructores.get(columnas)
+                if construir is None:
+                    construir = self._generar(columnas)
+                    self._registrar_ignoradas(columnas - self._conocidas)
+                    self._constructores[columnas] = construir
+        return construir
+
+    def _registrar_ignoradas(self, nuevas: FrozenSet[str]) -> None:
+        nuevas = nuevas - self._ignoradas
+        if nuevas:
+            self._ignoradas = self._ignoradas | nuevas
+            logger.info("%s ignora columnas desconocidas: %s", self.modelo.__name__, ", ".join(sorted(nuevas)))
+
+    def _generar(self, columnas: FrozenSet[str]) -> Callable[[Mapping[str, Any]], M]:
+        espacio: Dict[str, Any] = {
+            "_modelo": self.modelo,
+            "_fecha": _fecha,
+            "_desde_iso": date.fromisoformat,
+            "_decimal": _decimal,
+            "_texto": _texto,
+        }
+        argumentos = []
+        for indice, campo in enumerate(self._campos):
+            tiene_defecto = campo.default is not dataclasses.MISSING
+            tiene_fabrica = campo.default_factory is not dataclasses.MISSING
+            if campo.name in columnas:
+                valor = f"registro[{campo.name!r}]"
+            elif tiene_defecto:
+                espacio[f"_defecto_{indice}"] = campo.default
+                valor = f"_defecto_{indice}"
+            elif tiene_fabrica:
+                espacio[f"_fabrica_{indice}"] = campo.default_factory
+                valor = f"_fabrica_{indice}()"
+            else:
+                valor = "None"
+            if campo.name in self._si_vacio:
+                espacio[f"_vacio_{indice}"] = self._si_vacio[campo.name]
+                valor = f"({valor} or _vacio_{indice})"
+            conversion = _conversion(self._tipos[campo.name], not (tiene_defecto or tiene_fabrica))
+            if conversion == "_fecha" and campo.name in columnas and campo.name not in self._si_vacio:
+                # Caso comun: la fecha llega como "YYYY-MM-DD" y se convierte sin llamadas extra.
+                valor = f"(_desde_iso({valor}) if len({valor}) == 10 else _fecha({valor})) if {valor}.__class__ is str else _fecha({valor})"
+            elif conversion:
+                valor = f"{conversion}({valor})"
+            argumentos.append(valor)
+
+        nombre = f"hidratar_{self.modelo.__name__.lower()}"
+        fuente = f"def {nombre}(registro):\n    return _modelo({', '.join(argumentos)})\n"
+        exec(compile(fuente, f"<hidratacion {self.modelo.__name__}>", "exec"), espacio)
+        return espacio[nombre]
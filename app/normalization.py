@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+"""Normalizacion de texto compartida entre la API y la base de datos."""
+
+import unicodedata
+from typing import Optional
+
+
+def normalizar_ciudad(valor: Optional[str]) -> str:
+    """Minusculas, sin acentos ni espacios sobrantes.
+
+    Replica ``public.normalizar_ciudad`` (``lower(unaccent(btrim(...)))``) de la
+    migracion 012 para que la clave calculada aqui coincida con ``location_key``.
+    """
+    descompuesto = unicodedata.normalize("NFKD", (valor or "").strip())
+    sin_acentos = "".join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+    return " ".join(sin_acentos.lower().split())
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+"""Cursores opacos para paginar por clave (keyset) en lugar de por offset."""
+
+import base64
+import binascii
+import json
+import re
+from typing import Any, Optional, Tuple
+
+_ID_REGEX = re.compile(r"^[0-9A-Za-z-]+$")
+
+
+class CursorInvalidoError(ValueError):
+    """Se lanza cuando el cursor recibido no pudo interpretarse."""
+
+
+def codificar_cursor(precio: Any, identificador: Any) -> str:
+    """Codificar la ultima posicion ``(price_per_day, id)`` de una pagina."""
+    crudo = json.dumps([precio, str(identificador)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).rstrip(b"=").decode("ascii")
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[Tuple[float, str]]:
+    """Recuperar ``(price_per_day, id)`` desde un cursor emitido por la API."""
+    if not cursor:
+        return None
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        precio, identificador = json.loads(crudo)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise CursorInvalidoError("El cursor de paginacion no es valido.") from exc
+    # El id termina en un filtro de PostgREST; solo se aceptan ids con forma de uuid.
+    if isinstance(precio, bool) or not isinstance(precio, (int, float)):
+        raise CursorInvalidoError("El cursor de paginacion no es valido.")
+    if not isinstance(identificador, str) or not _ID_REGEX.match(identificador):
+        raise CursorInvalidoError("El cursor de paginacion no es valido.")
+    return float(precio), identificador
@@ -1,15 +1,22 @@
 """Paquete de la capa de repositorios."""
 
-from .base import SupabaseRepository
+from .base import RegistroDuplicadoError, ReservaSolapadaError, RpcNoDisponibleError, SupabaseRepository
 from .user_repository import UserRepository
 from .vehicle_repository import VehicleRepository
 from .reservation_repository import ReservationRepository
 from .payment_repository import PaymentRepository
+from .refresh_token_repository import RefreshTokenRepository
+from .token_revocation_repository import TokenRevocationRepository
 
 __all__ = [
+    "RegistroDuplicadoError",
+    "ReservaSolapadaError",
+    "RpcNoDisponibleError",
     "SupabaseRepository",
     "UserRepository",
     "VehicleRepository",
     "ReservationRepository",
     "PaymentRepository",
+    "RefreshTokenRepository",
+    "TokenRevocationRepository",
 ]
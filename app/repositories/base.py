@@ -2,10 +2,44 @@ from __future__ import annotations
 
 """Utilidades base para interactuar con Supabase."""
 
+import json
+from dataclasses import dataclass
 from typing import Any, Dict, Iterable, Optional
 
 from app.extensions import supabase_client
 
+try:  # pragma: no cover - depende de la version de postgrest
+    from postgrest._sync.request_builder import send_with_retry
+    from postgrest.exceptions import APIError
+except ImportError:  # pragma: no cover - se usa execute() como respaldo
+    send_with_retry = None
+    APIError = None
+
+
+class RpcNoDisponibleError(RuntimeError):
+    """Se lanza cuando la funcion remota solicitada no existe en la base de datos."""
+
+
+class RegistroDuplicadoError(ValueError):
+    """Se lanza cuando una insercion viola una restriccion de unicidad."""
+
+
+class ReservaSolapadaError(ValueError):
+    """Se lanza cuando una reserva viola la restriccion de exclusion por fechas."""
+
+
+# Codigos SQLSTATE de Postgres para unique_violation y exclusion_violation.
+CODIGO_VIOLACION_UNICIDAD = "23505"
+CODIGO_VIOLACION_EXCLUSION = "23P01"
+
+
+@dataclass(frozen=True)
+class RespuestaCruda:
+    """Cuerpo JSON de PostgREST sin decodificar y el total de ``Content-Range``."""
+
+    contenido: bytes
+    count: Optional[int] = None
+
 
 class SupabaseRepository:
     """Contenedor de conveniencia para consultar tablas de Supabase."""
@@ -26,6 +60,42 @@ class SupabaseRepository:
         """Retorna un generador de consultas para la tabla de Supabase."""
         return self.client.table(self.table_name)
 
+    def rpc(self, funcion: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Invocar una funcion de Postgres expuesta por PostgREST."""
+        try:
+            return self.client.rpc(funcion, params or {}).execute()
+        except Exception as exc:
+            # PGRST202: PostgREST no encontro la funcion (migracion sin aplicar).
+            if getattr(exc, "code", None) == "PGRST202":
+                raise RpcNoDisponibleError(
+                    f"La funcion {funcion} no esta disponible en la base de datos."
+                ) from exc
+            raise
+
+    def ejecutar_crudo(self, query: Any) -> RespuestaCruda:
+        """Ejecutar ``query`` y retornar el arreglo JSON tal como lo envia PostgREST.
+
+        Evita la validacion de pydantic y la construccion de diccionarios del
+        cliente para listados que se reenvian sin cambios. Si la version de
+        postgrest no expone la peticion se ejecuta normalmente y se re-codifica.
+        """
+        peticion = getattr(query, "request", None)
+        if send_with_retry is None or peticion is None:
+            respuesta = query.execute()
+            contenido = json.dumps(getattr(respuesta, "data", None) or [], separators=(",", ":"))
+            return RespuestaCruda(contenido.encode("utf-8"), getattr(respuesta, "count", None))
+
+        http = send_with_retry(peticion)
+        if not http.is_success:
+            try:
+                detalle = dict(http.json())
+            except ValueError:
+                detalle = {"message": http.text, "code": str(http.status_code)}
+            raise APIError(detalle)
+        rango = http.headers.get("content-range", "")
+        total = rango.rsplit("/", 1)[-1] if "/" in rango else ""
+        return RespuestaCruda(http.content, int(total) if total.isdigit() else None)
+
     def select(self, columns: str = "*", filters: Optional[Dict[str, Any]] = None) -> Any:
         query = self.table().select(columns)
         if filters:
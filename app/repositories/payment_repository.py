@@ -42,3 +42,48 @@ class PaymentRepository(SupabaseRepository):
         if datos:
             return datos[0]
         return None
+
+    def reclamar_intentos(self, limite: int, bloqueo_segundos: int) -> list[dict[str, Any]]:
+        """Reclamar hasta ``limite`` intentos de ``payment_outbox`` (migracion 016).
+
+        Cada elemento trae ``intento_id``, ``operacion`` (``cobro`` o ``reembolso``),
+        ``intentos`` (contando este) y ``pago``.
+        Los intentos quedan bloqueados ``bloqueo_segundos`` para otros workers.
+        """
+        respuesta = self.rpc(
+            "reclamar_intentos_pago",
+            {"p_limite": limite, "p_bloqueo_segundos": bloqueo_segundos},
+        )
+        datos = getattr(respuesta, "data", None) or []
+        return list(datos)
+
+    def resolver_intento(
+        self,
+        intento_id: int,
+        resultado: str,
+        *,
+        referencia: Optional[str] = None,
+        error: Optional[str] = None,
+        reintentar_en: Optional[int] = None,
+    ) -> dict[str, Any]:
+        """Aplicar ``pagado``, ``reembolsado``, ``rechazado`` o ``reintentar`` a un intento.
+
+        Retorna ``{"pago", "reserva"}``; ``reserva`` solo viene cuando un rechazo
+        cancelo la reserva.
+        """
+        respuesta = self.rpc(
+            "resolver_intento_pago",
+            {
+                "p_intento_id": intento_id,
+                "p_resultado": resultado,
+                "p_reference": referencia,
+                "p_error": error,
+                "p_reintentar_en_segundos": reintentar_en,
+            },
+        )
+        datos = getattr(respuesta, "data", None) or {}
+        if isinstance(datos, list):
+            datos = datos[0] if datos else {}
+        if not datos:
+            raise RuntimeError("El servicio no devolvio informacion del pago.")
+        return dict(datos)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+"""Repositorio para los tokens de renovacion de sesion."""
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from .base import SupabaseRepository
+
+
+class RefreshTokenRepository(SupabaseRepository):
+    table_name = "refresh_tokens"
+
+    def crear(
+        self,
+        *,
+        user_id: str,
+        family_id: str,
+        token_hash: str,
+        expires_at: datetime,
+    ) -> dict[str, Any]:
+        payload = {
+            "user_id": user_id,
+            "family_id": family_id,
+            "token_hash": token_hash,
+            "expires_at": expires_at.isoformat(),
+        }
+        respuesta = self.insert(payload)
+        datos = getattr(respuesta, "data", None) or []
+        if not datos:
+            raise RuntimeError("El servicio no devolvio informacion del token de renovacion.")
+        return datos[0]
+
+    def obtener_por_hash(self, token_hash: str) -> Optional[dict[str, Any]]:
+        respuesta = (
+            self.table()
+            .select("id,user_id,family_id,expires_at,revoked_at,users(id,email,nombre,rol,created_at)")
+            .eq("token_hash", token_hash)
+            .limit(1)
+            .execute()
+        )
+        datos = getattr(respuesta, "data", None)
+        if datos:
+            return datos[0]
+        return None
+
+    def revocar(self, token_id: str, *, replaced_by: Optional[str] = None) -> bool:
+        """Revocar el token si sigue vigente; retorna ``False`` si ya estaba revocado."""
+        respuesta = (
+            self.table()
+            .update({"revoked_at": _ahora(), "replaced_by": replaced_by})
+            .eq("id", token_id)
+            .is_("revoked_at", "null")
+            .execute()
+        )
+        return bool(getattr(respuesta, "data", None))
+
+    def revocar_familia(self, family_id: str) -> None:
+        (
+            self.table()
+            .update({"revoked_at": _ahora()})
+            .eq("family_id", family_id)
+            .is_("revoked_at", "null")
+            .execute()
+        )
+
+
+def _ahora() -> str:
+    return datetime.now(timezone.utc).isoformat()
@@ -3,9 +3,11 @@ from __future__ import annotations
 """Repositorio para gestionar reservas de vehiculos."""
 
 from datetime import date
-from typing import Any, Iterable
+from typing import Any, Iterable, Optional
 
-from .base import SupabaseRepository
+from .base import CODIGO_VIOLACION_EXCLUSION, ReservaSolapadaError, SupabaseRepository
+
+_MENSAJE_SOLAPADA = "El vehiculo ya esta reservado en ese rango de fechas."
 
 
 class ReservationRepository(SupabaseRepository):
@@ -44,6 +46,70 @@ class ReservationRepository(SupabaseRepository):
             query = query.gte("end_date", desde.isoformat())
         return query.execute()
 
+    def obtener_reservas_de_vehiculos(
+        self,
+        vehicle_ids: Iterable[str],
+        *,
+        desde: date | None = None,
+        hasta: date | None = None,
+        tamano_pagina: int = 1000,
+    ) -> list[dict[str, Any]]:
+        """Reservas no canceladas de varios vehiculos con un filtro ``in_``.
+
+        ``desde`` descarta las que terminan antes y ``hasta`` las que empiezan
+        despues. Como en :meth:`listar_vigentes`, se recorren las paginas hasta
+        agotarlas para no perder filas por el limite de PostgREST.
+        """
+        ids = list(vehicle_ids)
+        registros: list[dict[str, Any]] = []
+        inicio = 0
+        while True:
+            query = (
+                self.table()
+                .select("id,vehicle_id,start_date,end_date,status")
+                .in_("vehicle_id", ids)
+                .neq("status", "cancelada")
+            )
+            if desde is not None:
+                query = query.gte("end_date", desde.isoformat())
+            if hasta is not None:
+                query = query.lte("start_date", hasta.isoformat())
+            respuesta = (
+                query.order("start_date", desc=False)
+                .order("id")
+                .range(inicio, inicio + tamano_pagina - 1)
+                .execute()
+            )
+            datos = getattr(respuesta, "data", None) or []
+            registros.extend(datos)
+            if len(datos) < tamano_pagina:
+                return registros
+            inicio += tamano_pagina
+
+    def listar_vigentes(self, desde: date, *, tamano_pagina: int = 1000) -> list[dict[str, Any]]:
+        """Obtener todas las reservas no canceladas que terminan desde la fecha dada.
+
+        PostgREST limita la cantidad de filas por respuesta, por lo que se
+        recorren las paginas ordenadas por identificador hasta agotarlas.
+        """
+        registros: list[dict[str, Any]] = []
+        inicio = 0
+        while True:
+            respuesta = (
+                self.table()
+                .select("id,vehicle_id,start_date,end_date,status")
+                .gte("end_date", desde.isoformat())
+                .neq("status", "cancelada")
+                .order("id")
+                .range(inicio, inicio + tamano_pagina - 1)
+                .execute()
+            )
+            datos = getattr(respuesta, "data", None) or []
+            registros.extend(datos)
+            if len(datos) < tamano_pagina:
+                return registros
+            inicio += tamano_pagina
+
     def obtener_por_id_con_vehiculo(self, reserva_id: str) -> Any:
         return (
             self.table()
@@ -52,30 +118,128 @@ class ReservationRepository(SupabaseRepository):
             .execute()
         )
 
-    def listar_por_usuario(self, user_id: str, *, limit: int = 20, offset: int = 0) -> Any:
+    # ``metodo_conteo``: "exact", "planned" o None para no contar.
+    def listar_por_usuario(
+        self,
+        user_id: str,
+        *,
+        limit: int = 20,
+        offset: int = 0,
+        metodo_conteo: Optional[str] = "exact",
+    ) -> Any:
         query = (
             self.table()
-            .select("*", count="exact")
+            .select("*", count=metodo_conteo)
             .eq("user_id", user_id)
             .order("start_date", desc=False)
         )
         return self._apply_pagination(query, limit, offset)
 
-    def listar_para_anfitrion(self, owner_id: str, *, limit: int = 20, offset: int = 0) -> Any:
+    def listar_para_anfitrion(
+        self,
+        owner_id: str,
+        *,
+        limit: int = 20,
+        offset: int = 0,
+        metodo_conteo: Optional[str] = "exact",
+    ) -> Any:
         query = (
             self.table()
-            .select("*,vehicles!inner(owner_id)", count="exact")
+            .select("*,vehicles!inner(owner_id)", count=metodo_conteo)
             .eq("vehicles.owner_id", owner_id)
             .order("start_date", desc=False)
         )
         return self._apply_pagination(query, limit, offset)
 
-    def listar_todas(self, *, limit: int = 20, offset: int = 0) -> Any:
-        query = self.table().select("*", count="exact").order("start_date", desc=False)
+    def listar_todas(
+        self,
+        *,
+        limit: int = 20,
+        offset: int = 0,
+        metodo_conteo: Optional[str] = "exact",
+    ) -> Any:
+        query = self.table().select("*", count=metodo_conteo).order("start_date", desc=False)
         return self._apply_pagination(query, limit, offset)
 
     def crear_reserva(self, payload: dict[str, Any]) -> Any:
-        return self.table().insert(payload).execute()
+        try:
+            return self.table().insert(payload).execute()
+        except Exception as exc:
+            # Con la migracion 014 la restriccion de exclusion resuelve reservas concurrentes.
+            if getattr(exc, "code", None) == CODIGO_VIOLACION_EXCLUSION:
+                raise ReservaSolapadaError(_MENSAJE_SOLAPADA) from exc
+            raise
+
+    def crear_reserva_con_pago(
+        self,
+        *,
+        vehicle_id: str,
+        user_id: str,
+        fecha_inicio: date,
+        fecha_fin: date,
+        comentarios: Optional[str],
+        provider: str,
+        reference: str,
+        card_last4: Optional[str],
+        pago_diferido: bool = False,
+    ) -> dict[str, Any]:
+        """Crear la reserva y su pago en una transaccion (``crear_reserva_con_pago``).
+
+        Retorna ``{"reserva", "pago", "owner_id"}`` o ``{"error": codigo}`` si el
+        vehiculo no existe, no esta activo o el monto no es valido. Con
+        ``pago_diferido`` usa ``crear_reserva_con_intento_pago`` (migracion 016):
+        el pago queda ``pendiente`` y un intento de cobro entra a ``payment_outbox``.
+        """
+        params = {
+            "p_vehicle_id": vehicle_id,
+            "p_user_id": user_id,
+            "p_fecha_inicio": fecha_inicio.isoformat(),
+            "p_fecha_fin": fecha_fin.isoformat(),
+            "p_comentarios": comentarios,
+            "p_provider": provider,
+            "p_reference": reference,
+            "p_card_last4": card_last4,
+        }
+        try:
+            funcion = "crear_reserva_con_intento_pago" if pago_diferido else "crear_reserva_con_pago"
+            respuesta = self.rpc(funcion, params)
+        except Exception as exc:
+            if getattr(exc, "code", None) == CODIGO_VIOLACION_EXCLUSION:
+                raise ReservaSolapadaError(_MENSAJE_SOLAPADA) from exc
+            raise
+        datos = getattr(respuesta, "data", None) or {}
+        if isinstance(datos, list):
+            datos = datos[0] if datos else {}
+        if not datos:
+            raise RuntimeError("El servicio no devolvio informacion de la reserva creada.")
+        return dict(datos)
+
+    def cancelar_con_reembolso(
+        self,
+        reserva_id: str,
+        user_id: str,
+        *,
+        es_admin: bool,
+        reembolso_diferido: bool = False,
+    ) -> dict[str, Any]:
+        """Cancelar la reserva y reembolsar su pago en una transaccion.
+
+        Retorna ``{"reserva", "pago"}`` o ``{"error": codigo}`` si la reserva no
+        existe, no pertenece al usuario o no esta confirmada. Con
+        ``reembolso_diferido`` (migracion 016) un pago cobrado queda
+        ``reembolso_pendiente`` y su reembolso entra a ``payment_outbox``.
+        """
+        params = {"p_reserva_id": reserva_id, "p_user_id": user_id, "p_es_admin": es_admin}
+        if reembolso_diferido:
+            # Sin el parametro la llamada tambien resuelve contra la funcion de la migracion 015.
+            params["p_reembolso_diferido"] = True
+        respuesta = self.rpc("cancelar_reserva_con_reembolso", params)
+        datos = getattr(respuesta, "data", None) or {}
+        if isinstance(datos, list):
+            datos = datos[0] if datos else {}
+        if not datos:
+            raise RuntimeError("El servicio no devolvio informacion de la reserva cancelada.")
+        return dict(datos)
 
     def cancelar_reserva(self, reserva_id: str) -> Any:
         return self.table().update({"status": "cancelada"}).eq("id", reserva_id).execute()
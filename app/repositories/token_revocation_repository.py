@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+"""Repositorio para la lista de revocacion de tokens de acceso."""
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from .base import SupabaseRepository
+
+
+class TokenRevocationRepository(SupabaseRepository):
+    table_name = "token_revocations"
+
+    def listar_vigentes(self) -> list[dict[str, Any]]:
+        respuesta = (
+            self.table()
+            .select("jti,user_id,not_before,expires_at")
+            .gt("expires_at", datetime.now(timezone.utc).isoformat())
+            .execute()
+        )
+        return list(getattr(respuesta, "data", None) or [])
+
+    def registrar(
+        self,
+        *,
+        expires_at: datetime,
+        jti: Optional[str] = None,
+        user_id: Optional[str] = None,
+        not_before: Optional[datetime] = None,
+    ) -> None:
+        payload = {
+            "jti": jti,
+            "user_id": user_id,
+            "not_before": not_before.isoformat() if not_before else None,
+            "expires_at": expires_at.isoformat(),
+        }
+        respuesta = self.insert(payload)
+        error = getattr(respuesta, "error", None)
+        if error:
+            raise RuntimeError(error.get("message", "No fue posible registrar la revocacion."))
@@ -4,12 +4,15 @@ from __future__ import annotations
 
 from typing import Any, Optional
 
-from .base import SupabaseRepository
+from .base import CODIGO_VIOLACION_UNICIDAD, RegistroDuplicadoError, SupabaseRepository
 
 
 class UserRepository(SupabaseRepository):
     table_name = "users"
 
+    # Columnas publicas del perfil; excluye password_hash.
+    COLUMNAS_PERFIL = "id,email,nombre,rol,created_at"
+
     def crear_usuario(
         self,
         email: str,
@@ -23,7 +26,13 @@ class UserRepository(SupabaseRepository):
             "nombre": nombre,
             "rol": rol,
         }
-        respuesta = self.insert(payload)
+        try:
+            respuesta = self.insert(payload)
+        except Exception as exc:
+            # El indice unico sobre lower(email) resuelve registros concurrentes.
+            if getattr(exc, "code", None) == CODIGO_VIOLACION_UNICIDAD:
+                raise RegistroDuplicadoError("Ya existe un usuario con este correo electronico.") from exc
+            raise
         error = getattr(respuesta, "error", None)
         if error:
             raise RuntimeError(error.get("message", "Error desconocido al crear el usuario."))
@@ -49,7 +58,7 @@ class UserRepository(SupabaseRepository):
     def obtener_por_id(self, user_id: str) -> Optional[dict[str, Any]]:
         respuesta = (
             self.table()
-                .select("id,email,password_hash,nombre,rol,created_at")
+                .select(self.COLUMNAS_PERFIL)
                 .eq("id", user_id)
                 .limit(1)
                 .execute()
@@ -58,3 +67,28 @@ class UserRepository(SupabaseRepository):
         if datos:
             return datos[0]
         return None
+
+    def actualizar_password_hash(self, user_id: str, anterior: str, nuevo: str) -> bool:
+        """Reemplazar el hash solo si no cambio desde que se leyo."""
+        respuesta = (
+            self.table()
+                .update({"password_hash": nuevo})
+                .eq("id", user_id)
+                .eq("password_hash", anterior)
+                .execute()
+        )
+        return bool(getattr(respuesta, "data", None))
+
+    def actualizar_rol(self, user_id: str, rol: str) -> Optional[dict[str, Any]]:
+        respuesta = (
+            self.table()
+                .update({"rol": rol})
+                .eq("id", user_id)
+                .execute()
+        )
+        datos = getattr(respuesta, "data", None) or []
+        if not datos:
+            return None
+        registro = dict(datos[0])
+        registro.pop("password_hash", None)
+        return registro
@@ -2,7 +2,10 @@ from __future__ import annotations
 
 """Repositorio para la persistencia de vehiculos utilizando Supabase."""
 
-from typing import Any, Optional
+from datetime import date
+from typing import Any, Optional, Tuple
+
+from app.normalization import normalizar_ciudad
 
 from .base import SupabaseRepository
 
@@ -10,6 +13,9 @@ from .base import SupabaseRepository
 class VehicleRepository(SupabaseRepository):
     table_name = "vehicles"
 
+    # Pasa a False en este proceso si la columna location_key (migracion 012) no existe.
+    usa_location_key = True
+
     def get_by_id(self, vehicle_id: str) -> Optional[dict[str, Any]]:
         response = self.select(filters={"id": vehicle_id})
         data = getattr(response, "data", None)
@@ -28,13 +34,69 @@ class VehicleRepository(SupabaseRepository):
         limit: Optional[int] = 20,
         offset: int = 0,
         include_count: bool = False,
+        despues_de: Optional[Tuple[float, str]] = None,
+        metodo_conteo: str = "exact",
+        columnas: str = "*",
+        crudo: bool = False,
+    ) -> Any:
+        """Listar vehiculos ordenados por ``(price_per_day, id)``.
+
+        Con ``despues_de`` pagina por clave: retorna las filas posteriores a esa
+        posicion usando el indice compuesto en lugar de descartar ``offset`` filas.
+        ``columnas`` limita la proyeccion que devuelve PostgREST y ``crudo``
+        retorna una :class:`RespuestaCruda` con el arreglo JSON sin decodificar.
+        """
+        filtros = {
+            "ciudad": ciudad,
+            "tipo": tipo,
+            "precio_min": precio_min,
+            "precio_max": precio_max,
+            "status": status,
+            "limit": limit,
+            "offset": offset,
+            "include_count": include_count,
+            "despues_de": despues_de,
+            "metodo_conteo": metodo_conteo,
+            "columnas": columnas,
+            "crudo": crudo,
+        }
+        if not (ciudad and VehicleRepository.usa_location_key):
+            return self._search(usar_location_key=False, **filtros)
+        try:
+            return self._search(usar_location_key=True, **filtros)
+        except Exception as exc:
+            # 42703: columna inexistente; se vuelve al ilike sobre location.
+            if getattr(exc, "code", None) != "42703":
+                raise
+            VehicleRepository.usa_location_key = False
+            return self._search(usar_location_key=False, **filtros)
+
+    def _search(
+        self,
+        *,
+        ciudad: Optional[str],
+        tipo: Optional[str],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+        status: Optional[str],
+        limit: Optional[int],
+        offset: int,
+        include_count: bool,
+        despues_de: Optional[Tuple[float, str]],
+        metodo_conteo: str,
+        columnas: str,
+        crudo: bool,
+        usar_location_key: bool,
     ) -> Any:
         if include_count:
-            query = self.table().select("*", count="exact")
+            query = self.table().select(columnas, count=metodo_conteo)
         else:
-            query = self.table().select("*")
+            query = self.table().select(columnas)
 
-        if ciudad:
+        if ciudad and usar_location_key:
+            # Indice de trigramas sobre location_key: admite el comodin inicial.
+            query = query.like("location_key", f"%{normalizar_ciudad(ciudad)}%")
+        elif ciudad:
             query = query.ilike("location", f"%{ciudad}%")
         if tipo:
             query = query.eq("vehicle_type", tipo)
@@ -45,22 +107,96 @@ class VehicleRepository(SupabaseRepository):
         if status is not None:
             query = query.eq("status", status)
 
-        query = query.order("price_per_day")
+        if despues_de is not None:
+            precio, vehicle_id = despues_de
+            query = query.or_(
+                f"price_per_day.gt.{precio},and(price_per_day.eq.{precio},id.gt.{vehicle_id})"
+            )
+
+        # El id desempata precios iguales para que las paginas sean estables.
+        query = query.order("price_per_day").order("id")
 
         if limit is not None:
-            if offset:
+            if offset and despues_de is None:
                 query = query.range(offset, offset + limit - 1)
             else:
                 query = query.limit(limit)
+        if crudo:
+            return self.ejecutar_crudo(query)
         return query.execute()
 
+    def buscar_disponibles(
+        self,
+        *,
+        fecha_inicio: date,
+        fecha_fin: date,
+        ciudad: Optional[str] = None,
+        tipo: Optional[str] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+        despues_de: Optional[Tuple[float, str]] = None,
+    ) -> dict[str, Any]:
+        """Buscar vehiculos activos sin reservas en el rango en una sola llamada.
+
+        El filtrado por disponibilidad, el orden, la paginacion y el total se
+        resuelven en la funcion ``buscar_vehiculos_disponibles`` de Postgres.
+        """
+        params = {
+            "p_fecha_inicio": fecha_inicio.isoformat(),
+            "p_fecha_fin": fecha_fin.isoformat(),
+            "p_ciudad": ciudad or None,
+            "p_tipo": tipo or None,
+            "p_precio_min": precio_min,
+            "p_precio_max": precio_max,
+            "p_limit": limit,
+            "p_offset": offset,
+        }
+        if despues_de is not None:
+            # Solo se envian con cursor para seguir siendo compatibles con la firma de 006.
+            params["p_cursor_precio"], params["p_cursor_id"] = despues_de
+        respuesta = self.rpc("buscar_vehiculos_disponibles", params)
+        datos = getattr(respuesta, "data", None) or {}
+        if isinstance(datos, list):
+            datos = datos[0] if datos else {}
+        return {
+            "items": list(datos.get("items") or []),
+            "total": int(datos.get("total") or 0),
+        }
+
     def listar_ciudades(self) -> list[str]:
-        response = self.table().select("location").execute()
+        return [ciudad["nombre"] for ciudad in self.listar_catalogo_ciudades()]
+
+    def listar_catalogo_ciudades(self) -> list[dict[str, Any]]:
+        """Ciudades distintas con su numero de vehiculos activos.
+
+        Se leen de ``vehicle_cities``, que un trigger mantiene al escribir en
+        ``vehicles``; si esa tabla aun no existe se recorre la flota como antes.
+        """
+        try:
+            respuesta = (
+                self.client.table("vehicle_cities")
+                .select("name,active_count")
+                .order("city_key")
+                .execute()
+            )
+        except Exception as exc:
+            # PGRST205/42P01: la migracion 011 no se ha aplicado.
+            if getattr(exc, "code", None) not in {"PGRST205", "42P01"}:
+                raise
+            return self._resumir_ciudades()
+
+        return [
+            {"nombre": fila["name"], "vehiculos_activos": int(fila.get("active_count") or 0)}
+            for fila in getattr(respuesta, "data", None) or []
+        ]
+
+    def _resumir_ciudades(self) -> list[dict[str, Any]]:
+        response = self.table().select("location,status").execute()
         data = getattr(response, "data", None) or []
 
-        ciudades: list[str] = []
-        vistos: set[str] = set()
-
+        ciudades: dict[str, dict[str, Any]] = {}
         for item in data:
             valor = item.get("location")
             if not isinstance(valor, str):
@@ -68,13 +204,11 @@ class VehicleRepository(SupabaseRepository):
             ciudad = valor.strip()
             if not ciudad:
                 continue
-            clave = ciudad.lower()
-            if clave in vistos:
-                continue
-            vistos.add(clave)
-            ciudades.append(ciudad)
+            entrada = ciudades.setdefault(ciudad.lower(), {"nombre": ciudad, "vehiculos_activos": 0})
+            if item.get("status") == "activo":
+                entrada["vehiculos_activos"] += 1
 
-        return sorted(ciudades, key=lambda nombre: nombre.lower())
+        return [ciudades[clave] for clave in sorted(ciudades)]
 
     def crear_vehiculo(self, payload: dict[str, Any]) -> dict[str, Any]:
         respuesta = self.table().insert(payload).execute()
@@ -92,6 +226,10 @@ class VehicleRepository(SupabaseRepository):
         limit: Optional[int] = 20,
         offset: int = 0,
         include_count: bool = True,
+        despues_de: Optional[Tuple[float, str]] = None,
+        metodo_conteo: str = "exact",
+        columnas: str = "*",
+        crudo: bool = False,
     ) -> Any:
         return self.search(
             status=status,
@@ -99,6 +237,10 @@ class VehicleRepository(SupabaseRepository):
             limit=limit,
             offset=offset,
             include_count=include_count,
+            despues_de=despues_de,
+            metodo_conteo=metodo_conteo,
+            columnas=columnas,
+            crudo=crudo,
         )
 
     @staticmethod
@@ -3,26 +3,56 @@ from __future__ import annotations
 """Funciones auxiliares para manejar tokens estilo JWT sin dependencias externas."""
 
 import base64
+import hashlib
+import hmac
 import json
-from datetime import datetime, timedelta, timezone
+import time
+import uuid
 from typing import Any, Dict, Optional
 
 from flask import current_app
 
+from app.cache import obtener_cache
+
+EXTENSION_KEY = "jwt"
+
 
 class JWTError(Exception):
     """Error generico para problemas relacionados con JWT."""
 
 
-def _get_config() -> Dict[str, Any]:
-    secret = current_app.config.get("JWT_SECRET")
+def _build_config(config: Any) -> Dict[str, Any]:
+    secret = config.get("JWT_SECRET")
     if not secret:
         raise JWTError("La configuracion JWT_SECRET no esta definida.")
-    algorithm = current_app.config.get("JWT_ALGORITHM", "HS256").upper()
+    algorithm = config.get("JWT_ALGORITHM", "HS256").upper()
     if algorithm != "HS256":  # pragma: no cover - solo soportamos HS256
         raise JWTError("Solo se admite el algoritmo HS256 en esta implementacion.")
-    expires_min = int(current_app.config.get("JWT_ACCESS_TOKEN_EXPIRES_MIN", 60))
-    return {"secret": secret, "algorithm": algorithm, "expires_min": expires_min}
+    expires_min = int(config.get("JWT_ACCESS_TOKEN_EXPIRES_MIN", 60))
+    return {
+        "secret": secret,
+        "algorithm": algorithm,
+        "expires_min": expires_min,
+        # Estado HMAC con la clave ya procesada; cada firma solo copia y actualiza.
+        "hmac": hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256),
+        # Prefijo de las claves de la cache ``tokens``: rotar el secreto las invalida.
+        "huella": hashlib.sha256(b"jwt-cache:" + secret.encode("utf-8")).digest()[:8],
+    }
+
+
+def init_app(app) -> None:
+    """Precalcular el material de firma a partir de la configuracion."""
+    app.extensions.pop(EXTENSION_KEY, None)
+    if app.config.get("JWT_SECRET"):
+        app.extensions[EXTENSION_KEY] = _build_config(app.config)
+
+
+def _get_config() -> Dict[str, Any]:
+    config = current_app.extensions.get(EXTENSION_KEY)
+    if config is None or config["secret"] != current_app.config.get("JWT_SECRET"):
+        config = _build_config(current_app.config)
+        current_app.extensions[EXTENSION_KEY] = config
+    return config
 
 
 def _urlsafe_b64encode(data: bytes) -> str:
@@ -34,11 +64,10 @@ def _urlsafe_b64decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(data + padding)
 
 
-def _sign(message: bytes, secret: str) -> bytes:
-    import hmac
-    import hashlib
-
-    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).digest()
+def _sign(message: bytes, base: "hmac.HMAC") -> bytes:
+    firma = base.copy()
+    firma.update(message)
+    return firma.digest()
 
 
 def _json_dumps(value: Dict[str, Any]) -> bytes:
@@ -48,14 +77,16 @@ def _json_dumps(value: Dict[str, Any]) -> bytes:
 def create_access_token(identity: str, additional_claims: Optional[Dict[str, Any]] = None) -> str:
     """Generar un token de acceso firmado (HS256)."""
     config = _get_config()
-    now = datetime.now(timezone.utc)
-    exp = now + timedelta(minutes=config["expires_min"])
+    emitido = time.time()
+    now = int(emitido)
 
     header = {"alg": "HS256", "typ": "JWT"}
     payload: Dict[str, Any] = {
         "sub": identity,
-        "iat": int(now.timestamp()),
-        "exp": int(exp.timestamp()),
+        # NumericDate admite fracciones; la lista de revocacion compara con precision sub-segundo.
+        "iat": emitido,
+        "exp": now + config["expires_min"] * 60,
+        "jti": uuid.uuid4().hex,
     }
     if additional_claims:
         payload.update(additional_claims)
@@ -63,21 +94,53 @@ def create_access_token(identity: str, additional_claims: Optional[Dict[str, Any
     header_b64 = _urlsafe_b64encode(_json_dumps(header))
     payload_b64 = _urlsafe_b64encode(_json_dumps(payload))
     signing_input = f"{header_b64}.{payload_b64}".encode("utf-8")
-    signature = _urlsafe_b64encode(_sign(signing_input, config["secret"]))
+    signature = _urlsafe_b64encode(_sign(signing_input, config["hmac"]))
     return f"{header_b64}.{payload_b64}.{signature}"
 
 
 def decode_token(token: str) -> Dict[str, Any]:
-    """Validar firma y expiracion de un token."""
+    """Validar firma y expiracion de un token.
+
+    Los tokens ya verificados se recuerdan en la cache ``tokens`` por su
+    digest hasta su ``exp``; una peticion repetida con el mismo token solo
+    paga la busqueda y una comparacion entera. La clave incluye una huella
+    del secreto, de modo que tras rotar ``JWT_SECRET`` los tokens firmados con
+    el anterior vuelven a verificarse y se rechazan.
+    """
     config = _get_config()
+    cache = obtener_cache("tokens")
+    clave = hashlib.sha256(config["huella"] + token.encode("utf-8")).digest() if cache is not None else None
+    if cache is not None:
+        entrada = cache.get(clave)
+        if entrada is not None:
+            exp, payload_data = entrada
+            if exp is None or time.time() < exp:
+                return dict(payload_data)
+            cache.pop(clave)
+            raise JWTError("El token ha expirado.")
+
+    payload_data = _verificar(token, config)
 
+    exp = payload_data.get("exp")
+    if exp is not None:
+        exp = int(exp)
+        if time.time() >= exp:
+            raise JWTError("El token ha expirado.")
+
+    if cache is not None:
+        ttl = None if exp is None else exp - time.time()
+        cache.set(clave, (exp, dict(payload_data)), ttl_seconds=ttl)
+    return payload_data
+
+
+def _verificar(token: str, config: Dict[str, Any]) -> Dict[str, Any]:
     try:
         header_b64, payload_b64, signature_b64 = token.split(".")
     except ValueError as exc:
         raise JWTError("Token con formato invalido.") from exc
 
     signing_input = f"{header_b64}.{payload_b64}".encode("utf-8")
-    expected_signature = _urlsafe_b64encode(_sign(signing_input, config["secret"]))
+    expected_signature = _urlsafe_b64encode(_sign(signing_input, config["hmac"]))
     if not hmac_compare(signature_b64, expected_signature):
         raise JWTError("El token es invalido.")
 
@@ -85,17 +148,8 @@ def decode_token(token: str) -> Dict[str, Any]:
         payload_data = json.loads(_urlsafe_b64decode(payload_b64))
     except json.JSONDecodeError as exc:
         raise JWTError("El token es invalido.") from exc
-
-    exp = payload_data.get("exp")
-    if exp is not None:
-        exp_dt = datetime.fromtimestamp(int(exp), tz=timezone.utc)
-        if datetime.now(timezone.utc) >= exp_dt:
-            raise JWTError("El token ha expirado.")
-
     return payload_data
 
 
 def hmac_compare(signature_a: str, signature_b: str) -> bool:
-    import hmac
-
     return hmac.compare_digest(signature_a, signature_b)
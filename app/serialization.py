@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+"""Serializacion rapida de los modelos de dominio a JSON.
+
+Para cada dataclass de ``app.models`` se genera una sola vez una funcion que
+arma el diccionario leyendo los atributos directamente, en lugar de recorrer
+los campos y copiar en profundidad como ``dataclasses.asdict``. Las fechas y
+los ``Decimal`` se convierten igual que el proveedor JSON de Flask (fecha HTTP
+y cadena), de modo que la respuesta no cambia.
+
+Si ``orjson`` esta instalado y ``JSON_FAST_BACKEND`` esta activo, las
+respuestas de ``jsonify`` se codifican directamente a bytes con el.
+"""
+
+import dataclasses
+import functools
+import json
+import threading
+import typing
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+from app.models import Payment, Reservation, User, Vehicle
+
+try:  # pragma: no cover - depende del entorno
+    import orjson
+except ImportError:  # pragma: no cover - backend opcional
+    orjson = None
+
+Codificador = Callable[[Any], Dict[str, Any]]
+
+_codificadores: Dict[Tuple[type, Optional[Tuple[str, ...]]], Codificador] = {}
+_lock = threading.Lock()
+
+
+# Las reservas repiten pocas fechas distintas; formatearlas domina el costo.
+_fecha_http = functools.lru_cache(maxsize=4096)(http_date)
+
+
+def _fecha(valor: Any) -> Any:
+    if isinstance(valor, date):
+        return _fecha_http(valor)
+    return valor
+
+
+def _decimal(valor: Any) -> Any:
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def _tipo_base(anotacion: Any) -> Any:
+    # Optional[X] -> X
+    argumentos = [arg for arg in typing.get_args(anotacion) if arg is not type(None)]
+    if typing.get_origin(anotacion) is typing.Union and len(argumentos) == 1:
+        return argumentos[0]
+    return anotacion
+
+
+def _generar_codificador(cls: type, campos: Optional[Tuple[str, ...]]) -> Codificador:
+    tipos = typing.get_type_hints(cls)
+    nombres = campos or tuple(campo.name for campo in dataclasses.fields(cls))
+    desconocidos = [nombre for nombre in nombres if nombre not in tipos]
+    if desconocidos:
+        raise ValueError(f"{cls.__name__} no tiene los campos: {', '.join(desconocidos)}.")
+
+    partes = []
+    for nombre in nombres:
+        tipo = _tipo_base(tipos[nombre])
+        if isinstance(tipo, type) and issubclass(tipo, date):
+            expresion = f"_fecha(obj.{nombre})"
+        elif tipo is Decimal:
+            expresion = f"_decimal(obj.{nombre})"
+        else:
+            expresion = f"obj.{nombre}"
+        partes.append(f"{nombre!r}: {expresion}")
+
+    fuente = f"def codificar_{cls.__name__.lower()}(obj):\n    return {{{', '.join(partes)}}}\n"
+    espacio: Dict[str, Any] = {"_fecha": _fecha, "_decimal": _decimal}
+    exec(compile(fuente, f"<serializacion {cls.__name__}>", "exec"), espacio)
+    return espacio[f"codificar_{cls.__name__.lower()}"]
+
+
+def codificador(cls: type, campos: Optional[Sequence[str]] = None) -> Codificador:
+    """Retornar (generando si hace falta) el codificador de ``cls`` para esos campos."""
+    clave = (cls, tuple(dict.fromkeys(campos)) if campos else None)
+    funcion = _codificadores.get(clave)
+    if funcion is None:
+        with _lock:
+            funcion = _codificadores.get(clave)
+            if funcion is None:
+                funcion = _generar_codificador(cls, clave[1])
+                _codificadores[clave] = funcion
+    return funcion
+
+
+def serializar(obj: Any, campos: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Convertir un modelo de dominio en un diccionario listo para JSON."""
+    return codificador(type(obj), campos)(obj)
+
+
+def serializar_lista(objetos: Iterable[Any], campos: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    objetos = list(objetos)
+    if not objetos:
+        return []
+    funcion = codificador(type(objetos[0]), campos)
+    return [funcion(obj) if type(obj) is type(objetos[0]) else serializar(obj, campos) for obj in objetos]
+
+
+# Los modelos conocidos se compilan al importar para no pagar la generacion en una peticion.
+for _modelo in (Vehicle, Reservation, Payment, User):
+    codificador(_modelo)
+
+
+def _por_defecto(valor: Any) -> Any:
+    """Tipos que orjson no codifica igual que Flask."""
+    if isinstance(valor, date):
+        return _fecha_http(valor)
+    if isinstance(valor, (Decimal, uuid.UUID)):
+        return str(valor)
+    if dataclasses.is_dataclass(valor) and not isinstance(valor, type):
+        return serializar(valor)
+    if hasattr(valor, "__html__"):
+        return str(valor.__html__())
+    raise TypeError(f"Object of type {type(valor).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que codifica las respuestas con orjson."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_por_defecto, option=self._opciones()).decode("utf-8")
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        opciones = self._opciones()
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            opciones |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=_por_defecto, option=opciones | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype,
+        )
+
+    def _opciones(self) -> int:
+        # Fechas y dataclasses pasan por _por_defecto para conservar el formato de Flask.
+        opciones = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        return opciones
+
+
+def cargar_json(contenido: bytes) -> Any:
+    """Decodificar JSON con orjson si esta disponible."""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+
+def respuesta_con_items_crudos(items: bytes, **envoltura: Any):
+    """Responder ``{"items": <items>, **envoltura}`` sin volver a codificar ``items``.
+
+    ``items`` debe ser un arreglo JSON ya codificado, p. ej. el cuerpo que
+    envia PostgREST para un listado.
+    """
+    resto = current_app.json.dumps(envoltura).strip()[1:].encode("utf-8")
+    separador = b"," if envoltura else b""
+    return current_app.response_class(
+        b'{"items":' + items + separador + resto + b"\n",
+        mimetype=current_app.json.mimetype,
+    )
+
+
+def init_app(app) -> None:
+    """Usar orjson para las respuestas si esta instalado y habilitado."""
+    if orjson is None or not app.config.get("JSON_FAST_BACKEND", True):
+        return
+    sort_keys = app.json.sort_keys
+    app.json = OrjsonProvider(app)
+    app.json.sort_keys = sort_keys
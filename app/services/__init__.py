@@ -1,19 +1,33 @@
 """Paquete de la capa de servicios."""
 
-from .vehicle_service import VehicleService
+from .vehicle_service import VehicleService, invalidar_busquedas
 from .reservation_service import ReservationService
-from .user_service import UserService, DatosInvalidosError, UsuarioExistenteError
+from .user_service import (
+    UserService,
+    DatosInvalidosError,
+    UsuarioExistenteError,
+    invalidar_usuario_en_cache,
+)
 from .auth_service import AuthService, CredencialesInvalidasError
-from .payment_service import PaymentService, PagoFallidoError
+from .payment_service import PaymentService, PagoFallidoError, PasarelaPagos, ResultadoCobro
+from .password_hasher import ServicioSaturadoError
+from .refresh_token_service import RefreshTokenInvalidoError, RefreshTokenService
 
 __all__ = [
     "VehicleService",
+    "invalidar_busquedas",
     "ReservationService",
     "UserService",
     "DatosInvalidosError",
     "UsuarioExistenteError",
+    "invalidar_usuario_en_cache",
     "AuthService",
     "CredencialesInvalidasError",
     "PaymentService",
     "PagoFallidoError",
+    "PasarelaPagos",
+    "ResultadoCobro",
+    "ServicioSaturadoError",
+    "RefreshTokenInvalidoError",
+    "RefreshTokenService",
 ]
@@ -2,14 +2,19 @@ from __future__ import annotations
 
 """Servicios relacionados con la autenticacion de usuarios."""
 
+import logging
 from dataclasses import asdict
 from typing import Dict, Optional
 
-from werkzeug.security import check_password_hash
-
 from app.models import User
 from app.repositories import UserRepository
-from app.security import create_access_token
+from app.security import JWTError, create_access_token, decode_token
+
+from .password_hasher import generar_hash, necesita_rehash, verificar_hash
+from .refresh_token_service import RefreshTokenService
+from .token_revocation import obtener_lista_revocacion
+
+logger = logging.getLogger(__name__)
 
 
 class CredencialesInvalidasError(ValueError):
@@ -19,8 +24,13 @@ class CredencialesInvalidasError(ValueError):
 class AuthService:
     """Gestiona la autenticacion y generacion de tokens."""
 
-    def __init__(self, repository: Optional[UserRepository] = None) -> None:
+    def __init__(
+        self,
+        repository: Optional[UserRepository] = None,
+        refresh_tokens: Optional[RefreshTokenService] = None,
+    ) -> None:
         self._repository = repository or UserRepository()
+        self._refresh_tokens = refresh_tokens or RefreshTokenService()
 
     def autenticar(self, email: str, password: str) -> Dict[str, object]:
         """Verificar credenciales y devolver datos y token."""
@@ -31,24 +41,62 @@ class AuthService:
         if not registro or not registro.get("password_hash"):
             raise CredencialesInvalidasError("Credenciales invalidas.")
 
-        if not check_password_hash(registro["password_hash"], password):
+        if not verificar_hash(registro["password_hash"], password):
             raise CredencialesInvalidasError("Credenciales invalidas.")
 
+        if necesita_rehash(registro["password_hash"]):
+            self._actualizar_hash(registro, password)
+
         usuario = self._convertir_a_modelo(registro)
-        token = create_access_token(
-            usuario.id,
-            {"email": usuario.email, "rol": usuario.rol},
-        )
+        token = self.generar_token_para_usuario(usuario)
         payload = asdict(usuario)
         payload["access_token"] = token
+        payload["refresh_token"] = self._refresh_tokens.emitir(usuario.id)
         return payload
 
+    def renovar(self, refresh_token: str) -> Dict[str, str]:
+        """Intercambiar un token de renovacion por un nuevo par de tokens."""
+        registro, nuevo_refresh = self._refresh_tokens.rotar(refresh_token)
+        usuario = self._convertir_a_modelo(registro)
+        return {
+            "access_token": self.generar_token_para_usuario(usuario),
+            "refresh_token": nuevo_refresh,
+        }
+
+    def cerrar_sesion(self, refresh_token: str, access_token: Optional[str] = None) -> None:
+        """Revocar la sesion asociada al token de renovacion.
+
+        En modo ``JWT_STATELESS_AUTH`` el token de acceso, si se envia, se
+        revoca por su ``jti`` para que deje de servir antes de expirar.
+        """
+        self._refresh_tokens.revocar(refresh_token)
+        revocaciones = obtener_lista_revocacion()
+        if not access_token or revocaciones is None:
+            return
+        try:
+            payload = decode_token(access_token)
+        except JWTError:
+            # Un token ya vencido o invalido no necesita revocarse.
+            return
+        revocaciones.revocar_token(payload)
+
     def generar_token_para_usuario(self, usuario: User) -> str:
+        # Los claims bastan para autorizar en modo JWT_STATELESS_AUTH sin consultar la base.
         return create_access_token(
             usuario.id,
-            {"email": usuario.email, "rol": usuario.rol},
+            {"email": usuario.email, "rol": usuario.rol, "nombre": usuario.nombre},
         )
 
+    def _actualizar_hash(self, registro: dict[str, object], password: str) -> None:
+        # Mejora oportunista: un fallo aqui no debe impedir el inicio de sesion.
+        try:
+            nuevo = generar_hash(password)
+            self._repository.actualizar_password_hash(
+                str(registro.get("id")), str(registro["password_hash"]), nuevo
+            )
+        except Exception:
+            logger.warning("No fue posible actualizar el hash de la contrasena.", exc_info=True)
+
     def _convertir_a_modelo(self, registro: dict[str, object]) -> User:
         return User(
             id=str(registro.get("id")),
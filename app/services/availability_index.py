@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+"""Indice en memoria de las reservas vigentes de cada vehiculo."""
+
+import logging
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+from typing import Callable, Iterable, Optional
+
+from flask import current_app
+
+from app.repositories import ReservationRepository
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "availability_index"
+
+
+class _Instantanea:
+    """Reservas e intervalos fusionados de una carga del indice."""
+
+    def __init__(self) -> None:
+        self.reservas: dict[str, tuple[str, int, int, str]] = {}
+        self.por_vehiculo: dict[str, set[str]] = {}
+        self.intervalos: dict[str, tuple[list[int], list[int]]] = {}
+
+    def agregar(self, registro: dict[str, object]) -> Optional[str]:
+        estado = str(registro.get("status") or "confirmada").lower()
+        if estado == "cancelada":
+            return None
+        reserva_id = str(registro.get("id"))
+        vehicle_id = str(registro.get("vehicle_id"))
+        inicio = _a_ordinal(registro.get("start_date"))
+        fin = _a_ordinal(registro.get("end_date"))
+        self.reservas[reserva_id] = (vehicle_id, inicio, fin, estado)
+        self.por_vehiculo.setdefault(vehicle_id, set()).add(reserva_id)
+        return vehicle_id
+
+    def quitar(self, reserva_id: str) -> Optional[str]:
+        entrada = self.reservas.pop(reserva_id, None)
+        if entrada is None:
+            return None
+        vehicle_id = entrada[0]
+        ids = self.por_vehiculo.get(vehicle_id)
+        if ids is not None:
+            ids.discard(reserva_id)
+            if not ids:
+                del self.por_vehiculo[vehicle_id]
+        return vehicle_id
+
+    def fusionar(self, vehicle_id: str) -> None:
+        rangos = sorted(self.reservas[reserva_id][1:3] for reserva_id in self.por_vehiculo.get(vehicle_id, ()))
+        if not rangos:
+            self.intervalos.pop(vehicle_id, None)
+            return
+        inicios: list[int] = []
+        fines: list[int] = []
+        for inicio, fin in rangos:
+            if fines and inicio <= fines[-1] + 1:
+                fines[-1] = max(fines[-1], fin)
+            else:
+                inicios.append(inicio)
+                fines.append(fin)
+        self.intervalos[vehicle_id] = (inicios, fines)
+
+
+class AvailabilityIndex:
+    """Intervalos ocupados por vehiculo, ordenados y sin solapamientos.
+
+    Cada vehiculo guarda dos listas paralelas con los inicios y fines (en
+    ordinales de fecha) de sus intervalos ocupados ya fusionados, de modo que
+    consultar si un rango esta libre cuesta una busqueda binaria. El indice se
+    carga desde la tabla de reservas y se recarga cuando vence ``ttl_seconds``
+    para incorporar cambios hechos por otros procesos.
+
+    La recarga se construye fuera del candado y luego reemplaza a la anterior,
+    por lo que las consultas siguen respondiendo mientras tanto; las altas y
+    bajas que ocurren durante la lectura se vuelven a aplicar sobre la nueva
+    carga. Si las recargas fallan durante ``max_stale_seconds`` el indice se
+    descarta y las consultas vuelven a la base de datos.
+    """
+
+    def __init__(
+        self,
+        repository: Optional[ReservationRepository] = None,
+        *,
+        ttl_seconds: float = 60,
+        max_stale_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._repository = repository or ReservationRepository()
+        self._ttl_seconds = ttl_seconds
+        self._max_stale_seconds = max_stale_seconds if max_stale_seconds is not None else ttl_seconds * 5
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._carga_lock = threading.Lock()
+        self._estado = _Instantanea()
+        self._cambios: Optional[list[tuple[str, object]]] = None
+        self._desde: Optional[int] = None
+        self._cargado_en: Optional[float] = None
+        self._intentado_en: Optional[float] = None
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    def cargar(self, desde: Optional[date] = None) -> None:
+        """Reconstruir el indice con las reservas vigentes."""
+        with self._carga_lock:
+            self._recargar(desde or date.today())
+
+    def _recargar(self, inicio: date) -> None:
+        # Se llama con ``_carga_lock`` tomado; ``_lock`` solo se toma para el reemplazo.
+        with self._lock:
+            self._cambios = []
+        try:
+            registros = self._repository.listar_vigentes(inicio)
+            estado = _Instantanea()
+            for registro in registros:
+                estado.agregar(registro)
+        except BaseException:
+            with self._lock:
+                self._cambios = None
+            raise
+        with self._lock:
+            # Altas y bajas hechas por este proceso mientras se leia la tabla.
+            for operacion, dato in self._cambios:
+                if operacion == "registrar":
+                    estado.agregar(dato)
+                else:
+                    estado.quitar(dato)
+            self._cambios = None
+            for vehicle_id in estado.por_vehiculo:
+                estado.fusionar(vehicle_id)
+            self._estado = estado
+            self._desde = inicio.toordinal()
+            self._cargado_en = self._clock()
+
+    def _asegurar_cargado(self) -> bool:
+        ahora = self._clock()
+        with self._lock:
+            vigente = self._cargado_en is not None and ahora - self._cargado_en < self._ttl_seconds
+            if vigente:
+                return True
+            if self._intentado_en is not None and ahora - self._intentado_en < self._ttl_seconds:
+                # Otra solicitud esta recargando o la ultima recarga fallo hace poco.
+                return self._cargado_en is not None
+            self._intentado_en = ahora
+        if not self._carga_lock.acquire(blocking=False):
+            # Ya hay una recarga en curso: se responde con la carga anterior si existe.
+            with self._lock:
+                return self._cargado_en is not None
+        try:
+            self._recargar(date.today())
+            return True
+        except Exception:
+            logger.warning("No fue posible cargar el indice de disponibilidad.", exc_info=True)
+        finally:
+            self._carga_lock.release()
+        with self._lock:
+            if self._cargado_en is not None and self._clock() - self._cargado_en >= self._max_stale_seconds:
+                logger.warning("Se descarta el indice de disponibilidad por estar desactualizado.")
+                self._descartar()
+            return self._cargado_en is not None
+
+    def _descartar(self) -> None:
+        self._estado = _Instantanea()
+        self._desde = None
+        self._cargado_en = None
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def vehiculo_libre(self, vehicle_id: str, fecha_inicio: date, fecha_fin: date) -> Optional[bool]:
+        """Indicar si el vehiculo no tiene reservas en el rango.
+
+        Retorna ``None`` cuando el indice no puede responder y se debe
+        consultar la base de datos.
+        """
+        libres = self.vehiculos_libres([vehicle_id], fecha_inicio, fecha_fin)
+        if libres is None:
+            return None
+        return vehicle_id in libres
+
+    def vehiculos_libres(
+        self,
+        vehicle_ids: Iterable[str],
+        fecha_inicio: date,
+        fecha_fin: date,
+    ) -> Optional[set[str]]:
+        """Retornar el subconjunto de vehiculos sin reservas en el rango."""
+        if not self._asegurar_cargado():
+            return None
+        inicio = fecha_inicio.toordinal()
+        fin = fecha_fin.toordinal()
+        with self._lock:
+            if self._desde is None or inicio < self._desde:
+                return None
+            libres: set[str] = set()
+            for vehicle_id in vehicle_ids:
+                intervalos = self._estado.intervalos.get(vehicle_id)
+                if intervalos is None:
+                    libres.add(vehicle_id)
+                    continue
+                inicios, fines = intervalos
+                posicion = bisect_right(inicios, fin)
+                if posicion == 0 or fines[posicion - 1] < inicio:
+                    libres.add(vehicle_id)
+            return libres
+
+    def reservas_de_vehiculo(self, vehicle_id: str, desde: date) -> Optional[list[dict[str, object]]]:
+        """Listar las reservas vigentes del vehiculo que terminan desde la fecha dada."""
+        if not self._asegurar_cargado():
+            return None
+        limite = desde.toordinal()
+        with self._lock:
+            if self._desde is None or limite < self._desde:
+                return None
+            reservas = [
+                (self._estado.reservas[reserva_id], reserva_id)
+                for reserva_id in self._estado.por_vehiculo.get(vehicle_id, ())
+                if self._estado.reservas[reserva_id][2] >= limite
+            ]
+        reservas.sort(key=lambda par: par[0][1])
+        return [
+            {
+                "id": reserva_id,
+                "start_date": date.fromordinal(inicio).isoformat(),
+                "end_date": date.fromordinal(fin).isoformat(),
+                "status": estado,
+            }
+            for (_, inicio, fin, estado), reserva_id in reservas
+        ]
+
+    # ------------------------------------------------------------------
+    # Actualizaciones
+    # ------------------------------------------------------------------
+    def registrar(self, registro: dict[str, object]) -> None:
+        """Incorporar una reserva recien creada."""
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append(("registrar", dict(registro)))
+            if self._cargado_en is None:
+                return
+            vehicle_id = self._estado.agregar(registro)
+            if vehicle_id is not None:
+                self._estado.fusionar(vehicle_id)
+
+    def eliminar(self, reserva_id: str) -> None:
+        """Retirar una reserva cancelada."""
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append(("eliminar", str(reserva_id)))
+            vehicle_id = self._estado.quitar(str(reserva_id))
+            if vehicle_id is not None:
+                self._estado.fusionar(vehicle_id)
+
+
+def _a_ordinal(valor: object) -> int:
+    if isinstance(valor, date):
+        return valor.toordinal()
+    return date.fromisoformat(str(valor)).toordinal()
+
+
+def init_app(app) -> None:
+    """Registrar el indice de disponibilidad en la aplicacion."""
+    if not app.config.get("AVAILABILITY_INDEX_ENABLED", False):
+        app.extensions.pop(EXTENSION_KEY, None)
+        return
+    app.extensions[EXTENSION_KEY] = AvailabilityIndex(
+        ttl_seconds=float(app.config.get("AVAILABILITY_INDEX_TTL_SECONDS", 60)),
+        max_stale_seconds=float(app.config.get("AVAILABILITY_INDEX_MAX_STALE_SECONDS", 300)),
+    )
+
+
+def obtener_indice() -> Optional[AvailabilityIndex]:
+    """Retornar el indice de la aplicacion activa, si esta habilitado."""
+    try:
+        return current_app.extensions.get(EXTENSION_KEY)
+    except RuntimeError:
+        return None
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+"""Autocompletado de ciudades sobre un trie en memoria del catalogo."""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.normalization import normalizar_ciudad
+
+
+class _Nodo:
+    __slots__ = ("hijos", "sugerencias")
+
+    def __init__(self) -> None:
+        self.hijos: Dict[str, _Nodo] = {}
+        self.sugerencias: List[int] = []
+
+
+class CityTrie:
+    """Trie de prefijos normalizados con las mejores sugerencias por nodo.
+
+    Cada ciudad se indexa desde el inicio de cada palabra ("santa marta"
+    responde a "sa" y a "mar"). Cada nodo guarda de antemano hasta
+    ``max_sugerencias`` ciudades ordenadas por vehiculos activos, de modo que
+    responder cuesta O(largo del prefijo) sin importar el tamano del catalogo.
+    """
+
+    def __init__(self, ciudades: Iterable[Dict[str, Any]], *, max_sugerencias: int = 10) -> None:
+        self._ciudades = sorted(
+            (dict(ciudad) for ciudad in ciudades),
+            key=lambda ciudad: (-int(ciudad.get("vehiculos_activos") or 0), str(ciudad["nombre"]).lower()),
+        )
+        self._max = max_sugerencias
+        self._raiz = _Nodo()
+        for posicion, ciudad in enumerate(self._ciudades):
+            clave = normalizar_ciudad(str(ciudad["nombre"]))
+            inicios = {0} | {indice + 1 for indice, caracter in enumerate(clave) if caracter == " "}
+            for inicio in sorted(inicios):
+                self._insertar(clave[inicio:], posicion)
+
+    def sugerir(self, prefijo: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        clave = normalizar_ciudad(prefijo)
+        if not clave:
+            return []
+        nodo = self._raiz
+        for caracter in clave:
+            nodo = nodo.hijos.get(caracter)
+            if nodo is None:
+                return []
+        cantidad = self._max if limit is None else min(limit, self._max)
+        return [dict(self._ciudades[posicion]) for posicion in nodo.sugerencias[:cantidad]]
+
+    def _insertar(self, clave: str, posicion: int) -> None:
+        nodo = self._raiz
+        for caracter in clave:
+            nodo = nodo.hijos.setdefault(caracter, _Nodo())
+            # Las ciudades llegan en orden de relevancia: basta con no repetir ni pasar el tope.
+            if len(nodo.sugerencias) < self._max and posicion not in nodo.sugerencias:
+                nodo.sugerencias.append(posicion)
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+"""Calendario de ocupacion por dias para toda la flota usando NumPy."""
+
+import calendar
+import logging
+import threading
+import time
+from datetime import date
+from typing import Callable, Iterable, Optional
+
+from flask import current_app
+
+from app.repositories import ReservationRepository
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "fleet_calendar"
+
+
+class _Matriz:
+    """Filas, dias ocupados y reservas de una carga del calendario."""
+
+    def __init__(self, origen: int, horizon_days: int, vehiculos: Iterable[str] = ()) -> None:
+        self.origen = origen
+        self.horizon_days = horizon_days
+        self.filas: dict[str, int] = {vehicle_id: fila for fila, vehicle_id in enumerate(sorted(set(vehiculos)))}
+        self.matriz = np.zeros((len(self.filas), horizon_days), dtype=np.bool_)
+        self.reservas: dict[str, tuple[str, int, int]] = {}
+        self.por_vehiculo: dict[str, set[str]] = {}
+
+    def agregar(self, registro: dict[str, object]) -> None:
+        if str(registro.get("status") or "").lower() == "cancelada":
+            return
+        reserva_id = str(registro.get("id"))
+        vehicle_id = str(registro.get("vehicle_id"))
+        inicio = _a_ordinal(registro.get("start_date"))
+        fin = _a_ordinal(registro.get("end_date"))
+        fila = self.filas.get(vehicle_id)
+        if fila is None:
+            fila = self._agregar_fila(vehicle_id)
+        self.reservas[reserva_id] = (vehicle_id, inicio, fin)
+        self.por_vehiculo.setdefault(vehicle_id, set()).add(reserva_id)
+        self._marcar(fila, inicio, fin)
+
+    def quitar(self, reserva_id: str) -> None:
+        entrada = self.reservas.pop(reserva_id, None)
+        if entrada is None:
+            return
+        vehicle_id = entrada[0]
+        restantes = self.por_vehiculo.get(vehicle_id, set())
+        restantes.discard(reserva_id)
+        fila = self.filas[vehicle_id]
+        self.matriz[fila, :] = False
+        for otra in restantes:
+            _, inicio, fin = self.reservas[otra]
+            self._marcar(fila, inicio, fin)
+
+    def _agregar_fila(self, vehicle_id: str) -> int:
+        fila = len(self.filas)
+        if fila >= self.matriz.shape[0]:
+            extra = np.zeros((max(fila, 16), self.horizon_days), dtype=np.bool_)
+            self.matriz = np.vstack([self.matriz, extra])
+        self.filas[vehicle_id] = fila
+        return fila
+
+    def _marcar(self, fila: int, inicio: int, fin: int) -> None:
+        desde = max(inicio - self.origen, 0)
+        hasta = min(fin - self.origen + 1, self.horizon_days)
+        if desde < hasta:
+            self.matriz[fila, desde:hasta] = True
+
+
+class FleetCalendar:
+    """Matriz booleana vehiculo x dia con las reservas vigentes de la flota.
+
+    La columna 0 corresponde al primer dia del mes en curso y la matriz cubre
+    ``horizon_days`` dias. Saber que vehiculos estan libres en un rango es un
+    corte de columnas seguido de ``any`` por fila para todos los candidatos a
+    la vez.
+
+    Como en :class:`~app.services.availability_index.AvailabilityIndex`, la
+    recarga arma la matriz fuera del candado y la reemplaza al final, aplicando
+    de nuevo las altas y bajas ocurridas durante la lectura. Si las recargas
+    fallan durante ``max_stale_seconds`` el calendario se descarta y las
+    consultas vuelven a la base de datos.
+    """
+
+    def __init__(
+        self,
+        repository: Optional[ReservationRepository] = None,
+        *,
+        horizon_days: int = 365,
+        ttl_seconds: float = 300,
+        max_stale_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("El calendario de flota requiere el paquete \"numpy\".")
+        self._repository = repository or ReservationRepository()
+        self._horizon_days = horizon_days
+        self._ttl_seconds = ttl_seconds
+        self._max_stale_seconds = max_stale_seconds if max_stale_seconds is not None else ttl_seconds * 5
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._carga_lock = threading.Lock()
+        self._estado: Optional[_Matriz] = None
+        self._cambios: Optional[list[tuple[str, object]]] = None
+        self._cargado_en: Optional[float] = None
+        self._intentado_en: Optional[float] = None
+
+    @property
+    def memoria_bytes(self) -> int:
+        estado = self._estado
+        return int(estado.matriz.nbytes) if estado is not None else 0
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    def cargar(self, origen: Optional[date] = None) -> None:
+        """Reconstruir la matriz a partir de las reservas vigentes."""
+        with self._carga_lock:
+            self._recargar(origen or date.today().replace(day=1))
+
+    def _recargar(self, inicio: date) -> None:
+        # Se llama con ``_carga_lock`` tomado; ``_lock`` solo se toma para el reemplazo.
+        with self._lock:
+            self._cambios = []
+        try:
+            registros = self._repository.listar_vigentes(inicio)
+            estado = _Matriz(
+                inicio.toordinal(),
+                self._horizon_days,
+                (str(registro.get("vehicle_id")) for registro in registros),
+            )
+            for registro in registros:
+                estado.agregar(registro)
+        except BaseException:
+            with self._lock:
+                self._cambios = None
+            raise
+        with self._lock:
+            # Altas y bajas hechas por este proceso mientras se leia la tabla.
+            for operacion, dato in self._cambios:
+                if operacion == "registrar":
+                    estado.agregar(dato)
+                else:
+                    estado.quitar(dato)
+            self._cambios = None
+            self._estado = estado
+            self._cargado_en = self._clock()
+
+    def _asegurar_cargado(self) -> bool:
+        ahora = self._clock()
+        with self._lock:
+            if self._cargado_en is not None and ahora - self._cargado_en < self._ttl_seconds:
+                return True
+            if self._intentado_en is not None and ahora - self._intentado_en < self._ttl_seconds:
+                # Otra solicitud esta recargando o la ultima recarga fallo hace poco.
+                return self._cargado_en is not None
+            self._intentado_en = ahora
+        if not self._carga_lock.acquire(blocking=False):
+            # Ya hay una recarga en curso: se responde con la matriz anterior si existe.
+            with self._lock:
+                return self._cargado_en is not None
+        try:
+            self._recargar(date.today().replace(day=1))
+            return True
+        except Exception:
+            logger.warning("No fue posible cargar el calendario de flota.", exc_info=True)
+        finally:
+            self._carga_lock.release()
+        with self._lock:
+            if self._cargado_en is not None and self._clock() - self._cargado_en >= self._max_stale_seconds:
+                logger.warning("Se descarta el calendario de flota por estar desactualizado.")
+                self._estado = None
+                self._cargado_en = None
+            return self._cargado_en is not None
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def vehiculos_libres(
+        self,
+        vehicle_ids: Iterable[str],
+        fecha_inicio: date,
+        fecha_fin: date,
+    ) -> Optional[set[str]]:
+        """Retornar los vehiculos sin ningun dia ocupado en el rango.
+
+        Retorna ``None`` si el rango cae fuera del horizonte cargado.
+        """
+        if not self._asegurar_cargado():
+            return None
+        ids = list(vehicle_ids)
+        with self._lock:
+            columnas = self._columnas(fecha_inicio, fecha_fin)
+            if columnas is None:
+                return None
+            desde, hasta = columnas
+            estado = self._estado
+            filas = np.fromiter((estado.filas.get(vehicle_id, -1) for vehicle_id in ids), dtype=np.int64, count=len(ids))
+            conocidos = filas >= 0
+            ocupados = np.zeros(len(ids), dtype=np.bool_)
+            if conocidos.any():
+                ocupados[conocidos] = estado.matriz[filas[conocidos], desde:hasta].any(axis=1)
+        return {vehicle_id for vehicle_id, ocupado in zip(ids, ocupados.tolist()) if not ocupado}
+
+    def calendario_mensual(self, vehicle_id: str, anio: int, mes: int) -> Optional[str]:
+        """Retornar un caracter por dia del mes: ``1`` ocupado, ``0`` libre."""
+        if not self._asegurar_cargado():
+            return None
+        dias = calendar.monthrange(anio, mes)[1]
+        with self._lock:
+            columnas = self._columnas(date(anio, mes, 1), date(anio, mes, dias))
+            if columnas is None:
+                return None
+            fila = self._estado.filas.get(vehicle_id)
+            if fila is None:
+                return "0" * dias
+            desde, hasta = columnas
+            return "".join("1" if ocupado else "0" for ocupado in self._estado.matriz[fila, desde:hasta].tolist())
+
+    def _columnas(self, fecha_inicio: date, fecha_fin: date) -> Optional[tuple[int, int]]:
+        if self._estado is None:
+            return None
+        desde = fecha_inicio.toordinal() - self._estado.origen
+        hasta = fecha_fin.toordinal() - self._estado.origen + 1
+        if desde < 0 or hasta > self._horizon_days or desde >= hasta:
+            return None
+        return desde, hasta
+
+    # ------------------------------------------------------------------
+    # Actualizaciones
+    # ------------------------------------------------------------------
+    def registrar(self, registro: dict[str, object]) -> None:
+        """Marcar los dias de una reserva recien creada."""
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append(("registrar", dict(registro)))
+            if self._estado is None:
+                return
+            self._estado.agregar(registro)
+
+    def eliminar(self, reserva_id: str) -> None:
+        """Liberar los dias de una reserva cancelada."""
+        with self._lock:
+            if self._cambios is not None:
+                self._cambios.append(("eliminar", str(reserva_id)))
+            if self._estado is not None:
+                self._estado.quitar(str(reserva_id))
+
+
+def _a_ordinal(valor: object) -> int:
+    if isinstance(valor, date):
+        return valor.toordinal()
+    return date.fromisoformat(str(valor)).toordinal()
+
+
+def init_app(app) -> None:
+    """Registrar el calendario de flota si esta habilitado y NumPy existe."""
+    app.extensions.pop(EXTENSION_KEY, None)
+    if not app.config.get("FLEET_CALENDAR_ENABLED", False):
+        return
+    if np is None:
+        app.logger.warning("El calendario de flota no esta disponible; instala el paquete \"numpy\".")
+        return
+    app.extensions[EXTENSION_KEY] = FleetCalendar(
+        horizon_days=int(app.config.get("FLEET_CALENDAR_HORIZON_DAYS", 365)),
+        ttl_seconds=float(app.config.get("FLEET_CALENDAR_TTL_SECONDS", 300)),
+        max_stale_seconds=float(app.config.get("FLEET_CALENDAR_MAX_STALE_SECONDS", 1500)),
+    )
+
+
+def obtener_calendario() -> Optional[FleetCalendar]:
+    """Retornar el calendario de la aplicacion activa, si esta habilitado."""
+    try:
+        return current_app.extensions.get(EXTENSION_KEY)
+    except RuntimeError:
+        return None
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+"""Almacen de respuestas para solicitudes con ``Idempotency-Key``."""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+EXTENSION_KEY = "idempotency"
+
+
+class ClaveReutilizadaError(ValueError):
+    """Se lanza cuando la clave ya se uso con un cuerpo de solicitud distinto."""
+
+
+class SolicitudEnCursoError(RuntimeError):
+    """Se lanza cuando la solicitud original no termino dentro del tiempo de espera."""
+
+
+@dataclass(frozen=True)
+class RespuestaGuardada:
+    status: int
+    cuerpo: bytes
+    mimetype: Optional[str] = None
+    headers: Tuple[Tuple[str, str], ...] = ()
+
+
+class AlmacenIdempotencia(ABC):
+    """Interfaz del almacen; un backend compartido (p. ej. Redis) la implementa.
+
+    ``iniciar`` reserva la clave para la solicitud actual y retorna ``None``, o
+    retorna la respuesta guardada si la clave ya se completo. Si otra
+    solicitud con la misma clave esta en curso, espera hasta ``espera``
+    segundos a que termine. ``completar`` guarda la respuesta durante ``ttl``
+    segundos y ``abandonar`` libera la clave para que un reintento la procese.
+    """
+
+    @abstractmethod
+    def iniciar(self, clave: str, huella: str, *, ttl: float, espera: float) -> Optional[RespuestaGuardada]:
+        """Reservar la clave o retornar la respuesta ya guardada."""
+
+    @abstractmethod
+    def completar(self, clave: str, respuesta: RespuestaGuardada, *, ttl: float) -> None:
+        """Guardar la respuesta de la solicitud que reservo la clave."""
+
+    @abstractmethod
+    def abandonar(self, clave: str) -> None:
+        """Liberar la clave sin guardar respuesta."""
+
+
+@dataclass
+class _Entrada:
+    huella: str
+    expira: float
+    respuesta: Optional[RespuestaGuardada] = None
+
+
+class AlmacenIdempotenciaMemoria(AlmacenIdempotencia):
+    """Almacen por proceso; las solicitudes duplicadas esperan con una condicion.
+
+    No coordina entre procesos: con varios workers usa un backend compartido
+    mediante ``IDEMPOTENCY_STORE``.
+    """
+
+    def __init__(self, *, max_entradas: int = 10_000, clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_entradas = max_entradas
+        self._clock = clock
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+        self._condicion = threading.Condition()
+
+    def iniciar(self, clave: str, huella: str, *, ttl: float, espera: float) -> Optional[RespuestaGuardada]:
+        limite = self._clock() + espera
+        with self._condicion:
+            while True:
+                ahora = self._clock()
+                self._purgar(ahora)
+                entrada = self._entradas.get(clave)
+                if entrada is None:
+                    self._entradas[clave] = _Entrada(huella=huella, expira=ahora + ttl)
+                    self._desalojar()
+                    return None
+                if entrada.huella != huella:
+                    raise ClaveReutilizadaError("La Idempotency-Key ya se uso con otra solicitud.")
+                if entrada.respuesta is not None:
+                    return entrada.respuesta
+                if ahora >= limite:
+                    raise SolicitudEnCursoError("Una solicitud con esta Idempotency-Key sigue en proceso.")
+                self._condicion.wait(limite - ahora)
+
+    def completar(self, clave: str, respuesta: RespuestaGuardada, *, ttl: float) -> None:
+        with self._condicion:
+            entrada = self._entradas.pop(clave, None)
+            if entrada is not None:
+                entrada.respuesta = respuesta
+                entrada.expira = self._clock() + ttl
+                self._entradas[clave] = entrada
+            self._condicion.notify_all()
+
+    def abandonar(self, clave: str) -> None:
+        with self._condicion:
+            self._entradas.pop(clave, None)
+            self._condicion.notify_all()
+
+    def _purgar(self, ahora: float) -> None:
+        # Las entradas se reinsertan al completarse, asi que las mas antiguas vencen primero.
+        while self._entradas:
+            clave, entrada = next(iter(self._entradas.items()))
+            if entrada.expira > ahora:
+                return
+            del self._entradas[clave]
+
+
+    def _desalojar(self) -> None:
+        # Solo se desalojan respuestas ya guardadas, de la mas antigua a la mas
+        # reciente: una clave en curso que se descartara dejaria pasar un
+        # reintento duplicado. Si todas estan en curso el almacen excede el
+        # limite hasta que se completen o venzan.
+        exceso = len(self._entradas) - self._max_entradas
+        if exceso <= 0:
+            return
+        completadas = [clave for clave, entrada in self._entradas.items() if entrada.respuesta is not None]
+        for clave in completadas[:exceso]:
+            del self._entradas[clave]
+
+
+def init_app(app) -> None:
+    """Crear el almacen configurado en ``IDEMPOTENCY_STORE`` o uno en memoria."""
+    app.extensions.pop(EXTENSION_KEY, None)
+    if not app.config.get("IDEMPOTENCY_ENABLED", True):
+        return
+    ruta = app.config.get("IDEMPOTENCY_STORE")
+    if ruta:
+        app.extensions[EXTENSION_KEY] = import_string(ruta)()
+        return
+    app.extensions[EXTENSION_KEY] = AlmacenIdempotenciaMemoria(
+        max_entradas=int(app.config.get("IDEMPOTENCY_MAX_ENTRIES", 10_000)),
+    )
+
+
+def obtener_almacen() -> Optional[AlmacenIdempotencia]:
+    """Retornar el almacen de la aplicacion activa, si existe."""
+    try:
+        return current_app.extensions.get(EXTENSION_KEY)
+    except RuntimeError:
+        return None
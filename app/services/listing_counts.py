@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+"""Estrategias para calcular el total de los listados paginados."""
+
+from typing import Any, Callable, Hashable, Optional, Sequence, Tuple
+
+from flask import current_app
+
+from app.cache import obtener_cache
+
+ESTRATEGIA_EXACTA = "exact"
+ESTRATEGIA_ESTIMADA = "planned"
+ESTRATEGIA_CACHEADA = "cached"
+ESTRATEGIAS = {ESTRATEGIA_EXACTA, ESTRATEGIA_ESTIMADA, ESTRATEGIA_CACHEADA}
+
+
+def estrategia_configurada() -> str:
+    """Leer ``LISTING_COUNT_STRATEGY``; sin aplicacion activa se cuenta exacto."""
+    try:
+        valor = str(current_app.config.get("LISTING_COUNT_STRATEGY", ESTRATEGIA_EXACTA))
+    except RuntimeError:
+        return ESTRATEGIA_EXACTA
+    valor = valor.strip().lower()
+    return valor if valor in ESTRATEGIAS else ESTRATEGIA_EXACTA
+
+
+class ConteoListado:
+    """Decide como pedir el total de un listado y como interpretarlo.
+
+    - ``exact``: ``count=exact`` en cada pagina.
+    - ``planned``: estimacion del planificador de Postgres (``count=planned``).
+    - ``cached``: conteo exacto recordado en la cache ``conteos`` por la clave
+      normalizada de filtros; las paginas siguientes no vuelven a contar.
+
+    Cuando la pagina viene incompleta el total se deduce de ``offset`` y las
+    filas recibidas, que es exacto sin importar la estrategia.
+    """
+
+    def __init__(self, clave: Hashable, estrategia: Optional[str] = None) -> None:
+        self.estrategia = estrategia or estrategia_configurada()
+        self._clave = clave
+        self._cache = obtener_cache("conteos") if self.estrategia == ESTRATEGIA_CACHEADA else None
+        self._cacheado: Optional[int] = self._cache.get(clave) if self._cache is not None else None
+
+    @property
+    def metodo(self) -> Optional[str]:
+        """Valor de ``count`` para PostgREST, o ``None`` si no hace falta contar."""
+        if self._cacheado is not None:
+            return None
+        if self.estrategia == ESTRATEGIA_ESTIMADA:
+            return ESTRATEGIA_ESTIMADA
+        return ESTRATEGIA_EXACTA
+
+    def total(self, respuesta: Any, filas: Sequence[Any], *, limit: int, offset: int) -> Tuple[int, str]:
+        """Retornar ``(total, estrategia_que_lo_produjo)``."""
+        if len(filas) < limit and (filas or offset == 0):
+            total, origen = offset + len(filas), ESTRATEGIA_EXACTA
+        elif self._cacheado is not None:
+            return self._cacheado, ESTRATEGIA_CACHEADA
+        else:
+            contado = getattr(respuesta, "count", None)
+            total = max(contado or 0, offset + len(filas))
+            origen = self.metodo or ESTRATEGIA_EXACTA
+        if self._cache is not None and origen == ESTRATEGIA_EXACTA:
+            self._cache.set(self._clave, total)
+        return total, origen
+
+
+def invalidar_conteos(*claves: Hashable) -> None:
+    """Descartar totales cacheados que una escritura acaba de cambiar."""
+    cache = obtener_cache("conteos")
+    if cache is None:
+        return
+    for clave in claves:
+        cache.pop(clave)
+
+
+def invalidar_conteos_donde(predicado: Callable[[Hashable], bool]) -> None:
+    """Descartar los totales cacheados cuya clave cumple ``predicado``."""
+    cache = obtener_cache("conteos")
+    if cache is not None:
+        cache.invalidar_donde(predicado)
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+"""Ejecucion acotada de hashing de contrasenas fuera del worker web."""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+EXTENSION_KEY = "password_hasher"
+
+
+class ServicioSaturadoError(RuntimeError):
+    """Se lanza cuando no hay capacidad para atender la operacion en este momento."""
+
+    def __init__(self, mensaje: str, retry_after: int = 1) -> None:
+        super().__init__(mensaje)
+        self.retry_after = retry_after
+
+
+def _generar_hash(password: str, method: Optional[str]) -> str:
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+def _verificar_hash(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """Pool fijo de procesos con admision acotada para las funciones KDF.
+
+    A lo sumo ``max_pending`` operaciones pueden estar en curso o en cola; las
+    siguientes se rechazan de inmediato con :class:`ServicioSaturadoError`
+    para no bloquear al worker que atiende el resto del trafico. Con
+    ``workers=0`` el hash se calcula en el mismo proceso, conservando el
+    control de admision.
+
+    El limite solo protege a solicitudes concurrentes dentro del mismo proceso,
+    por lo que gunicorn debe correr con ``--worker-class gthread --threads N``;
+    con workers ``sync`` cada proceso atiende una solicitud a la vez y la cola
+    nunca se llena.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 2,
+        max_pending: int = 8,
+        timeout_seconds: float = 10,
+        retry_after_seconds: int = 1,
+        method: Optional[str] = None,
+    ) -> None:
+        self.workers = max(int(workers), 0)
+        self.max_pending = max(int(max_pending), 1)
+        self.timeout_seconds = timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.method = method or None
+        self._parametros: Optional[str] = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._en_curso = 0
+        self._rechazos = 0
+        self._operaciones = 0
+        self._latencias_ms: deque[float] = deque(maxlen=512)
+
+    def generar(self, password: str) -> str:
+        return self._ejecutar(_generar_hash, password, self.method)
+
+    def verificar(self, password_hash: str, password: str) -> bool:
+        return self._ejecutar(_verificar_hash, password_hash, password)
+
+    def necesita_rehash(self, password_hash: str) -> bool:
+        """Indicar si el hash fue generado con parametros distintos a los configurados."""
+        if not password_hash or "$" not in password_hash:
+            return False
+        return password_hash.split("$", 1)[0] != self._parametros_objetivo()
+
+    def _parametros_objetivo(self) -> str:
+        # werkzeug completa los parametros omitidos (``scrypt`` -> ``scrypt:32768:8:1``);
+        # se calcula una vez con un hash real para compararlos tal como quedan guardados.
+        if self._parametros is None:
+            self._parametros = _generar_hash("", self.method).split("$", 1)[0]
+        return self._parametros
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            latencias = sorted(self._latencias_ms)
+            resumen = {
+                "trabajadores": self.workers,
+                "max_pendientes": self.max_pending,
+                "en_curso": self._en_curso,
+                "operaciones": self._operaciones,
+                "rechazos": self._rechazos,
+            }
+        resumen["latencia_p50_ms"] = _percentil(latencias, 0.50)
+        resumen["latencia_p99_ms"] = _percentil(latencias, 0.99)
+        return resumen
+
+    def cerrar(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _ejecutar(self, funcion: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rechazos += 1
+            raise ServicioSaturadoError(
+                "El servicio de autenticacion esta saturado. Intenta nuevamente en unos segundos.",
+                retry_after=self.retry_after_seconds,
+            )
+        with self._lock:
+            self._en_curso += 1
+        inicio = time.perf_counter()
+        if self.workers == 0:
+            try:
+                return funcion(*args)
+            finally:
+                self._liberar(inicio)
+        try:
+            futuro = self._obtener_executor().submit(funcion, *args)
+        except BaseException:
+            self._liberar(inicio)
+            raise
+        # El cupo se libera cuando el proceso termina, no cuando el llamador deja de
+        # esperar: un hash que excedio el timeout sigue ocupando un proceso del pool.
+        futuro.add_done_callback(lambda _futuro: self._liberar(inicio))
+        try:
+            return futuro.result(timeout=self.timeout_seconds)
+        except FuturesTimeoutError as exc:
+            futuro.cancel()
+            raise ServicioSaturadoError(
+                "El servicio de autenticacion tardo demasiado en responder.",
+                retry_after=self.retry_after_seconds,
+            ) from exc
+
+    def _liberar(self, inicio: float) -> None:
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self._en_curso -= 1
+            self._operaciones += 1
+            self._latencias_ms.append(duracion_ms)
+        self._slots.release()
+
+    def _obtener_executor(self) -> ProcessPoolExecutor:
+        # El pool se crea perezosamente y se recrea si el proceso fue bifurcado
+        # (por ejemplo, por gunicorn) despues de crearlo.
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+
+def _percentil(valores: list[float], fraccion: float) -> Optional[float]:
+    if not valores:
+        return None
+    indice = min(int(round(fraccion * (len(valores) - 1))), len(valores) - 1)
+    return round(valores[indice], 2)
+
+
+def init_app(app) -> None:
+    """Crear el ejecutor de hashing con la configuracion de la aplicacion."""
+    anterior = app.extensions.get(EXTENSION_KEY)
+    if anterior is not None:
+        anterior.cerrar()
+    app.extensions[EXTENSION_KEY] = PasswordHasher(
+        workers=int(app.config.get("PASSWORD_HASH_WORKERS", 2)),
+        max_pending=int(app.config.get("PASSWORD_HASH_MAX_PENDING", 8)),
+        timeout_seconds=float(app.config.get("PASSWORD_HASH_TIMEOUT_SECONDS", 10)),
+        retry_after_seconds=int(app.config.get("PASSWORD_HASH_RETRY_AFTER_SECONDS", 1)),
+        method=app.config.get("PASSWORD_HASH_METHOD"),
+    )
+
+
+def obtener_hasher() -> Optional[PasswordHasher]:
+    try:
+        return current_app.extensions.get(EXTENSION_KEY)
+    except RuntimeError:
+        return None
+
+
+def generar_hash(password: str) -> str:
+    """Calcular el hash de la contrasena usando el ejecutor de la aplicacion."""
+    hasher = obtener_hasher()
+    if hasher is None:
+        return _generar_hash(password, None)
+    return hasher.generar(password)
+
+
+def verificar_hash(password_hash: str, password: str) -> bool:
+    """Comparar la contrasena con su hash usando el ejecutor de la aplicacion."""
+    hasher = obtener_hasher()
+    if hasher is None:
+        return _verificar_hash(password_hash, password)
+    return hasher.verificar(password_hash, password)
+
+
+def necesita_rehash(password_hash: str) -> bool:
+    """Indicar si el hash debe recalcularse con los parametros configurados."""
+    hasher = obtener_hasher()
+    if hasher is None:
+        return False
+    return hasher.necesita_rehash(password_hash)
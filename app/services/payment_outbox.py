@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+"""Procesamiento en segundo plano de los cobros pendientes (``payment_outbox``)."""
+
+import logging
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, Optional
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+from app.repositories import PaymentRepository, RpcNoDisponibleError
+
+from .availability_index import obtener_indice
+from .fleet_calendar import obtener_calendario
+from .payment_service import PasarelaPagos, PasarelaSimulada
+from .vehicle_service import invalidar_busquedas
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "payment_outbox"
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_REEMBOLSO_PENDIENTE = "reembolso_pendiente"
+OPERACION_REEMBOLSO = "reembolso"
+
+
+class ProcesadorPagos:
+    """Pool de hilos que reclama intentos de cobro, llama a la pasarela y los resuelve.
+
+    La reserva solo escribe el intento (migracion 016) y llama a
+    :meth:`notificar`. Los hilos arrancan con la aplicacion y se recrean en
+    la primera solicitud tras bifurcar el proceso (p. ej. ``gunicorn
+    --preload``). Cada hilo revisa la tabla al arrancar y luego cada
+    ``intervalo_segundos``, de modo que recoge intentos que quedaron de un
+    despliegue o caida anterior, de otros procesos, reintentos programados y
+    bloqueos vencidos sin esperar a una reserva nueva. Las fallas transitorias
+    de la pasarela se reintentan con espera exponencial hasta ``max_intentos``.
+    Un cobro aprobado cuya reserva se cancelo mientras se procesaba vuelve a la
+    cola como reembolso y se devuelve con :meth:`PasarelaPagos.reembolsar`.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        pasarela: PasarelaPagos,
+        repository: Optional[PaymentRepository] = None,
+        workers: int = 2,
+        tamano_lote: int = 10,
+        intervalo_segundos: float = 5,
+        bloqueo_segundos: int = 60,
+        max_intentos: int = 5,
+        espera_base_segundos: int = 2,
+    ) -> None:
+        self._app = app
+        self.pasarela = pasarela
+        self._repository = repository or PaymentRepository()
+        self.workers = max(int(workers), 1)
+        self.tamano_lote = max(int(tamano_lote), 1)
+        self.intervalo_segundos = intervalo_segundos
+        self.bloqueo_segundos = bloqueo_segundos
+        self.max_intentos = max(int(max_intentos), 1)
+        self.espera_base_segundos = espera_base_segundos
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._hilos: list[threading.Thread] = []
+        self._hilos_pid: Optional[int] = None
+        self._pagados = 0
+        self._rechazados = 0
+        self._reintentos = 0
+        self._reembolsados = 0
+
+    def notificar(self) -> None:
+        """Avisar que hay un intento nuevo; arranca los hilos si aun no existen."""
+        self.iniciar()
+        self._despertar.set()
+
+    def iniciar(self) -> None:
+        """Arrancar los hilos en este proceso si aun no estan en marcha."""
+        if self._hilos_pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilos_pid == os.getpid() or self._detener.is_set():
+                return
+            self._hilos = [
+                threading.Thread(target=self._bucle, name=f"procesador-pagos-{indice}", daemon=True)
+                for indice in range(self.workers)
+            ]
+            self._hilos_pid = os.getpid()
+            for hilo in self._hilos:
+                hilo.start()
+
+    def procesar_lote(self) -> int:
+        """Reclamar y resolver un lote de intentos; retorna cuantos se reclamaron."""
+        intentos = self._repository.reclamar_intentos(self.tamano_lote, self.bloqueo_segundos)
+        for intento in intentos:
+            try:
+                self._procesar(intento)
+            except Exception:  # pragma: no cover - el bloqueo vence y otro worker lo retoma
+                logger.exception("No fue posible resolver el intento de pago %s.", intento.get("intento_id"))
+        return len(intentos)
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "trabajadores": self.workers,
+                "activos": sum(1 for hilo in self._hilos if hilo.is_alive()),
+                "pagados": self._pagados,
+                "rechazados": self._rechazados,
+                "reintentos": self._reintentos,
+                "reembolsados": self._reembolsados,
+            }
+
+    def cerrar(self) -> None:
+        self._detener.set()
+        self._despertar.set()
+
+    def _procesar(self, intento: Dict[str, Any]) -> None:
+        pago = intento["pago"]
+        intento_id = intento["intento_id"]
+        if intento.get("operacion") == OPERACION_REEMBOLSO:
+            self._reembolsar(intento)
+            return
+        if pago.get("status") != ESTADO_PENDIENTE:
+            # Se cancelo la reserva antes de cobrar: el intento se cierra sin llamar a la pasarela.
+            self._repository.resolver_intento(intento_id, "rechazado", error="pago no pendiente")
+            return
+        try:
+            resultado = self.pasarela.cobrar(pago)
+        except Exception as exc:
+            if self._reprogramar(intento, exc):
+                return
+            logger.warning("Pago %s rechazado tras %s intentos: %s", pago.get("id"), intento.get("intentos"), exc)
+            self._resolver_rechazo(intento_id, f"sin respuesta de la pasarela: {exc}")
+            return
+
+        if resultado.aprobado:
+            datos = self._repository.resolver_intento(intento_id, "pagado", referencia=resultado.referencia)
+            with self._lock:
+                self._pagados += 1
+            if (datos.get("pago") or {}).get("status") == ESTADO_REEMBOLSO_PENDIENTE:
+                # La reserva se cancelo durante el cobro; el reembolso ya esta en la cola.
+                self._despertar.set()
+        else:
+            self._resolver_rechazo(intento_id, resultado.motivo)
+
+    def _reembolsar(self, intento: Dict[str, Any]) -> None:
+        pago = intento["pago"]
+        intento_id = intento["intento_id"]
+        if pago.get("status") != ESTADO_REEMBOLSO_PENDIENTE:
+            self._repository.resolver_intento(intento_id, "rechazado", error="pago sin reembolso pendiente")
+            return
+        try:
+            resultado = self.pasarela.reembolsar(pago)
+        except Exception as exc:
+            if self._reprogramar(intento, exc):
+                return
+            resultado = None
+            motivo = f"sin respuesta de la pasarela: {exc}"
+        else:
+            motivo = resultado.motivo
+
+        if resultado is not None and resultado.aprobado:
+            self._repository.resolver_intento(intento_id, "reembolsado")
+            with self._lock:
+                self._reembolsados += 1
+            return
+        # El pago queda en reembolso_pendiente: el dinero se cobro y hay que devolverlo a mano.
+        logger.error("No fue posible reembolsar el pago %s: %s", pago.get("id"), motivo)
+        self._repository.resolver_intento(intento_id, "rechazado", error=motivo)
+
+    def _reprogramar(self, intento: Dict[str, Any], exc: Exception) -> bool:
+        """Reprogramar un intento tras una falla transitoria; False si agoto ``max_intentos``."""
+        intentos = int(intento.get("intentos") or 1)
+        if intentos >= self.max_intentos:
+            return False
+        espera = min(self.espera_base_segundos * 2 ** (intentos - 1), 300)
+        self._repository.resolver_intento(intento["intento_id"], "reintentar", error=str(exc), reintentar_en=espera)
+        with self._lock:
+            self._reintentos += 1
+        return True
+
+    def _resolver_rechazo(self, intento_id: int, motivo: Optional[str]) -> None:
+        datos = self._repository.resolver_intento(intento_id, "rechazado", error=motivo)
+        with self._lock:
+            self._rechazados += 1
+        reserva = datos.get("reserva")
+        if reserva:
+            # La reserva cancelada libera sus fechas en las estructuras en memoria.
+            for estructura in (obtener_indice(), obtener_calendario()):
+                if estructura is not None:
+                    estructura.eliminar(str(reserva["id"]))
+            invalidar_busquedas(date.fromisoformat(reserva["start_date"]), date.fromisoformat(reserva["end_date"]))
+
+    def _bucle(self) -> None:
+        with self._app.app_context():
+            while not self._detener.is_set():
+                self._despertar.clear()
+                try:
+                    while not self._detener.is_set() and self.procesar_lote() >= self.tamano_lote:
+                        pass
+                except RpcNoDisponibleError:
+                    logger.warning("reclamar_intentos_pago no existe; aplica la migracion 016.")
+                except Exception:
+                    logger.exception("Fallo el procesamiento de pagos pendientes.")
+                self._despertar.wait(self.intervalo_segundos)
+
+
+def _iniciar_procesador() -> None:
+    # Tras un fork los hilos del proceso padre no existen; se recrean aqui.
+    procesador = obtener_procesador_pagos()
+    if procesador is not None:
+        procesador.iniciar()
+
+
+def init_app(app) -> None:
+    """Crear el procesador de cobros si ``PAYMENT_ASYNC`` esta activo."""
+    anterior = app.extensions.pop(EXTENSION_KEY, None)
+    if anterior is not None:
+        anterior.cerrar()
+    if not app.config.get("PAYMENT_ASYNC", True):
+        return
+    ruta = app.config.get("PAYMENT_PROVIDER")
+    if ruta:
+        pasarela = import_string(ruta)()
+    else:
+        pasarela = PasarelaSimulada(float(app.config.get("PAYMENT_SIMULATED_LATENCY_SECONDS", 0)))
+    app.extensions[EXTENSION_KEY] = ProcesadorPagos(
+        app,
+        pasarela=pasarela,
+        workers=int(app.config.get("PAYMENT_OUTBOX_WORKERS", 2)),
+        tamano_lote=int(app.config.get("PAYMENT_OUTBOX_BATCH_SIZE", 10)),
+        intervalo_segundos=float(app.config.get("PAYMENT_OUTBOX_POLL_SECONDS", 5)),
+        bloqueo_segundos=int(app.config.get("PAYMENT_OUTBOX_LOCK_SECONDS", 60)),
+        max_intentos=int(app.config.get("PAYMENT_MAX_ATTEMPTS", 5)),
+    )
+    if _iniciar_procesador not in app.before_request_funcs.get(None, []):
+        app.before_request(_iniciar_procesador)
+    app.extensions[EXTENSION_KEY].iniciar()
+
+
+def obtener_procesador_pagos() -> Optional[ProcesadorPagos]:
+    try:
+        return current_app.extensions.get(EXTENSION_KEY)
+    except RuntimeError:
+        return None
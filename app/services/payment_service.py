@@ -2,18 +2,76 @@ from __future__ import annotations
 
 """Servicios relacionados con pagos simulados dentro de la plataforma."""
 
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from decimal import Decimal
 from uuid import uuid4
-from typing import Optional
+from typing import Any, Mapping, Optional
 
 from app.models import Payment
+from app.models.hydration import Hidratador
 from app.repositories import PaymentRepository
 
+hidratar_pago: Hidratador[Payment] = Hidratador(Payment)
+
 
 class PagoFallidoError(RuntimeError):
     """Se lanza cuando el procesamiento del pago no se completa."""
 
 
+@dataclass(frozen=True)
+class ResultadoCobro:
+    """Respuesta de la pasarela a un intento de cobro o de reembolso."""
+
+    aprobado: bool
+    referencia: Optional[str] = None
+    motivo: Optional[str] = None
+
+
+class PasarelaPagos(ABC):
+    """Interfaz de la pasarela que usa el procesador de ``payment_outbox``.
+
+    ``cobrar`` recibe la fila del pago pendiente. Un rechazo definitivo se
+    informa con ``ResultadoCobro(aprobado=False)``; una excepcion indica una
+    falla transitoria y el intento se reprograma. ``reembolsar`` devuelve un
+    cobro aprobado cuya reserva se cancelo mientras se procesaba y sigue las
+    mismas reglas.
+    """
+
+    @abstractmethod
+    def cobrar(self, pago: Mapping[str, Any]) -> ResultadoCobro:
+        """Cobrar un pago pendiente."""
+
+    @abstractmethod
+    def reembolsar(self, pago: Mapping[str, Any]) -> ResultadoCobro:
+        """Devolver un cobro aprobado."""
+
+
+class PasarelaSimulada(PasarelaPagos):
+    """Pasarela local: aprueba todo salvo las tarjetas terminadas en ``0002``.
+
+    ``latencia_segundos`` imita el tiempo de respuesta de un proveedor real.
+    """
+
+    TARJETA_RECHAZADA = "0002"
+
+    def __init__(self, latencia_segundos: float = 0.0) -> None:
+        self.latencia_segundos = latencia_segundos
+
+    def cobrar(self, pago: Mapping[str, Any]) -> ResultadoCobro:
+        if self.latencia_segundos > 0:
+            time.sleep(self.latencia_segundos)
+        if pago.get("card_last4") == self.TARJETA_RECHAZADA:
+            return ResultadoCobro(aprobado=False, motivo="Tarjeta rechazada por el emisor.")
+        return ResultadoCobro(aprobado=True, referencia=pago.get("reference"))
+
+    def reembolsar(self, pago: Mapping[str, Any]) -> ResultadoCobro:
+        if self.latencia_segundos > 0:
+            time.sleep(self.latencia_segundos)
+        return ResultadoCobro(aprobado=True, referencia=pago.get("reference"))
+
+
 class PaymentService:
     """Simula el procesamiento de pagos y registro de comprobantes."""
 
@@ -42,7 +100,7 @@ class PaymentService:
             "currency": currency,
             "status": "pagado",
             "provider": provider,
-            "reference": f"PAY-{uuid4().hex[:10].upper()}",
+            "reference": self.nueva_referencia(),
             "card_last4": card_last4,
         }
 
@@ -56,16 +114,14 @@ class PaymentService:
         actualizado = self._repository.actualizar_estado(pago["id"], "reembolsado")
         return self._convertir_a_modelo(actualizado)
 
+    def obtener_por_reserva(self, reserva_id: str) -> Optional[Payment]:
+        registro = self._repository.obtener_por_reserva(reserva_id)
+        return self._convertir_a_modelo(registro) if registro else None
+
+    @staticmethod
+    def nueva_referencia() -> str:
+        """Identificador de la transaccion en la pasarela simulada."""
+        return f"PAY-{uuid4().hex[:10].upper()}"
+
     def _convertir_a_modelo(self, registro: dict[str, object]) -> Payment:
-        return Payment(
-            id=str(registro.get("id")),
-            reservation_id=str(registro.get("reservation_id")),
-            user_id=str(registro.get("user_id")),
-            amount=Decimal(str(registro.get("amount"))),
-            currency=str(registro.get("currency")),
-            status=str(registro.get("status")),
-            provider=str(registro.get("provider")),
-            reference=str(registro.get("reference")),
-            card_last4=registro.get("card_last4"),
-            created_at=registro.get("created_at"),
-        )
+        return hidratar_pago(registro)
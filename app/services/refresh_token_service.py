@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+"""Emision y rotacion de tokens de renovacion de sesion."""
+
+import hashlib
+import hmac
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from flask import current_app
+
+from app.repositories import RefreshTokenRepository
+
+from .token_revocation import obtener_lista_revocacion
+
+
+class RefreshTokenInvalidoError(ValueError):
+    """Se lanza cuando el token de renovacion no existe, expiro o fue reutilizado."""
+
+
+class RefreshTokenService:
+    """Gestiona tokens de renovacion opacos, rotativos y agrupados por familia.
+
+    El cliente recibe un valor aleatorio y la base solo guarda su HMAC, de
+    modo que renovar cuesta un HMAC y una busqueda por indice unico. Cada uso
+    revoca el token y emite otro en la misma familia; presentar un token ya
+    rotado se trata como robo y revoca la familia completa.
+    """
+
+    def __init__(self, repository: Optional[RefreshTokenRepository] = None) -> None:
+        self._repository = repository or RefreshTokenRepository()
+
+    def emitir(self, user_id: str, *, family_id: Optional[str] = None) -> str:
+        token, _ = self._emitir(user_id, family_id or str(uuid.uuid4()))
+        return token
+
+    def rotar(self, token: str) -> Tuple[Dict[str, Any], str]:
+        """Consumir el token y retornar el perfil del usuario junto al nuevo token."""
+        if not token:
+            raise RefreshTokenInvalidoError("Debes proporcionar el token de renovacion.")
+
+        registro = self._repository.obtener_por_hash(self._hash(token))
+        if registro is None:
+            raise RefreshTokenInvalidoError("El token de renovacion es invalido.")
+
+        if registro.get("revoked_at"):
+            self._revocar_familia(registro)
+            raise RefreshTokenInvalidoError("El token de renovacion ya fue utilizado; la sesion se cerro.")
+
+        if _a_datetime(registro.get("expires_at")) <= datetime.now(timezone.utc):
+            raise RefreshTokenInvalidoError("El token de renovacion ha expirado.")
+
+        usuario = registro.get("users")
+        if not usuario:
+            raise RefreshTokenInvalidoError("El usuario asociado al token ya no existe.")
+
+        nuevo_token, nuevo_registro = self._emitir(str(registro["user_id"]), str(registro["family_id"]))
+        if not self._repository.revocar(str(registro["id"]), replaced_by=str(nuevo_registro.get("id"))):
+            # Otra solicitud roto el mismo token al mismo tiempo.
+            self._revocar_familia(registro)
+            raise RefreshTokenInvalidoError("El token de renovacion ya fue utilizado; la sesion se cerro.")
+
+        return dict(usuario), nuevo_token
+
+    def revocar(self, token: str) -> None:
+        """Cerrar la sesion asociada al token revocando su familia."""
+        registro = self._repository.obtener_por_hash(self._hash(token)) if token else None
+        if registro is not None:
+            self._repository.revocar_familia(str(registro["family_id"]))
+
+    def _emitir(self, user_id: str, family_id: str) -> Tuple[str, Dict[str, Any]]:
+        token = secrets.token_urlsafe(32)
+        dias = int(current_app.config.get("JWT_REFRESH_TOKEN_EXPIRES_DAYS", 30))
+        registro = self._repository.crear(
+            user_id=user_id,
+            family_id=family_id,
+            token_hash=self._hash(token),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=dias),
+        )
+        return token, registro
+
+    def _revocar_familia(self, registro: Dict[str, Any]) -> None:
+        self._repository.revocar_familia(str(registro["family_id"]))
+        revocaciones = obtener_lista_revocacion()
+        if revocaciones is not None:
+            revocaciones.revocar_usuario(str(registro["user_id"]))
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        secreto = str(current_app.config.get("JWT_SECRET") or "").encode("utf-8")
+        return hmac.new(secreto, token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _a_datetime(valor: object) -> datetime:
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor))
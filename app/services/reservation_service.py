@@ -2,19 +2,44 @@ from __future__ import annotations
 
 """Capa de servicios para gestionar reservas de vehiculos."""
 
+import logging
+from calendar import monthrange
 from dataclasses import asdict as dataclass_asdict, is_dataclass
 from datetime import date
 from decimal import Decimal
 from typing import Iterable, List, Optional
 
-from app.models import Reservation, Vehicle
+from app.models import Payment, Reservation
+from app.models.hydration import Hidratador
 from app.repositories import (
     PaymentRepository,
     ReservationRepository,
+    RpcNoDisponibleError,
     VehicleRepository,
 )
 
-from .payment_service import PaymentService
+from .availability_index import AvailabilityIndex, obtener_indice
+from .fleet_calendar import FleetCalendar, obtener_calendario
+from .listing_counts import ConteoListado, invalidar_conteos
+from .payment_outbox import obtener_procesador_pagos
+from .payment_service import PagoFallidoError, PaymentService, hidratar_pago
+from .vehicle_service import hidratar_vehiculo, invalidar_busquedas
+
+logger = logging.getLogger(__name__)
+
+# Codigos que retorna crear_reserva_con_pago en lugar de crear la reserva.
+_ERRORES_RESERVA_ATOMICA = {
+    "vehiculo_no_encontrado": (ValueError, "No se encontro el vehiculo solicitado."),
+    "vehiculo_no_disponible": (ValueError, "El vehiculo no se encuentra disponible para reservar."),
+    "rango_invalido": (ValueError, "La fecha de inicio no puede ser posterior a la fecha final."),
+    "monto_invalido": (PagoFallidoError, "El monto a cobrar debe ser mayor que cero."),
+}
+# Codigos que retorna cancelar_reserva_con_reembolso en lugar de cancelar.
+_ERRORES_CANCELACION_ATOMICA = {
+    "reserva_no_encontrada": "No se encontro la reserva solicitada.",
+    "sin_permiso": "No tienes permiso para cancelar esta reserva.",
+    "estado_invalido": "Solo es posible cancelar reservas en estado confirmada.",
+}
 
 
 class ReservationService:
@@ -23,16 +48,24 @@ class ReservationService:
     ESTADO_CONFIRMADA = "confirmada"
     ESTADO_CANCELADA = "cancelada"
     ESTADO_COMPLETADA = "completada"
+    PAGO_PENDIENTE = "pendiente"
+    PAGO_REEMBOLSO_PENDIENTE = "reembolso_pendiente"
+
+    _hidratar_reserva: Hidratador[Reservation] = Hidratador(Reservation, si_vacio={"status": ESTADO_CONFIRMADA})
 
     def __init__(
         self,
         reservation_repository: ReservationRepository | None = None,
         vehicle_repository: VehicleRepository | None = None,
         payment_service: PaymentService | None = None,
+        availability_index: AvailabilityIndex | None = None,
+        fleet_calendar: FleetCalendar | None = None,
     ) -> None:
         self._reservation_repository = reservation_repository or ReservationRepository()
         self._vehicle_repository = vehicle_repository or VehicleRepository()
         self._payment_service = payment_service or PaymentService(PaymentRepository())
+        self._availability_index = availability_index
+        self._fleet_calendar = fleet_calendar
 
     def listar_reservas(
         self,
@@ -44,28 +77,32 @@ class ReservationService:
     ) -> dict[str, object]:
         rol_normalizado = (rol or "cliente").strip().lower()
         if rol_normalizado == "administrador":
-            response = self._reservation_repository.listar_todas(limit=limit, offset=offset)
+            conteo = ConteoListado(("reservas", "todas"))
+            response = self._reservation_repository.listar_todas(
+                limit=limit, offset=offset, metodo_conteo=conteo.metodo
+            )
         elif rol_normalizado == "anfitrion":
-            response = self._reservation_repository.listar_para_anfitrion(user_id, limit=limit, offset=offset)
+            conteo = ConteoListado(("reservas", "anfitrion", user_id))
+            response = self._reservation_repository.listar_para_anfitrion(
+                user_id, limit=limit, offset=offset, metodo_conteo=conteo.metodo
+            )
         else:
-            response = self._reservation_repository.listar_por_usuario(user_id, limit=limit, offset=offset)
+            conteo = ConteoListado(("reservas", "usuario", user_id))
+            response = self._reservation_repository.listar_por_usuario(
+                user_id, limit=limit, offset=offset, metodo_conteo=conteo.metodo
+            )
 
         data = getattr(response, "data", None) or []
-        total = getattr(response, "count", len(data)) or len(data)
-        items = []
-        for item in data:
-            if isinstance(item, dict):
-                item_dict = dict(item)
-            elif is_dataclass(item):
-                item_dict = dataclass_asdict(item)
-            else:
-                item_dict = dict(item)
-            item_dict.pop("vehicles", None)
-            items.append(self._convertir_a_modelo(item_dict))
+        total, estrategia = conteo.total(response, data, limit=limit, offset=offset)
+        # El embebido ``vehicles`` es una columna desconocida para el modelo y se ignora.
+        items = self._hidratar_reserva.lista(
+            dataclass_asdict(item) if is_dataclass(item) else item for item in data
+        )
 
         return {
             "items": items,
             "total": total,
+            "total_strategy": estrategia,
         }
 
     def crear_reserva(
@@ -89,6 +126,24 @@ class ReservationService:
         if fecha_inicio > fecha_fin:
             raise ValueError("La fecha de inicio no puede ser posterior a la fecha final.")
 
+        indice = self._indice()
+        # El indice puede estar desfasado respecto a otros procesos: solo se usa
+        # para rechazar rapido; un rango libre se confirma contra la base.
+        if indice is not None and indice.vehiculo_libre(vehicle_id, fecha_inicio, fecha_fin) is False:
+            raise ValueError("El vehiculo ya esta reservado en ese rango de fechas.")
+
+        resultado = self._crear_reserva_atomica(
+            usuario_id=usuario_id,
+            vehicle_id=vehicle_id,
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            comentarios=comentarios,
+            metodo_pago=metodo_pago,
+            card_last4=card_last4,
+        )
+        if resultado is not None:
+            return resultado
+
         conflicto = self._reservation_repository.obtener_reservas_en_rango([vehicle_id], fecha_inicio, fecha_fin)
         conflictos = getattr(conflicto, "data", None) or []
         conflictos_filtrados = []
@@ -107,7 +162,7 @@ class ReservationService:
         if vehiculo is None:
             raise ValueError("No se encontro el vehiculo solicitado.")
 
-        vehicle_model = Vehicle(**vehiculo)
+        vehicle_model = hidratar_vehiculo(vehiculo)
         if getattr(vehicle_model, "status", "activo") != "activo":
             raise ValueError("El vehiculo no se encuentra disponible para reservar.")
 
@@ -127,7 +182,7 @@ class ReservationService:
         if not datos:
             raise RuntimeError("El servicio no devolvio informacion de la reserva creada.")
 
-        reserva = self._convertir_a_modelo(datos[0])
+        reserva = self._registrar_creada(datos[0], owner_id=vehicle_model.owner_id)
         pago = self._payment_service.procesar_pago(
             reservation_id=reserva.id,
             user_id=usuario_id,
@@ -142,7 +197,86 @@ class ReservationService:
             "pago": pago,
         }
 
-    def cancelar_reserva(self, reserva_id: str, user_id: str, *, is_admin: bool = False) -> Reservation:
+    def _crear_reserva_atomica(
+        self,
+        *,
+        usuario_id: str,
+        vehicle_id: str,
+        fecha_inicio: date,
+        fecha_fin: date,
+        comentarios: Optional[str],
+        metodo_pago: str,
+        card_last4: Optional[str],
+    ) -> Optional[dict[str, object]]:
+        """Reservar y cobrar en una sola llamada a la base.
+
+        La restriccion de exclusion de la migracion 014 rechaza solapamientos
+        aun con solicitudes concurrentes. Con el procesador de pagos activo el
+        cobro se difiere (migracion 016): el pago se retorna ``pendiente`` y
+        un worker lo resuelve sin que la solicitud espere a la pasarela.
+        Retorna ``None`` cuando la funcion remota no existe para que el
+        llamador use el flujo en varios pasos.
+        """
+        crear = self._reservation_repository.crear_reserva_con_pago
+        argumentos = {
+            "vehicle_id": vehicle_id,
+            "user_id": usuario_id,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+            "comentarios": comentarios,
+            "provider": metodo_pago,
+            "reference": PaymentService.nueva_referencia(),
+            "card_last4": card_last4,
+        }
+        procesador = obtener_procesador_pagos()
+        datos = None
+        if procesador is not None:
+            try:
+                datos = crear(**argumentos, pago_diferido=True)
+            except RpcNoDisponibleError:
+                logger.warning("crear_reserva_con_intento_pago no existe; el cobro se hace en linea.")
+                procesador = None
+        if datos is None:
+            try:
+                datos = crear(**argumentos)
+            except RpcNoDisponibleError:
+                logger.warning("crear_reserva_con_pago no existe; se reserva en varios pasos.")
+                return None
+
+        error = datos.get("error")
+        if error:
+            tipo, mensaje = _ERRORES_RESERVA_ATOMICA.get(str(error), (ValueError, "No fue posible crear la reserva."))
+            raise tipo(mensaje)
+        reserva = self._registrar_creada(datos["reserva"], owner_id=datos.get("owner_id"))
+        pago = hidratar_pago(datos["pago"])
+        if procesador is not None and pago.status == self.PAGO_PENDIENTE:
+            procesador.notificar()
+        return {"reserva": reserva, "pago": pago}
+
+    def _registrar_creada(self, registro: dict[str, object], *, owner_id: Optional[str]) -> Reservation:
+        reserva = self._convertir_a_modelo(registro)
+        for estructura in (self._indice(), self._calendario()):
+            if estructura is not None:
+                estructura.registrar(registro)
+        invalidar_busquedas(reserva.start_date, reserva.end_date)
+        # Cancelar no cambia los totales (las canceladas se siguen listando); crear si.
+        invalidar_conteos(
+            ("reservas", "usuario", reserva.user_id),
+            ("reservas", "anfitrion", owner_id),
+            ("reservas", "todas"),
+        )
+        return reserva
+
+    def cancelar_reserva(self, reserva_id: str, user_id: str, *, is_admin: bool = False) -> dict[str, object]:
+        """Cancelar una reserva confirmada y reembolsar su pago.
+
+        Retorna ``{"reserva", "pago"}``; ``pago`` es ``None`` si la reserva no
+        tenia pago registrado.
+        """
+        resultado = self._cancelar_reserva_atomica(reserva_id, user_id, is_admin=is_admin)
+        if resultado is not None:
+            return resultado
+
         consulta = (
             self._reservation_repository.table()
             .select("*")
@@ -161,9 +295,52 @@ class ReservationService:
             raise ValueError("Solo es posible cancelar reservas en estado confirmada.")
 
         self._reservation_repository.cancelar_reserva(reserva_id)
-        self._payment_service.marcar_reembolso(reserva_id)
         reserva["status"] = self.ESTADO_CANCELADA
-        return self._convertir_a_modelo(reserva)
+        modelo = self._registrar_cancelada(reserva)
+        return {"reserva": modelo, "pago": self._payment_service.marcar_reembolso(reserva_id)}
+
+    def _cancelar_reserva_atomica(
+        self, reserva_id: str, user_id: str, *, is_admin: bool
+    ) -> Optional[dict[str, object]]:
+        """Cancelar y reembolsar en una sola llamada (migracion 015).
+
+        Con el procesador de pagos activo el reembolso de un pago cobrado se
+        difiere (migracion 016): el pago se retorna ``reembolso_pendiente`` y
+        un worker lo devuelve con :meth:`PasarelaPagos.reembolsar`. Retorna
+        ``None`` cuando la funcion remota no existe para que el llamador use el
+        flujo en varios pasos.
+        """
+        cancelar = self._reservation_repository.cancelar_con_reembolso
+        procesador = obtener_procesador_pagos()
+        datos = None
+        if procesador is not None:
+            try:
+                datos = cancelar(reserva_id, user_id, es_admin=is_admin, reembolso_diferido=True)
+            except RpcNoDisponibleError:
+                logger.warning("cancelar_reserva_con_reembolso sin reembolso diferido; aplica la migracion 016.")
+                procesador = None
+        if datos is None:
+            try:
+                datos = cancelar(reserva_id, user_id, es_admin=is_admin)
+            except RpcNoDisponibleError:
+                logger.warning("cancelar_reserva_con_reembolso no existe; se cancela en varios pasos.")
+                return None
+
+        error = datos.get("error")
+        if error:
+            raise ValueError(_ERRORES_CANCELACION_ATOMICA.get(str(error), "No fue posible cancelar la reserva."))
+        pago = hidratar_pago(datos["pago"]) if datos.get("pago") else None
+        if procesador is not None and pago is not None and pago.status == self.PAGO_REEMBOLSO_PENDIENTE:
+            procesador.notificar()
+        return {"reserva": self._registrar_cancelada(datos["reserva"]), "pago": pago}
+
+    def _registrar_cancelada(self, registro: dict[str, object]) -> Reservation:
+        reserva = self._convertir_a_modelo(registro)
+        for estructura in (self._indice(), self._calendario()):
+            if estructura is not None:
+                estructura.eliminar(reserva.id)
+        invalidar_busquedas(reserva.start_date, reserva.end_date)
+        return reserva
 
     def obtener_disponibilidad_vehiculo(
         self,
@@ -175,28 +352,137 @@ class ReservationService:
             raise ValueError("Debes proporcionar el identificador del vehiculo.")
 
         desde = None if incluir_historial else date.today()
+        indice = self._indice()
+        if desde is not None and indice is not None:
+            rangos_indexados = indice.reservas_de_vehiculo(vehicle_id, desde)
+            if rangos_indexados is not None:
+                return rangos_indexados
+
         respuesta = self._reservation_repository.obtener_reservas_de_vehiculo(vehicle_id, desde=desde)
         data = getattr(respuesta, "data", None) or []
 
         rangos: list[dict[str, object]] = []
         for item in data:
-            if not isinstance(item, dict):
-                item = dict(item)
-            estado = str(item.get("status", "")).lower()
-            if estado == self.ESTADO_CANCELADA:
-                continue
-            inicio = self._parse_date(item.get("start_date"))
-            fin = self._parse_date(item.get("end_date"))
-            rangos.append(
-                {
-                    "id": str(item.get("id")),
-                    "start_date": inicio.isoformat(),
-                    "end_date": fin.isoformat(),
-                    "status": estado or self.ESTADO_CONFIRMADA,
-                }
-            )
+            rango = self._rango_ocupado(item)
+            if rango is not None:
+                rangos.append(rango)
         return rangos
 
+    def obtener_disponibilidad_vehiculos(
+        self,
+        vehicle_ids: Iterable[str],
+        *,
+        rangos: Optional[Iterable[tuple[object, object]]] = None,
+        incluir_historial: bool = False,
+    ) -> list[dict[str, object]]:
+        """Disponibilidad de varios vehiculos con una sola consulta o desde el indice.
+
+        Sin ``rangos`` cada elemento trae las reservas del vehiculo como
+        ``obtener_disponibilidad_vehiculo``; con ``rangos`` (pares de fechas)
+        trae en ``libre`` un booleano por rango, en el mismo orden.
+        """
+        ids = list(dict.fromkeys(str(vehicle_id) for vehicle_id in vehicle_ids if vehicle_id))
+        if not ids:
+            raise ValueError("Debes proporcionar al menos un vehiculo.")
+
+        consultas: list[tuple[date, date]] = []
+        for inicio, fin in rangos or ():
+            if not inicio or not fin:
+                raise ValueError("Cada rango debe incluir start_date y end_date.")
+            fecha_inicio, fecha_fin = self._parse_date(inicio), self._parse_date(fin)
+            if fecha_inicio > fecha_fin:
+                raise ValueError("La fecha de inicio no puede ser posterior a la fecha final.")
+            consultas.append((fecha_inicio, fecha_fin))
+
+        desde: Optional[date] = None if incluir_historial else date.today()
+        if desde is not None and consultas:
+            # Un rango que empieza en el pasado necesita las reservas que ya terminaron.
+            desde = min([desde, *(inicio for inicio, _ in consultas)])
+
+        # Con rangos solo importan las reservas que empiezan antes del fin del ultimo.
+        hasta = max(fin for _, fin in consultas) if consultas else None
+        reservas = self._reservas_de_vehiculos(ids, desde, hasta)
+        if not consultas:
+            return [{"vehicle_id": vehicle_id, "reservations": reservas[vehicle_id]} for vehicle_id in ids]
+
+        resultado = []
+        for vehicle_id in ids:
+            ocupados = [
+                (date.fromisoformat(str(rango["start_date"])), date.fromisoformat(str(rango["end_date"])))
+                for rango in reservas[vehicle_id]
+            ]
+            libres = [
+                not any(inicio <= fin_consulta and fin >= inicio_consulta for inicio, fin in ocupados)
+                for inicio_consulta, fin_consulta in consultas
+            ]
+            resultado.append({"vehicle_id": vehicle_id, "libre": libres})
+        return resultado
+
+    def _reservas_de_vehiculos(
+        self, ids: list[str], desde: Optional[date], hasta: Optional[date] = None
+    ) -> dict[str, list[dict[str, object]]]:
+        indice = self._indice()
+        if desde is not None and indice is not None:
+            desde_indice: dict[str, list[dict[str, object]]] = {}
+            for vehicle_id in ids:
+                rangos = indice.reservas_de_vehiculo(vehicle_id, desde)
+                if rangos is None:
+                    break
+                desde_indice[vehicle_id] = rangos
+            else:
+                return desde_indice
+
+        registros = self._reservation_repository.obtener_reservas_de_vehiculos(ids, desde=desde, hasta=hasta)
+        por_vehiculo: dict[str, list[dict[str, object]]] = {vehicle_id: [] for vehicle_id in ids}
+        for item in registros:
+            rango = self._rango_ocupado(item)
+            destino = por_vehiculo.get(str(item.get("vehicle_id")))
+            if rango is not None and destino is not None:
+                destino.append(rango)
+        return por_vehiculo
+
+    def _rango_ocupado(self, item: object) -> Optional[dict[str, object]]:
+        if not isinstance(item, dict):
+            item = dict(item)
+        estado = str(item.get("status", "")).lower()
+        if estado == self.ESTADO_CANCELADA:
+            return None
+        return {
+            "id": str(item.get("id")),
+            "start_date": self._parse_date(item.get("start_date")).isoformat(),
+            "end_date": self._parse_date(item.get("end_date")).isoformat(),
+            "status": estado or self.ESTADO_CONFIRMADA,
+        }
+
+    def obtener_calendario_mensual(self, vehicle_id: str, anio: int, mes: int) -> str:
+        """Retornar la ocupacion del mes como texto con un caracter por dia (1 = ocupado)."""
+        if not vehicle_id:
+            raise ValueError("Debes proporcionar el identificador del vehiculo.")
+        if not 1 <= mes <= 12:
+            raise ValueError("El mes debe tener el formato AAAA-MM.")
+
+        calendario = self._calendario()
+        if calendario is not None:
+            dias = calendario.calendario_mensual(vehicle_id, anio, mes)
+            if dias is not None:
+                return dias
+
+        total_dias = monthrange(anio, mes)[1]
+        primer_dia = date(anio, mes, 1)
+        ultimo_dia = date(anio, mes, total_dias)
+        respuesta = self._reservation_repository.obtener_reservas_de_vehiculo(vehicle_id, desde=primer_dia)
+        ocupados = [False] * total_dias
+        for item in getattr(respuesta, "data", None) or []:
+            if str(item.get("status", "")).lower() == self.ESTADO_CANCELADA:
+                continue
+            inicio = max(self._parse_date(item.get("start_date")), primer_dia)
+            fin = min(self._parse_date(item.get("end_date")), ultimo_dia)
+            if inicio > fin:
+                continue
+            for dia in range(inicio.day - 1, fin.day):
+                ocupados[dia] = True
+        return "".join("1" if ocupado else "0" for ocupado in ocupados)
+
     def obtener_reserva_detalle(
         self,
         reserva_id: str,
@@ -231,24 +517,30 @@ class ReservationService:
         reserva_modelo = self._convertir_a_modelo(registro)
         vehiculo_modelo = None
         if isinstance(vehiculo_registro, dict):
-            vehiculo_modelo = Vehicle(**vehiculo_registro)
+            vehiculo_modelo = hidratar_vehiculo(vehiculo_registro)
 
         return {
             "reserva": reserva_modelo,
             "vehicle": vehiculo_modelo,
         }
 
+    def obtener_pago(self, reserva_id: str, usuario_id: str, *, is_admin: bool = False) -> Payment:
+        """Estado actual del pago de una reserva (p. ej. para seguir un cobro ``pendiente``)."""
+        pago = self._payment_service.obtener_por_reserva(reserva_id)
+        if pago is None:
+            raise ValueError("No se encontro el pago de la reserva.")
+        if not is_admin and pago.user_id != usuario_id:
+            raise ValueError("No tienes permiso para consultar este pago.")
+        return pago
+
+    def _indice(self) -> Optional[AvailabilityIndex]:
+        return self._availability_index or obtener_indice()
+
+    def _calendario(self) -> Optional[FleetCalendar]:
+        return self._fleet_calendar or obtener_calendario()
+
     def _convertir_a_modelo(self, registro: dict[str, object]) -> Reservation:
-        return Reservation(
-            id=str(registro.get("id")),
-            vehicle_id=str(registro.get("vehicle_id")),
-            user_id=registro.get("user_id"),
-            start_date=self._parse_date(registro.get("start_date")),
-            end_date=self._parse_date(registro.get("end_date")),
-            status=str(registro.get("status") or self.ESTADO_CONFIRMADA),
-            created_at=registro.get("created_at"),
-            comentarios=registro.get("comentarios"),
-        )
+        return self._hidratar_reserva(registro)
 
     @staticmethod
     def _parse_date(value: object) -> date:
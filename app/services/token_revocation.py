@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+"""Lista de revocacion en memoria para tokens de acceso sin estado."""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+from app.repositories import TokenRevocationRepository
+
+logger = logging.getLogger(__name__)
+
+EXTENSION_KEY = "token_revocations"
+
+
+class TokenRevocationList:
+    """Tokens revocados por ``jti`` y marcas ``not_before`` por usuario.
+
+    La lista se copia en memoria desde la tabla ``token_revocations`` y se
+    vuelve a leer cada ``refresh_seconds``. Las revocaciones hechas por este
+    proceso se aplican de inmediato sin esperar a la siguiente lectura.
+    """
+
+    def __init__(
+        self,
+        repository: Optional[TokenRevocationRepository] = None,
+        *,
+        refresh_seconds: float = 30,
+        token_lifetime: timedelta = timedelta(minutes=60),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._repository = repository or TokenRevocationRepository()
+        self._refresh_seconds = refresh_seconds
+        self._token_lifetime = token_lifetime
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._jtis: Dict[str, float] = {}
+        self._not_before: Dict[str, float] = {}
+        self._cargado_en: Optional[float] = None
+        self._intentado_en: Optional[float] = None
+
+    def refrescar(self) -> None:
+        """Volver a leer las revocaciones vigentes desde la base de datos."""
+        registros = self._repository.listar_vigentes()
+        jtis: Dict[str, float] = {}
+        not_before: Dict[str, float] = {}
+        for registro in registros:
+            expira = _a_epoch(registro.get("expires_at"))
+            if registro.get("jti"):
+                jtis[str(registro["jti"])] = expira
+            if registro.get("user_id") and registro.get("not_before"):
+                usuario = str(registro["user_id"])
+                marca = _a_epoch(registro["not_before"])
+                not_before[usuario] = max(marca, not_before.get(usuario, marca))
+        with self._lock:
+            self._jtis = jtis
+            self._not_before = not_before
+            self._cargado_en = self._clock()
+
+    def esta_revocado(self, payload: Dict[str, Any]) -> Optional[bool]:
+        """Indicar si el token fue revocado.
+
+        Retorna ``None`` cuando la lista nunca pudo cargarse; en ese caso el
+        llamador debe validar al usuario contra la base de datos.
+        """
+        if not self._asegurar_vigente():
+            return None
+        jti = payload.get("jti")
+        emitido = float(payload.get("iat") or 0)
+        with self._lock:
+            if jti and str(jti) in self._jtis:
+                return True
+            marca = self._not_before.get(str(payload.get("sub")))
+        # Solo los tokens emitidos antes de la marca; uno emitido despues (p. ej. al
+        # volver a iniciar sesion en el mismo segundo) sigue siendo valido.
+        return marca is not None and emitido < marca
+
+    def revocar_token(self, payload: Dict[str, Any]) -> None:
+        """Revocar un token individual hasta su expiracion."""
+        jti = payload.get("jti")
+        if not jti:
+            return
+        expira = datetime.fromtimestamp(int(payload.get("exp") or time.time()), tz=timezone.utc)
+        self._repository.registrar(jti=str(jti), user_id=payload.get("sub"), expires_at=expira)
+        with self._lock:
+            self._jtis[str(jti)] = expira.timestamp()
+
+    def revocar_usuario(self, user_id: str) -> None:
+        """Invalidar todos los tokens emitidos hasta ahora para el usuario."""
+        ahora = datetime.now(timezone.utc)
+        self._repository.registrar(
+            user_id=user_id,
+            not_before=ahora,
+            expires_at=ahora + self._token_lifetime,
+        )
+        with self._lock:
+            self._not_before[str(user_id)] = ahora.timestamp()
+
+    def _asegurar_vigente(self) -> bool:
+        ahora = self._clock()
+        with self._lock:
+            if self._cargado_en is not None and ahora - self._cargado_en < self._refresh_seconds:
+                return True
+            if self._intentado_en is not None and ahora - self._intentado_en < self._refresh_seconds:
+                return self._cargado_en is not None
+            self._intentado_en = ahora
+        try:
+            self.refrescar()
+        except Exception:  # pragma: no cover - depende del backend
+            logger.warning("No fue posible refrescar la lista de revocacion de tokens.", exc_info=True)
+        with self._lock:
+            return self._cargado_en is not None
+
+
+def _a_epoch(valor: object) -> float:
+    if isinstance(valor, datetime):
+        return valor.timestamp()
+    return datetime.fromisoformat(str(valor)).timestamp()
+
+
+def init_app(app) -> None:
+    """Registrar la lista de revocacion cuando el modo sin estado esta activo."""
+    app.extensions.pop(EXTENSION_KEY, None)
+    if not app.config.get("JWT_STATELESS_AUTH", False):
+        return
+    app.extensions[EXTENSION_KEY] = TokenRevocationList(
+        refresh_seconds=float(app.config.get("JWT_REVOCATION_REFRESH_SECONDS", 30)),
+        token_lifetime=timedelta(minutes=int(app.config.get("JWT_ACCESS_TOKEN_EXPIRES_MIN", 60))),
+    )
+
+
+def obtener_lista_revocacion() -> Optional[TokenRevocationList]:
+    """Retornar la lista de revocacion de la aplicacion activa, si existe."""
+    try:
+        return current_app.extensions.get(EXTENSION_KEY)
+    except RuntimeError:
+        return None
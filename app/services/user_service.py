@@ -5,10 +5,12 @@ from __future__ import annotations
 import re
 from typing import Dict, Optional
 
-from werkzeug.security import generate_password_hash
-
+from app.cache import obtener_cache
 from app.models import User
-from app.repositories import UserRepository
+from app.repositories import RegistroDuplicadoError, UserRepository
+
+from .password_hasher import generar_hash
+from .token_revocation import obtener_lista_revocacion
 
 
 class UsuarioExistenteError(ValueError):
@@ -39,19 +41,35 @@ class UserService:
         datos = self._sanear_datos(nombre=nombre, email=email, password=password, rol=rol)
         self._validar_datos(**datos)
 
-        existente = self._repository.obtener_por_email(datos["email"])
-        if existente is not None:
-            raise UsuarioExistenteError("Ya existe un usuario con este correo electronico.")
-
-        password_hash = generate_password_hash(datos["password"])
-        creado = self._repository.crear_usuario(
-            email=datos["email"],
-            password_hash=password_hash,
-            nombre=datos["nombre"],
-            rol=datos["rol"],
-        )
+        password_hash = generar_hash(datos["password"])
+        try:
+            creado = self._repository.crear_usuario(
+                email=datos["email"],
+                password_hash=password_hash,
+                nombre=datos["nombre"],
+                rol=datos["rol"],
+            )
+        except RegistroDuplicadoError as exc:
+            raise UsuarioExistenteError("Ya existe un usuario con este correo electronico.") from exc
         return self._convertir_a_modelo(creado)
 
+    def cambiar_rol(self, user_id: str, rol: str) -> Optional[User]:
+        """Actualizar el rol de un usuario e invalidar su perfil en cache; None si no existe."""
+        rol_limpio = (rol or "").strip().lower()
+        if rol_limpio not in self.ROLES_DISPONIBLES:
+            raise DatosInvalidosError(
+                "El rol seleccionado no es valido. Roles permitidos: cliente, anfitrion, administrador."
+            )
+        actualizado = self._repository.actualizar_rol(user_id, rol_limpio)
+        if actualizado is None:
+            return None
+        invalidar_usuario_en_cache(user_id)
+        revocaciones = obtener_lista_revocacion()
+        if revocaciones is not None:
+            # Los tokens sin estado llevan el rol anterior en sus claims.
+            revocaciones.revocar_usuario(user_id)
+        return self._convertir_a_modelo(actualizado)
+
     def _convertir_a_modelo(self, registro: Dict[str, object]) -> User:
         return User(
             id=str(registro.get("id")),
@@ -95,3 +113,10 @@ class UserService:
 
         if errores:
             raise DatosInvalidosError(" ".join(errores))
+
+
+def invalidar_usuario_en_cache(user_id: str) -> None:
+    """Descartar el perfil cacheado por ``require_auth`` para el usuario."""
+    cache = obtener_cache("usuarios")
+    if cache is not None:
+        cache.pop(str(user_id))
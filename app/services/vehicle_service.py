@@ -2,20 +2,38 @@ from __future__ import annotations
 
 """Capa de servicios que encapsula la logica de vehiculos."""
 
+import hashlib
+import json
+import logging
 import mimetypes
 import re
+from dataclasses import fields as dataclass_fields
 from datetime import date, datetime, timezone
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence
+from typing import Any, Iterable, List, Optional, Sequence
 from uuid import uuid4
 
 from flask import current_app
 from werkzeug.datastructures import FileStorage
 
+from app.cache import obtener_cache
 from app.extensions import supabase_client
 from app.models import Vehicle
-from app.repositories import ReservationRepository, VehicleRepository
+from app.models.hydration import Hidratador
+from app.pagination import codificar_cursor, decodificar_cursor
+from app.repositories import ReservationRepository, RpcNoDisponibleError, VehicleRepository
+from app.serialization import cargar_json, serializar_lista
+
+from .availability_index import AvailabilityIndex, obtener_indice
+from .city_suggestions import CityTrie
+from .fleet_calendar import FleetCalendar, obtener_calendario
+from .listing_counts import ESTRATEGIA_EXACTA, ConteoListado, invalidar_conteos_donde
+
+logger = logging.getLogger(__name__)
+
+# Tolera columnas nuevas en ``vehicles`` (p. ej. location_key de la migracion 012).
+hidratar_vehiculo: Hidratador[Vehicle] = Hidratador(Vehicle)
 
 
 class VehicleService:
@@ -27,14 +45,36 @@ class VehicleService:
     ALLOWED_IMAGE_MIME_TYPES = {"image/jpeg", "image/png"}
     ALLOWED_IMAGE_EXTENSIONS = {"jpg", "jpeg", "png"}
     LICENSE_PLATE_REGEX = re.compile(r"^[A-Z]{3}\d{2}[A-Z0-9]$|^[A-Z]{3}\d{3}$")
+    # Proyeccion por defecto de los listados: lo que muestran las tarjetas del catalogo.
+    CAMPOS_RESUMEN = (
+        "id",
+        "make",
+        "model",
+        "year",
+        "vehicle_type",
+        "price_per_day",
+        "currency",
+        "location",
+        "capacity",
+        "status",
+    )
+    CAMPOS_VEHICULO = tuple(campo.name for campo in dataclass_fields(Vehicle))
+    # Necesarios para construir el modelo y el cursor de la pagina siguiente.
+    CAMPOS_OBLIGATORIOS = ("id", "price_per_day")
+    # Se pide siempre en las busquedas con modelos: el ETag del listado se deriva de esta columna.
+    CAMPO_VERSION = "updated_at"
 
     def __init__(
         self,
         repository: VehicleRepository | None = None,
         reservation_repository: ReservationRepository | None = None,
+        availability_index: AvailabilityIndex | None = None,
+        fleet_calendar: FleetCalendar | None = None,
     ) -> None:
         self._vehicle_repository = repository or VehicleRepository()
         self._reservation_repository = reservation_repository or ReservationRepository()
+        self._availability_index = availability_index
+        self._fleet_calendar = fleet_calendar
 
     # -------------------------------------------------------------------------
     # Consultas publicas
@@ -45,7 +85,7 @@ class VehicleService:
             return None
         if not include_inactive and record.get("status") != self.STATUS_ACTIVE:
             return None
-        return Vehicle(**record)
+        return hidratar_vehiculo(record)
 
     def buscar_vehiculos(
         self,
@@ -58,10 +98,83 @@ class VehicleService:
         fecha_fin: Optional[date] = None,
         limit: int = 20,
         offset: int = 0,
+        cursor: Optional[str] = None,
+        campos: Optional[Sequence[str]] = None,
+        crudo: bool = False,
     ) -> dict[str, object]:
+        """Buscar vehiculos activos paginando por offset o por cursor.
+
+        Con ``cursor`` se ignora ``offset`` y el total no se calcula; la
+        respuesta incluye ``next_cursor`` mientras la pagina venga completa.
+        ``campos`` limita las columnas pedidas a PostgREST (``None`` trae todas).
+        Con ``crudo`` y sin fechas, ``items`` es el arreglo JSON que envio
+        PostgREST (``bytes``) en lugar de una lista de :class:`Vehicle`.
+        Los resultados se recuerdan en la cache ``busquedas`` por la tupla
+        normalizada de filtros hasta que una escritura los invalida, junto con
+        un ``etag`` del contenido para responder ``304`` sin serializar.
+        """
+        filtros = {
+            "ciudad": ciudad,
+            "tipo": tipo,
+            "precio_min": precio_min,
+            "precio_max": precio_max,
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin,
+            "limit": limit,
+            "offset": offset,
+            "cursor": cursor,
+            "campos": self._normalizar_campos(campos),
+            # Con fechas hay que filtrar por disponibilidad sobre los modelos.
+            "crudo": crudo and not (fecha_inicio and fecha_fin),
+        }
+        cache = obtener_cache("busquedas")
+        if cache is None:
+            return self._con_etag(self._buscar_vehiculos(**filtros), filtros["campos"])
+
+        clave = _clave_busqueda(**filtros)
+        resultado = cache.get(clave)
+        if resultado is None:
+            resultado = self._con_etag(self._buscar_vehiculos(**filtros), filtros["campos"])
+            cache.set(clave, resultado)
+        return dict(resultado)
+
+    def _buscar_vehiculos(
+        self,
+        *,
+        ciudad: Optional[str],
+        tipo: Optional[str],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+        fecha_inicio: Optional[date],
+        fecha_fin: Optional[date],
+        limit: int,
+        offset: int,
+        cursor: Optional[str],
+        campos: Optional[tuple[str, ...]],
+        crudo: bool,
+    ) -> dict[str, object]:
+        columnas = ",".join(dict.fromkeys((*campos, self.CAMPO_VERSION))) if campos else "*"
+        despues_de = decodificar_cursor(cursor)
+        if despues_de is not None:
+            offset = 0
         requiere_disponibilidad = fecha_inicio is not None and fecha_fin is not None
+        conteo: Optional[ConteoListado] = None
 
         if requiere_disponibilidad:
+            resultado = self._buscar_disponibles(
+                ciudad=ciudad,
+                tipo=tipo,
+                precio_min=precio_min,
+                precio_max=precio_max,
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                limit=limit,
+                offset=offset,
+                despues_de=despues_de,
+            )
+            if resultado is not None:
+                return resultado
+
             response = self._vehicle_repository.search(
                 ciudad=ciudad,
                 tipo=tipo,
@@ -70,8 +183,14 @@ class VehicleService:
                 status=self.STATUS_ACTIVE,
                 limit=None,
                 offset=0,
+                despues_de=despues_de,
+                columnas=columnas,
             )
         else:
+            if despues_de is None:
+                conteo = ConteoListado(
+                    self._clave_conteo(ciudad, tipo, precio_min, precio_max, self.STATUS_ACTIVE)
+                )
             response = self._vehicle_repository.search(
                 ciudad=ciudad,
                 tipo=tipo,
@@ -80,33 +199,77 @@ class VehicleService:
                 status=self.STATUS_ACTIVE,
                 limit=limit,
                 offset=offset,
-                include_count=True,
+                include_count=conteo is not None and conteo.metodo is not None,
+                despues_de=despues_de,
+                metodo_conteo=(conteo.metodo if conteo is not None else None) or ESTRATEGIA_EXACTA,
+                # El arreglo se reenvia tal cual: se piden las columnas exactas del modelo.
+                columnas=",".join(campos or self.CAMPOS_VEHICULO) if crudo else columnas,
+                crudo=crudo,
             )
+            if crudo:
+                return self._pagina_cruda(response, conteo, limit=limit, offset=offset)
 
         data = getattr(response, "data", None) or []
-        vehiculos = [Vehicle(**item) for item in data]
+        vehiculos = hidratar_vehiculo.lista(data)
 
-        if requiere_disponibilidad and vehiculos:
+        if requiere_disponibilidad:
             vehiculos_disponibles = self._filtrar_por_disponibilidad(vehiculos, fecha_inicio, fecha_fin)
-            total = len(vehiculos_disponibles)
             items = vehiculos_disponibles[offset : offset + limit]
-        else:
-            total = getattr(response, "count", len(vehiculos)) or len(vehiculos)
+            total, estrategia = len(vehiculos_disponibles), ESTRATEGIA_EXACTA
+        elif conteo is not None:
             items = vehiculos
+            total, estrategia = conteo.total(response, data, limit=limit, offset=offset)
+        else:
+            items, total, estrategia = vehiculos, None, None
 
-        return {
-            "items": items,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-        }
+        return self._pagina(items, total=total, estrategia=estrategia, limit=limit, offset=offset)
 
     def listar_ciudades(self) -> List[str]:
+        return [ciudad["nombre"] for ciudad in self.obtener_catalogo_ciudades()["ciudades"]]
+
+    def obtener_catalogo_ciudades(self) -> dict[str, object]:
+        """Catalogo de ciudades con vehiculos activos por ciudad y su ETag.
+
+        Se guarda en la cache ``ciudades`` hasta que un vehiculo cambia; el
+        ETag solo varia cuando cambia el contenido.
+        """
+        cache = obtener_cache("ciudades")
+        catalogo = cache.get("catalogo") if cache is not None else None
+        if catalogo is not None:
+            return catalogo
+
         try:
-            return self._vehicle_repository.listar_ciudades()
+            ciudades = self._vehicle_repository.listar_catalogo_ciudades()
         except Exception as exc:  # pragma: no cover - devuelve error generico
             raise RuntimeError("No pudimos obtener el catalogo de ciudades.") from exc
 
+        contenido = json.dumps(ciudades, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        catalogo = {
+            "ciudades": ciudades,
+            "etag": hashlib.sha256(contenido).hexdigest()[:32],
+        }
+        if cache is not None:
+            cache.set("catalogo", catalogo)
+        return catalogo
+
+    def sugerir_ciudades(self, prefijo: str, limit: int = 8) -> List[dict[str, object]]:
+        """Ciudades cuyo nombre (o alguna de sus palabras) empieza por ``prefijo``.
+
+        El trie se construye una vez por version del catalogo y vive en la misma
+        cache ``ciudades``, por lo que se descarta junto con el catalogo.
+        """
+        if not (prefijo or "").strip():
+            return []
+        catalogo = self.obtener_catalogo_ciudades()
+        cache = obtener_cache("ciudades")
+        clave = ("trie", catalogo["etag"])
+        trie = cache.get(clave) if cache is not None else None
+        if trie is None:
+            trie = CityTrie(catalogo["ciudades"])
+            if cache is not None:
+                cache.set(clave, trie)
+        return trie.sugerir(prefijo, limit)
+
     # -------------------------------------------------------------------------
     # Operaciones de administracion
     # -------------------------------------------------------------------------
@@ -183,8 +346,13 @@ class VehicleService:
             self._eliminar_imagenes(bucket_name, rutas_subidas)
             self._vehicle_repository.delete({"id": vehicle_id})
             raise
+        finally:
+            # Se invalida con el registro ya definitivo (con imagenes o eliminado):
+            # una busqueda durante la subida no deja en cache el vehiculo sin imagenes.
+            invalidar_busquedas()
+            invalidar_catalogo_ciudades()
 
-        return Vehicle(**actualizado)
+        return hidratar_vehiculo(actualizado)
 
     def listar_admin(
         self,
@@ -193,27 +361,40 @@ class VehicleService:
         ciudad: Optional[str] = None,
         limit: int = 20,
         offset: int = 0,
+        cursor: Optional[str] = None,
+        campos: Optional[Sequence[str]] = None,
+        crudo: bool = False,
     ) -> dict[str, object]:
         estado_normalizado = status.lower() if status else None
         if estado_normalizado not in {None, self.STATUS_ACTIVE, self.STATUS_INACTIVE}:
             raise ValueError("El estado proporcionado no es valido.")
 
+        despues_de = decodificar_cursor(cursor)
+        if despues_de is not None:
+            offset = 0
+        conteo = None
+        if despues_de is None:
+            conteo = ConteoListado(self._clave_conteo(ciudad, None, None, None, estado_normalizado))
         respuesta = self._vehicle_repository.listar_admin(
             status=estado_normalizado,
             ciudad=ciudad,
             limit=limit,
             offset=offset,
+            include_count=conteo is not None and conteo.metodo is not None,
+            despues_de=despues_de,
+            metodo_conteo=(conteo.metodo if conteo is not None else None) or ESTRATEGIA_EXACTA,
+            columnas=",".join(self._normalizar_campos(campos) or (self.CAMPOS_VEHICULO if crudo else ())) or "*",
+            crudo=crudo,
         )
+        if crudo:
+            return self._pagina_cruda(respuesta, conteo, limit=limit, offset=offset)
         data = getattr(respuesta, "data", None) or []
-        items = [Vehicle(**item) for item in data]
-        total = getattr(respuesta, "count", len(items)) or len(items)
+        items = hidratar_vehiculo.lista(data)
+        if conteo is None:
+            return self._pagina(items, total=None, estrategia=None, limit=limit, offset=offset)
 
-        return {
-            "items": items,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-        }
+        total, estrategia = conteo.total(respuesta, data, limit=limit, offset=offset)
+        return self._pagina(items, total=total, estrategia=estrategia, limit=limit, offset=offset)
 
     def actualizar_estado(
         self,
@@ -238,20 +419,163 @@ class VehicleService:
             payload["validated_at"] = None
 
         actualizado = self._vehicle_repository.actualizar_vehiculo(vehicle_id, payload)
-        return Vehicle(**actualizado)
+        invalidar_busquedas()
+        invalidar_catalogo_ciudades()
+        return hidratar_vehiculo(actualizado)
 
     # -------------------------------------------------------------------------
     # Utilidades internas
     # -------------------------------------------------------------------------
+    def _buscar_disponibles(
+        self,
+        *,
+        ciudad: Optional[str],
+        tipo: Optional[str],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+        fecha_inicio: date,
+        fecha_fin: date,
+        limit: int,
+        offset: int,
+        despues_de: Optional[tuple[float, str]] = None,
+    ) -> Optional[dict[str, object]]:
+        """Resolver la busqueda por fechas en la base de datos.
+
+        Retorna ``None`` cuando la funcion remota no esta disponible para que el
+        llamador use el filtrado en dos pasos como respaldo.
+        """
+        try:
+            resultado = self._vehicle_repository.buscar_disponibles(
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                ciudad=ciudad,
+                tipo=tipo,
+                precio_min=precio_min,
+                precio_max=precio_max,
+                limit=limit,
+                offset=offset,
+                despues_de=despues_de,
+            )
+        except RpcNoDisponibleError:
+            logger.warning("buscar_vehiculos_disponibles no existe; se usa el filtrado en dos pasos.")
+            return None
+
+        con_total = despues_de is None
+        return self._pagina(
+            hidratar_vehiculo.lista(resultado["items"]),
+            total=resultado["total"] if con_total else None,
+            estrategia=ESTRATEGIA_EXACTA if con_total else None,
+            limit=limit,
+            offset=offset,
+        )
+
+    @classmethod
+    def _normalizar_campos(cls, campos: Optional[Sequence[str]]) -> Optional[tuple[str, ...]]:
+        if not campos:
+            return None
+        desconocidos = [campo for campo in campos if campo not in cls.CAMPOS_VEHICULO]
+        if desconocidos:
+            raise ValueError(f"Campos no validos: {', '.join(desconocidos)}.")
+        return tuple(dict.fromkeys([*cls.CAMPOS_OBLIGATORIOS, *campos]))
+
+    @staticmethod
+    def _clave_conteo(
+        ciudad: Optional[str],
+        tipo: Optional[str],
+        precio_min: Optional[float],
+        precio_max: Optional[float],
+        status: Optional[str],
+    ) -> tuple:
+        # Filtros equivalentes comparten la misma entrada en la cache de conteos.
+        return (
+            "vehiculos",
+            (ciudad or "").lower() or None,
+            (tipo or "").strip() or None,
+            precio_min,
+            precio_max,
+            status,
+        )
+
+    @staticmethod
+    def _pagina(
+        items: List[Vehicle],
+        *,
+        total: Optional[int],
+        estrategia: Optional[str],
+        limit: int,
+        offset: int,
+    ) -> dict[str, object]:
+        # Una pagina completa puede tener continuacion; el cursor apunta a su ultima fila.
+        siguiente = None
+        if items and len(items) >= limit > 0:
+            ultimo = items[-1]
+            siguiente = codificar_cursor(ultimo.price_per_day, ultimo.id)
+        return {
+            "items": items,
+            "total": total,
+            "total_strategy": estrategia,
+            "limit": limit,
+            "offset": offset,
+            "next_cursor": siguiente,
+        }
+
+    @staticmethod
+    def _con_etag(resultado: dict[str, object], campos: Optional[tuple[str, ...]]) -> dict[str, object]:
+        items = resultado["items"]
+        if isinstance(items, bytes):
+            # Passthrough: el arreglo de PostgREST ya es el contenido.
+            digest = hashlib.sha256(items)
+        elif all(vehiculo.updated_at for vehiculo in items):
+            # updated_at lo mantiene un trigger (migracion 013), como en el ETag del detalle.
+            digest = hashlib.sha256(repr([(vehiculo.id, vehiculo.updated_at) for vehiculo in items]).encode("utf-8"))
+        else:
+            contenido = json.dumps(serializar_lista(items, campos), default=str).encode("utf-8")
+            digest = hashlib.sha256(contenido)
+        digest.update(repr((campos, resultado["total"], resultado["limit"], resultado["offset"], resultado["next_cursor"])).encode("utf-8"))
+        resultado["etag"] = digest.hexdigest()[:32]
+        return resultado
+
+    @classmethod
+    def _pagina_cruda(
+        cls,
+        respuesta: Any,
+        conteo: Optional[ConteoListado],
+        *,
+        limit: int,
+        offset: int,
+    ) -> dict[str, object]:
+        # Solo se decodifica para contar filas y leer la ultima; no se construyen modelos.
+        filas = cargar_json(respuesta.contenido)
+        total, estrategia = None, None
+        if conteo is not None:
+            total, estrategia = conteo.total(respuesta, filas, limit=limit, offset=offset)
+        pagina = cls._pagina([], total=total, estrategia=estrategia, limit=limit, offset=offset)
+        pagina["items"] = respuesta.contenido
+        if filas and len(filas) >= limit > 0:
+            pagina["next_cursor"] = codificar_cursor(filas[-1]["price_per_day"], filas[-1]["id"])
+        return pagina
+
     def _filtrar_por_disponibilidad(
         self,
         vehiculos: Iterable[Vehicle],
         fecha_inicio: date,
         fecha_fin: date,
     ) -> List[Vehicle]:
+        vehiculos = list(vehiculos)
         ids = [vehiculo.id for vehiculo in vehiculos]
         if not ids:
             return []
+
+        for fuente in (
+            self._fleet_calendar or obtener_calendario(),
+            self._availability_index or obtener_indice(),
+        ):
+            if fuente is None:
+                continue
+            libres = fuente.vehiculos_libres(ids, fecha_inicio, fecha_fin)
+            if libres is not None:
+                return [vehiculo for vehiculo in vehiculos if vehiculo.id in libres]
+
         respuesta = self._reservation_repository.obtener_reservas_en_rango(ids, fecha_inicio, fecha_fin)
         reservaciones = getattr(respuesta, "data", None) or []
 
@@ -523,3 +847,64 @@ class VehicleService:
             if mensaje:
                 return f"No fue posible {accion}: {mensaje}"
         return f"No fue posible {accion}."
+
+
+def _clave_busqueda(
+    *,
+    ciudad: Optional[str],
+    tipo: Optional[str],
+    precio_min: Optional[float],
+    precio_max: Optional[float],
+    fecha_inicio: Optional[date],
+    fecha_fin: Optional[date],
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    campos: Optional[tuple[str, ...]],
+    crudo: bool,
+) -> tuple:
+    # Las fechas ocupan posiciones fijas (5 y 6) para invalidar por rango.
+    return (
+        "vehiculos",
+        (ciudad or "").lower() or None,
+        tipo or None,
+        precio_min,
+        precio_max,
+        fecha_inicio,
+        fecha_fin,
+        limit,
+        0 if cursor else offset,
+        cursor or None,
+        campos,
+        crudo,
+    )
+
+
+def invalidar_busquedas(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+) -> None:
+    """Descartar busquedas de vehiculos cacheadas en este proceso.
+
+    Sin fechas se descarta todo (cambio un vehiculo). Con fechas solo se
+    descartan las busquedas por disponibilidad cuyo rango se solapa con el de
+    una reserva creada o cancelada; las busquedas sin fechas no dependen de
+    las reservas.
+    """
+    cache = obtener_cache("busquedas")
+    if fecha_inicio is None or fecha_fin is None:
+        if cache is not None:
+            cache.clear()
+        invalidar_conteos_donde(lambda clave: clave[0] == "vehiculos")
+        return
+    if cache is not None:
+        cache.invalidar_donde(
+            lambda clave: clave[5] is not None and clave[5] <= fecha_fin and clave[6] >= fecha_inicio
+        )
+
+
+def invalidar_catalogo_ciudades() -> None:
+    """Descartar el catalogo de ciudades cacheado en este proceso."""
+    cache = obtener_cache("ciudades")
+    if cache is not None:
+        cache.clear()
@@ -0,0 +1,68 @@
+"""Medir memoria y latencia del calendario de flota.
+
+Uso: ``python -m benchmarks.fleet_calendar`` desde la raiz del repositorio.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import date, timedelta
+
+from app.services.fleet_calendar import FleetCalendar
+
+
+class _RepositorioSintetico:
+    def __init__(self, vehiculos: int, reservas_por_vehiculo: int, origen: date) -> None:
+        self._registros = []
+        generador = random.Random(42)
+        for indice in range(vehiculos):
+            for numero in range(reservas_por_vehiculo):
+                inicio = origen + timedelta(days=generador.randrange(0, 360))
+                self._registros.append(
+                    {
+                        "id": f"r-{indice}-{numero}",
+                        "vehicle_id": f"v-{indice}",
+                        "start_date": inicio.isoformat(),
+                        "end_date": (inicio + timedelta(days=generador.randrange(0, 6))).isoformat(),
+                        "status": "confirmada",
+                    }
+                )
+
+    def listar_vigentes(self, desde: date) -> list[dict[str, object]]:
+        return self._registros
+
+
+def _medir(funcion, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+def main() -> None:
+    origen = date.today().replace(day=1)
+    fecha_inicio = origen + timedelta(days=40)
+    fecha_fin = fecha_inicio + timedelta(days=6)
+
+    for vehiculos in (10_000, 100_000):
+        calendario = FleetCalendar(_RepositorioSintetico(vehiculos, 4, origen))
+        inicio = time.perf_counter()
+        calendario.cargar(origen)
+        carga_ms = (time.perf_counter() - inicio) * 1000
+
+        todos = [f"v-{indice}" for indice in range(vehiculos)]
+        pagina = todos[:: max(vehiculos // 100, 1)][:100]
+        flota_ms = _medir(lambda: calendario.vehiculos_libres(todos, fecha_inicio, fecha_fin), 5)
+        pagina_ms = _medir(lambda: calendario.vehiculos_libres(pagina, fecha_inicio, fecha_fin), 200)
+        mes_ms = _medir(lambda: calendario.calendario_mensual("v-1", fecha_inicio.year, fecha_inicio.month), 2000)
+
+        print(
+            f"{vehiculos:>7} vehiculos | matriz {calendario.memoria_bytes / 1024 / 1024:6.1f} MiB"
+            f" | carga {carga_ms:8.1f} ms | flota completa {flota_ms:7.2f} ms"
+            f" | 100 candidatos {pagina_ms:6.3f} ms | mes {mes_ms:6.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
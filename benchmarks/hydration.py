@@ -0,0 +1,124 @@
+"""Comparar la construccion de modelos desde filas de Supabase.
+
+Mide ``Vehicle(**fila)`` y la conversion campo a campo de reservas que usaba
+``ReservationService`` contra los hidratadores generados de
+``app.models.hydration``, sobre resultados grandes.
+
+Uso: ``python -m benchmarks.hydration --filas 10000`` desde la raiz del
+repositorio.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from app.models import Reservation, Vehicle
+from app.models.hydration import Hidratador
+
+
+def _filas_vehiculos(cantidad: int) -> list[dict]:
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{indice:012d}",
+            "license_plate": f"ABC{indice % 1000:03d}",
+            "status": "activo",
+            "owner_id": "propietario-1",
+            "make": "Renault",
+            "model": "Duster",
+            "year": 2022,
+            "vehicle_type": "suv",
+            "price_per_day": 40.0 + indice % 100,
+            "currency": "USD",
+            "description": "Vehiculo de prueba.",
+            "location": "Medellin",
+            "capacity": 5,
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "images": [],
+        }
+        for indice in range(cantidad)
+    ]
+
+
+def _filas_reservas(cantidad: int) -> list[dict]:
+    inicio = date(2024, 1, 1)
+    return [
+        {
+            "id": f"reserva-{indice}",
+            "vehicle_id": f"vehiculo-{indice % 50}",
+            "user_id": "usuario-1",
+            "start_date": (inicio + timedelta(days=indice % 365)).isoformat(),
+            "end_date": (inicio + timedelta(days=indice % 365 + 3)).isoformat(),
+            "status": "confirmada",
+            "created_at": "2024-01-01T00:00:00+00:00",
+            "comentarios": None,
+        }
+        for indice in range(cantidad)
+    ]
+
+
+def _reserva_campo_a_campo(registro: dict) -> Reservation:
+    # Conversion anterior de ReservationService._convertir_a_modelo.
+    def fecha(valor):
+        return valor if isinstance(valor, date) else date.fromisoformat(str(valor))
+
+    return Reservation(
+        id=str(registro.get("id")),
+        vehicle_id=str(registro.get("vehicle_id")),
+        user_id=registro.get("user_id"),
+        start_date=fecha(registro.get("start_date")),
+        end_date=fecha(registro.get("end_date")),
+        status=str(registro.get("status") or "confirmada"),
+        created_at=registro.get("created_at"),
+        comentarios=registro.get("comentarios"),
+    )
+
+
+def _medir_ms(funcion, repeticiones: int) -> float:
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=10_000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    vehiculos = _filas_vehiculos(args.filas)
+    reservas = _filas_reservas(args.filas)
+    hidratar_vehiculo = Hidratador(Vehicle)
+    hidratar_reserva = Hidratador(Reservation, si_vacio={"status": "confirmada"})
+
+    casos = (
+        ("vehiculos", lambda: [Vehicle(**fila) for fila in vehiculos], lambda: hidratar_vehiculo.lista(vehiculos)),
+        (
+            "reservas",
+            lambda: [_reserva_campo_a_campo(fila) for fila in reservas],
+            lambda: hidratar_reserva.lista(reservas),
+        ),
+    )
+    for nombre, antes, despues in casos:
+        ms_antes = _medir_ms(antes, args.repeticiones)
+        ms_despues = _medir_ms(despues, args.repeticiones)
+        print(
+            f"{nombre:<10} | {args.filas} filas | actual {ms_antes:8.2f} ms"
+            f" | hidratador {ms_despues:8.2f} ms | {ms_antes / ms_despues:4.1f}x"
+        )
+
+    # Una columna nueva rompe Vehicle(**fila) pero no al hidratador.
+    con_columna_nueva = dict(vehiculos[0], location_key="medellin")
+    try:
+        Vehicle(**con_columna_nueva)
+    except TypeError as exc:
+        print(f"\nVehicle(**fila) con columna nueva: TypeError ({exc})")
+    hidratar_vehiculo(con_columna_nueva)
+    print(f"hidratador con columna nueva: ignora {sorted(hidratar_vehiculo.columnas_ignoradas)}")
+
+
+if __name__ == "__main__":
+    main()
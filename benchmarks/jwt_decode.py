@@ -0,0 +1,45 @@
+"""Medir el rendimiento de ``decode_token`` con y sin la cache de tokens.
+
+Uso: ``python -m benchmarks.jwt_decode`` desde la raiz del repositorio. La
+variante sin cache desactiva ``JWT_DECODE_CACHE_MAX_ENTRIES`` y equivale a
+verificar la firma y decodificar el payload en cada peticion.
+"""
+
+from __future__ import annotations
+
+import time
+
+from app import create_app
+from app.config import TestConfig
+from app.security import create_access_token, decode_token
+
+
+class _SinCache(TestConfig):
+    JWT_DECODE_CACHE_MAX_ENTRIES = 0
+
+
+def _medir(config: type[TestConfig], tokens_distintos: int, repeticiones: int) -> float:
+    app = create_app(config)
+    with app.app_context():
+        tokens = [create_access_token(f"usuario-{indice}", {"rol": "cliente"}) for indice in range(tokens_distintos)]
+        for token in tokens:
+            decode_token(token)
+        inicio = time.perf_counter()
+        for numero in range(repeticiones):
+            decode_token(tokens[numero % tokens_distintos])
+        return repeticiones / (time.perf_counter() - inicio)
+
+
+def main() -> None:
+    repeticiones = 200_000
+    for tokens_distintos in (1, 1_000):
+        sin_cache = _medir(_SinCache, tokens_distintos, repeticiones)
+        con_cache = _medir(TestConfig, tokens_distintos, repeticiones)
+        print(
+            f"{tokens_distintos:>5} tokens | sin cache {sin_cache:>10,.0f} decodificaciones/s"
+            f" | con cache {con_cache:>10,.0f} decodificaciones/s | x{con_cache / sin_cache:4.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
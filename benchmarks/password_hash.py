@@ -0,0 +1,93 @@
+"""Calibrar el costo del hash de contrasenas para este hardware.
+
+Mide la latencia de ``check_password_hash`` (lo que paga cada login) para
+varios parametros de scrypt y PBKDF2, estima hashes por segundo y por nucleo
+y recomienda el metodo mas costoso cuyo p99 cumple el objetivo.
+
+Uso: ``python -m benchmarks.password_hash --p99-ms 250`` desde la raiz del
+repositorio. El valor recomendado va en ``PASSWORD_HASH_METHOD``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Ordenados de menor a mayor costo dentro de cada familia.
+CANDIDATOS = {
+    "scrypt": [f"scrypt:{2 ** exponente}:8:1" for exponente in (14, 15, 16, 17)],
+    "pbkdf2": [f"pbkdf2:sha256:{iteraciones}" for iteraciones in (200_000, 600_000, 1_000_000, 2_000_000)],
+}
+
+
+def _latencias_ms(password_hash: str, repeticiones: int) -> list[float]:
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        check_password_hash(password_hash, "ContrasenaDeCalibracion")
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return sorted(latencias)
+
+
+def _percentil(valores: list[float], fraccion: float) -> float:
+    return valores[min(int(round(fraccion * (len(valores) - 1))), len(valores) - 1)]
+
+
+def _rendimiento_paralelo(password_hash: str, procesos: int, por_proceso: int) -> float:
+    """Hashes por segundo con todos los procesos ocupados a la vez."""
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        # Arrancar los procesos antes de medir.
+        list(executor.map(_latencias_ms, [password_hash] * procesos, [1] * procesos))
+        inicio = time.perf_counter()
+        list(executor.map(_latencias_ms, [password_hash] * procesos, [por_proceso] * procesos))
+        return procesos * por_proceso / (time.perf_counter() - inicio)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--p99-ms", type=float, default=250.0, help="latencia p99 objetivo del hash en login")
+    parser.add_argument("--familia", choices=sorted(CANDIDATOS), default="scrypt")
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument(
+        "--procesos",
+        type=int,
+        default=int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or os.cpu_count() or 1,
+        help="procesos para medir el rendimiento agregado (por defecto PASSWORD_HASH_WORKERS o nucleos)",
+    )
+    args = parser.parse_args()
+
+    recomendado = None
+    for metodo in CANDIDATOS[args.familia]:
+        password_hash = generate_password_hash("ContrasenaDeCalibracion", method=metodo)
+        latencias = _latencias_ms(password_hash, args.repeticiones)
+        p50 = _percentil(latencias, 0.50)
+        p99 = _percentil(latencias, 0.99)
+        agregado = _rendimiento_paralelo(password_hash, args.procesos, max(args.repeticiones // 3, 3))
+        cumple = p99 <= args.p99_ms
+        print(
+            f"{metodo:<24} | p50 {p50:8.1f} ms | p99 {p99:8.1f} ms"
+            f" | {1000 / p50:6.1f} hash/s/nucleo | {agregado:7.1f} hash/s con {args.procesos} procesos"
+            f" | {'cumple' if cumple else 'excede'}"
+        )
+        if cumple:
+            recomendado = (metodo, agregado)
+        else:
+            break
+
+    if recomendado is None:
+        print(f"\nNingun candidato cumple p99 <= {args.p99_ms:.0f} ms; revisa el hardware o el objetivo.")
+        return
+    metodo, agregado = recomendado
+    print(f"\nPASSWORD_HASH_METHOD={metodo}")
+    print(
+        f"Capacidad estimada: ~{agregado:.0f} logins/s con {args.procesos} procesos;"
+        " por encima de eso la cola de PASSWORD_HASH_MAX_PENDING responde 503."
+    )
+
+
+if __name__ == "__main__":
+    main()
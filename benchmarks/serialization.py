@@ -0,0 +1,94 @@
+"""Comparar la serializacion de paginas de vehiculos y reservas.
+
+Mide ``dataclasses.asdict`` + ``jsonify`` con el proveedor JSON por defecto
+de Flask contra los codificadores de ``app.serialization`` con el backend
+configurado (orjson si esta instalado), sobre paginas de 100 elementos.
+
+Uso: ``python -m benchmarks.serialization`` desde la raiz del repositorio.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import asdict
+from datetime import date, timedelta
+
+from flask import Flask, jsonify
+
+from app import create_app
+from app.config import TestConfig
+from app.models import Reservation, Vehicle
+from app.serialization import serializar_lista
+
+
+def _vehiculos(cantidad: int) -> list[Vehicle]:
+    return [
+        Vehicle(
+            id=f"00000000-0000-0000-0000-{indice:012d}",
+            license_plate=f"ABC{indice:03d}",
+            status="activo",
+            owner_id="propietario-1",
+            make="Renault",
+            model="Duster",
+            year=2022,
+            vehicle_type="suv",
+            price_per_day=40.0 + indice,
+            description="Vehiculo de prueba con aire acondicionado.",
+            location="Medellin",
+            capacity=5,
+            created_at="2024-01-01T00:00:00+00:00",
+            images=[{"path": f"{indice}/{foto}.jpg", "url": f"https://img/{indice}/{foto}.jpg"} for foto in range(3)],
+        )
+        for indice in range(cantidad)
+    ]
+
+
+def _reservas(cantidad: int) -> list[Reservation]:
+    inicio = date(2024, 1, 1)
+    return [
+        Reservation(
+            id=f"reserva-{indice}",
+            vehicle_id=f"vehiculo-{indice % 10}",
+            user_id="usuario-1",
+            start_date=inicio + timedelta(days=indice),
+            end_date=inicio + timedelta(days=indice + 3),
+            status="confirmada",
+            created_at="2024-01-01T00:00:00+00:00",
+        )
+        for indice in range(cantidad)
+    ]
+
+
+def _medir_ms(funcion, repeticiones: int) -> float:
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamano", type=int, default=100, help="elementos por pagina")
+    parser.add_argument("--repeticiones", type=int, default=500)
+    args = parser.parse_args()
+
+    base = Flask(__name__)
+    base.json.sort_keys = False
+    rapida = create_app(TestConfig)
+    print(f"backend rapido: {type(rapida.json).__name__}")
+
+    for nombre, items in (("vehiculos", _vehiculos(args.tamano)), ("reservas", _reservas(args.tamano))):
+        with base.app_context():
+            antes = _medir_ms(lambda: jsonify({"items": [asdict(item) for item in items]}).get_data(), args.repeticiones)
+        with rapida.app_context():
+            despues = _medir_ms(lambda: jsonify({"items": serializar_lista(items)}).get_data(), args.repeticiones)
+        print(
+            f"{nombre:<10} | asdict+jsonify {antes:7.3f} ms | serializar {despues:7.3f} ms"
+            f" | {antes / despues:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
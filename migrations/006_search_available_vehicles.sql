@@ -0,0 +1,55 @@
+-- 006_search_available_vehicles.sql
+-- Funcion para buscar vehiculos disponibles en un rango de fechas en una sola consulta.
+
+create or replace function public.buscar_vehiculos_disponibles(
+    p_fecha_inicio date,
+    p_fecha_fin date,
+    p_ciudad text default null,
+    p_tipo text default null,
+    p_precio_min numeric default null,
+    p_precio_max numeric default null,
+    p_limit integer default 20,
+    p_offset integer default 0
+)
+returns jsonb
+language sql
+stable
+as $$
+    with candidatos as (
+        select v.*
+        from public.vehicles v
+        where v.status = 'activo'
+          and (p_ciudad is null or v.location ilike '%' || p_ciudad || '%')
+          and (p_tipo is null or v.vehicle_type = p_tipo)
+          and (p_precio_min is null or v.price_per_day >= p_precio_min)
+          and (p_precio_max is null or v.price_per_day <= p_precio_max)
+          and not exists (
+              select 1
+              from public.reservations r
+              where r.vehicle_id = v.id
+                and r.status <> 'cancelada'
+                and r.start_date <= p_fecha_fin
+                and r.end_date >= p_fecha_inicio
+          )
+    ),
+    pagina as (
+        select *
+        from candidatos
+        order by price_per_day, id
+        limit greatest(p_limit, 0)
+        offset greatest(p_offset, 0)
+    )
+    select jsonb_build_object(
+        'total', (select count(*) from candidatos),
+        'items', coalesce(
+            (select jsonb_agg(to_jsonb(pagina) order by pagina.price_per_day, pagina.id) from pagina),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+comment on function public.buscar_vehiculos_disponibles(date, date, text, text, numeric, numeric, integer, integer)
+    is 'Busca vehiculos activos sin reservas vigentes en el rango, ordenados por precio y paginados, junto con el total.';
+
+grant execute on function public.buscar_vehiculos_disponibles(date, date, text, text, numeric, numeric, integer, integer)
+    to anon, authenticated, service_role;
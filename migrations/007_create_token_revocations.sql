@@ -0,0 +1,20 @@
+-- 007_create_token_revocations.sql
+-- Lista de revocacion para el modo de autenticacion sin estado (JWT con rol en los claims).
+
+create table if not exists public.token_revocations (
+    id uuid primary key default gen_random_uuid(),
+    jti text,
+    user_id uuid references public.users(id) on delete cascade,
+    not_before timestamptz,
+    expires_at timestamptz not null,
+    created_at timestamptz not null default timezone('utc', now()),
+    constraint token_revocations_target_check check (jti is not null or (user_id is not null and not_before is not null))
+);
+
+create index if not exists token_revocations_expires_idx on public.token_revocations (expires_at);
+create unique index if not exists token_revocations_jti_uidx on public.token_revocations (jti) where jti is not null;
+
+comment on table public.token_revocations is 'Tokens de acceso revocados antes de expirar (por jti o por usuario).';
+comment on column public.token_revocations.jti is 'Identificador del token revocado individualmente.';
+comment on column public.token_revocations.not_before is 'Tokens del usuario emitidos hasta este instante dejan de ser validos.';
+comment on column public.token_revocations.expires_at is 'Momento a partir del cual la entrada ya no es necesaria.';
@@ -0,0 +1,22 @@
+-- 008_create_refresh_tokens.sql
+-- Tokens de renovacion rotativos almacenados como HMAC del valor entregado al cliente.
+
+create table if not exists public.refresh_tokens (
+    id uuid primary key default gen_random_uuid(),
+    user_id uuid not null references public.users(id) on delete cascade,
+    family_id uuid not null,
+    token_hash text not null,
+    expires_at timestamptz not null,
+    revoked_at timestamptz,
+    replaced_by uuid references public.refresh_tokens(id) on delete set null,
+    created_at timestamptz not null default timezone('utc', now())
+);
+
+create unique index if not exists refresh_tokens_hash_uidx on public.refresh_tokens (token_hash);
+create index if not exists refresh_tokens_family_idx on public.refresh_tokens (family_id);
+create index if not exists refresh_tokens_user_idx on public.refresh_tokens (user_id);
+
+comment on table public.refresh_tokens is 'Tokens de renovacion emitidos al iniciar sesion; cada uso los rota dentro de su familia.';
+comment on column public.refresh_tokens.family_id is 'Cadena de rotaciones originada en un mismo inicio de sesion.';
+comment on column public.refresh_tokens.token_hash is 'HMAC-SHA256 del token entregado al cliente.';
+comment on column public.refresh_tokens.replaced_by is 'Token emitido al rotar este; reutilizar un token rotado revoca la familia.';
@@ -0,0 +1,8 @@
+-- 009_users_email_lower_unique.sql
+-- Unicidad del correo sin distinguir mayusculas para registrar usuarios con una sola insercion.
+-- Si la creacion falla por duplicados previos, unificalos antes de aplicar esta migracion:
+--   select lower(email), count(*) from public.users group by 1 having count(*) > 1;
+
+create unique index if not exists users_email_lower_uidx on public.users (lower(email));
+
+comment on index public.users_email_lower_uidx is 'Evita cuentas duplicadas por correo; el backend traduce la violacion (23505) a 409.';
@@ -0,0 +1,71 @@
+-- 010_vehicle_keyset_pagination.sql
+-- Indices compuestos para paginar el catalogo por (price_per_day, id) y soporte de cursor
+-- en la busqueda de vehiculos disponibles.
+
+-- Catalogo publico: status = 'activo' ordenado por precio e id.
+create index if not exists vehicles_status_price_id_idx
+    on public.vehicles (status, price_per_day, id);
+
+-- Panel administrativo sin filtro de estado.
+create index if not exists vehicles_price_id_idx
+    on public.vehicles (price_per_day, id);
+
+drop function if exists public.buscar_vehiculos_disponibles(date, date, text, text, numeric, numeric, integer, integer);
+
+create or replace function public.buscar_vehiculos_disponibles(
+    p_fecha_inicio date,
+    p_fecha_fin date,
+    p_ciudad text default null,
+    p_tipo text default null,
+    p_precio_min numeric default null,
+    p_precio_max numeric default null,
+    p_limit integer default 20,
+    p_offset integer default 0,
+    p_cursor_precio numeric default null,
+    p_cursor_id uuid default null
+)
+returns jsonb
+language sql
+stable
+as $$
+    with candidatos as (
+        select v.*
+        from public.vehicles v
+        where v.status = 'activo'
+          and (p_ciudad is null or v.location ilike '%' || p_ciudad || '%')
+          and (p_tipo is null or v.vehicle_type = p_tipo)
+          and (p_precio_min is null or v.price_per_day >= p_precio_min)
+          and (p_precio_max is null or v.price_per_day <= p_precio_max)
+          and not exists (
+              select 1
+              from public.reservations r
+              where r.vehicle_id = v.id
+                and r.status <> 'cancelada'
+                and r.start_date <= p_fecha_fin
+                and r.end_date >= p_fecha_inicio
+          )
+    ),
+    pagina as (
+        select *
+        from candidatos
+        where p_cursor_id is null
+           or (price_per_day, id) > (p_cursor_precio, p_cursor_id)
+        order by price_per_day, id
+        limit greatest(p_limit, 0)
+        offset case when p_cursor_id is null then greatest(p_offset, 0) else 0 end
+    )
+    select jsonb_build_object(
+        -- Con cursor el total no se calcula; el cliente avanza con next_cursor.
+        'total', case when p_cursor_id is null then (select count(*) from candidatos) end,
+        'items', coalesce(
+            (select jsonb_agg(to_jsonb(pagina) order by pagina.price_per_day, pagina.id) from pagina),
+            '[]'::jsonb
+        )
+    );
+$$;
+
+comment on function public.buscar_vehiculos_disponibles(date, date, text, text, numeric, numeric, integer, integer, numeric, uuid)
+    is 'Busca vehiculos activos sin reservas vigentes en el rango, ordenados por precio e id, paginados por offset o por cursor (precio, id).';
+
+grant execute on function public.buscar_vehiculos_disponibles(date, date, text, text, numeric, numeric, integer, integer, numeric, uuid)
+    to anon, authenticated, service_role;
@@ -0,0 +1,75 @@
+-- 011_create_vehicle_cities.sql
+-- Catalogo de ciudades mantenido por trigger para /api/vehicles/cities.
+-- Evita recorrer toda la tabla vehicles en cada consulta del catalogo.
+
+create table if not exists public.vehicle_cities (
+    city_key text primary key,
+    name text not null,
+    vehicle_count integer not null default 0,
+    active_count integer not null default 0,
+    updated_at timestamptz not null default timezone('utc', now())
+);
+
+comment on table public.vehicle_cities is 'Ciudades distintas de la flota con conteos de vehiculos, mantenidas por trigger.';
+comment on column public.vehicle_cities.city_key is 'Ubicacion normalizada (lower/trim) usada para deduplicar.';
+comment on column public.vehicle_cities.active_count is 'Vehiculos con status = activo en la ciudad.';
+
+create or replace function public.ajustar_vehicle_city(p_location text, p_total integer, p_activos integer)
+returns void
+language plpgsql
+as $$
+declare
+    v_nombre text := btrim(coalesce(p_location, ''));
+begin
+    if v_nombre = '' then
+        return;
+    end if;
+
+    insert into public.vehicle_cities as c (city_key, name, vehicle_count, active_count)
+    values (lower(v_nombre), v_nombre, greatest(p_total, 0), greatest(p_activos, 0))
+    on conflict (city_key) do update
+        set vehicle_count = c.vehicle_count + p_total,
+            active_count = c.active_count + p_activos,
+            updated_at = timezone('utc', now());
+
+    delete from public.vehicle_cities
+    where city_key = lower(v_nombre)
+      and vehicle_count <= 0;
+end;
+$$;
+
+create or replace function public.vehicles_sync_city_catalog()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.ajustar_vehicle_city(old.location, -1, case when old.status = 'activo' then -1 else 0 end);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.ajustar_vehicle_city(new.location, 1, case when new.status = 'activo' then 1 else 0 end);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists vehicles_sync_city_catalog on public.vehicles;
+create trigger vehicles_sync_city_catalog
+    after insert or delete or update of location, status on public.vehicles
+    for each row execute function public.vehicles_sync_city_catalog();
+
+-- Carga inicial desde la flota existente.
+insert into public.vehicle_cities (city_key, name, vehicle_count, active_count)
+select lower(btrim(location)),
+       min(btrim(location)),
+       count(*),
+       count(*) filter (where status = 'activo')
+from public.vehicles
+where btrim(coalesce(location, '')) <> ''
+group by lower(btrim(location))
+on conflict (city_key) do update
+    set vehicle_count = excluded.vehicle_count,
+        active_count = excluded.active_count,
+        updated_at = timezone('utc', now());
+
+grant select on public.vehicle_cities to anon, authenticated, service_role;
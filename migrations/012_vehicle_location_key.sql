@@ -0,0 +1,95 @@
+-- 012_vehicle_location_key.sql
+-- Clave de ciudad normalizada (minusculas, sin acentos) con indice de trigramas para que
+-- el filtro por ciudad deje de recorrer toda la tabla con ilike '%...%'.
+
+-- Supabase instala las extensiones en el esquema "extensions"; si unaccent ya existe alli,
+-- "create extension ... with schema" no la mueve. Por eso se busca su esquema real.
+create extension if not exists unaccent with schema public;
+create extension if not exists pg_trgm;
+
+-- unaccent() no es IMMUTABLE; fijar funcion y diccionario con su esquema permite usarla en
+-- columnas generadas e indices.
+do $do$
+declare
+    v_esquema text;
+begin
+    select n.nspname into v_esquema
+      from pg_extension e
+      join pg_namespace n on n.oid = e.extnamespace
+     where e.extname = 'unaccent';
+
+    execute format(
+        $fn$
+        create or replace function public.normalizar_ciudad(p_valor text)
+        returns text
+        language sql
+        immutable
+        parallel safe
+        as $body$
+            select regexp_replace(lower(%1$I.unaccent(%2$L::regdictionary, btrim(coalesce(p_valor, '')))), '\s+', ' ', 'g');
+        $body$
+        $fn$,
+        v_esquema,
+        format('%I.unaccent', v_esquema)
+    );
+end;
+$do$;
+
+alter table public.vehicles
+    add column if not exists location_key text generated always as (public.normalizar_ciudad(location)) stored;
+
+comment on column public.vehicles.location_key is 'Ubicacion normalizada para filtros por ciudad; la calcula la base de datos.';
+
+create index if not exists vehicles_location_key_trgm_idx
+    on public.vehicles using gin (location_key gin_trgm_ops);
+
+create or replace function public.buscar_vehiculos_disponibles(
+    p_fecha_inicio date,
+    p_fecha_fin date,
+    p_ciudad text default null,
+    p_tipo text default null,
+    p_precio_min numeric default null,
+    p_precio_max numeric default null,
+    p_limit integer default 20,
+    p_offset integer default 0,
+    p_cursor_precio numeric default null,
+    p_cursor_id uuid default null
+)
+returns jsonb
+language sql
+stable
+as $$
+    with candidatos as (
+        select v.*
+        from public.vehicles v
+        where v.status = 'activo'
+          and (p_ciudad is null or v.location_key like '%' || public.normalizar_ciudad(p_ciudad) || '%')
+          and (p_tipo is null or v.vehicle_type = p_tipo)
+          and (p_precio_min is null or v.price_per_day >= p_precio_min)
+          and (p_precio_max is null or v.price_per_day <= p_precio_max)
+          and not exists (
+              select 1
+              from public.reservations r
+              where r.vehicle_id = v.id
+                and r.status <> 'cancelada'
+                and r.start_date <= p_fecha_fin
+                and r.end_date >= p_fecha_inicio
+          )
+    ),
+    pagina as (
+        select *
+        from candidatos
+        where p_cursor_id is null
+           or (price_per_day, id) > (p_cursor_precio, p_cursor_id)
+        order by price_per_day, id
+        limit greatest(p_limit, 0)
+        offset case when p_cursor_id is null then greatest(p_offset, 0) else 0 end
+    )
+    select jsonb_build_object(
+        'total', case when p_cursor_id is null then (select count(*) from candidatos) end,
+        'items', coalesce(
+            (select jsonb_agg(to_jsonb(pagina) order by pagina.price_per_day, pagina.id) from pagina),
+            '[]'::jsonb
+        )
+    );
+$$;
@@ -0,0 +1,19 @@
+-- 013_vehicles_updated_at_trigger.sql
+-- Mantiene vehicles.updated_at en cada actualizacion; el ETag de GET /api/vehicles/<id> se deriva de esta columna.
+
+create or replace function public.tocar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := timezone('utc', now());
+    return new;
+end;
+$$;
+
+drop trigger if exists vehicles_tocar_updated_at on public.vehicles;
+create trigger vehicles_tocar_updated_at
+    before update on public.vehicles
+    for each row execute function public.tocar_updated_at();
+
+comment on column public.vehicles.updated_at is 'Ultima modificacion de la fila; la mantiene el trigger vehicles_tocar_updated_at.';
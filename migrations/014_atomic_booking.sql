@@ -0,0 +1,92 @@
+-- 014_atomic_booking.sql
+-- Reserva y pago en una sola transaccion, con una restriccion de exclusion que impide
+-- solapar reservas vigentes del mismo vehiculo incluso con solicitudes concurrentes.
+-- Si la restriccion falla por solapamientos previos, revisalos antes de aplicar esta migracion:
+--   select a.id, b.id from public.reservations a join public.reservations b
+--     on a.vehicle_id = b.vehicle_id and a.id < b.id
+--    and a.status <> 'cancelada' and b.status <> 'cancelada'
+--    and daterange(a.start_date, a.end_date, '[]') && daterange(b.start_date, b.end_date, '[]');
+
+create extension if not exists btree_gist;
+
+alter table public.reservations
+    drop constraint if exists reservations_sin_solapamiento;
+alter table public.reservations
+    add constraint reservations_sin_solapamiento
+    exclude using gist (vehicle_id with =, daterange(start_date, end_date, '[]') with &&)
+    where (status <> 'cancelada');
+
+comment on constraint reservations_sin_solapamiento on public.reservations
+    is 'Un vehiculo no puede tener dos reservas no canceladas con fechas solapadas (ambos extremos incluidos); el backend traduce la violacion (23P01) a un conflicto.';
+
+create or replace function public.crear_reserva_con_pago(
+    p_vehicle_id uuid,
+    p_user_id uuid,
+    p_fecha_inicio date,
+    p_fecha_fin date,
+    p_comentarios text default null,
+    p_provider text default 'tarjeta',
+    p_reference text default null,
+    p_card_last4 text default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_vehiculo public.vehicles%rowtype;
+    v_monto numeric(12,2);
+    v_reserva public.reservations%rowtype;
+    v_pago public.payments%rowtype;
+begin
+    if p_fecha_fin < p_fecha_inicio then
+        return jsonb_build_object('error', 'rango_invalido');
+    end if;
+
+    -- "for share" evita que el vehiculo se desactive o cambie de precio a mitad de la reserva.
+    select * into v_vehiculo from public.vehicles where id = p_vehicle_id for share;
+    if not found then
+        return jsonb_build_object('error', 'vehiculo_no_encontrado');
+    end if;
+    if v_vehiculo.status <> 'activo' then
+        return jsonb_build_object('error', 'vehiculo_no_disponible');
+    end if;
+
+    v_monto := round(v_vehiculo.price_per_day * (p_fecha_fin - p_fecha_inicio + 1), 2);
+    if v_monto <= 0 then
+        return jsonb_build_object('error', 'monto_invalido');
+    end if;
+
+    -- Un solapamiento aborta la transaccion con 23P01 (reservations_sin_solapamiento).
+    insert into public.reservations (vehicle_id, user_id, start_date, end_date, status, comentarios)
+    values (p_vehicle_id, p_user_id, p_fecha_inicio, p_fecha_fin, 'confirmada', p_comentarios)
+    returning * into v_reserva;
+
+    insert into public.payments (reservation_id, user_id, amount, currency, status, provider, reference, card_last4)
+    values (
+        v_reserva.id,
+        p_user_id,
+        v_monto,
+        v_vehiculo.currency,
+        'pagado',
+        coalesce(nullif(btrim(lower(p_provider)), ''), 'desconocido'),
+        coalesce(p_reference, 'PAY-' || upper(substr(md5(random()::text), 1, 10))),
+        p_card_last4
+    )
+    returning * into v_pago;
+
+    return jsonb_build_object(
+        'reserva', to_jsonb(v_reserva),
+        'pago', to_jsonb(v_pago),
+        'owner_id', v_vehiculo.owner_id
+    );
+end;
+$$;
+
+comment on function public.crear_reserva_con_pago(uuid, uuid, date, date, text, text, text, text)
+    is 'Valida el vehiculo, crea la reserva confirmada y su pago en una transaccion; retorna {reserva, pago, owner_id} o {error}.';
+
+-- Reserva a nombre de cualquier usuario: solo la invoca el backend con la clave de servicio.
+revoke execute on function public.crear_reserva_con_pago(uuid, uuid, date, date, text, text, text, text)
+    from public, anon, authenticated;
+grant execute on function public.crear_reserva_con_pago(uuid, uuid, date, date, text, text, text, text)
+    to service_role;
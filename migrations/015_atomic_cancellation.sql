@@ -0,0 +1,58 @@
+-- 015_atomic_cancellation.sql
+-- Cancelacion y reembolso en una sola transaccion: una falla a mitad de camino ya no deja
+-- una reserva cancelada con su pago en estado "pagado".
+
+create or replace function public.cancelar_reserva_con_reembolso(
+    p_reserva_id uuid,
+    p_user_id uuid,
+    p_es_admin boolean default false
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_reserva public.reservations%rowtype;
+    v_pago public.payments%rowtype;
+begin
+    -- "for update" serializa cancelaciones concurrentes de la misma reserva.
+    select * into v_reserva from public.reservations where id = p_reserva_id for update;
+    if not found then
+        return jsonb_build_object('error', 'reserva_no_encontrada');
+    end if;
+    if not p_es_admin and v_reserva.user_id is distinct from p_user_id then
+        return jsonb_build_object('error', 'sin_permiso');
+    end if;
+    if v_reserva.status <> 'confirmada' then
+        return jsonb_build_object('error', 'estado_invalido');
+    end if;
+
+    update public.reservations
+       set status = 'cancelada'
+     where id = p_reserva_id
+    returning * into v_reserva;
+
+    update public.payments
+       set status = 'reembolsado'
+     where id = (
+        select id from public.payments
+         where reservation_id = p_reserva_id
+         order by created_at
+         limit 1
+     )
+    returning * into v_pago;
+
+    return jsonb_build_object(
+        'reserva', to_jsonb(v_reserva),
+        'pago', case when v_pago.id is null then null else to_jsonb(v_pago) end
+    );
+end;
+$$;
+
+comment on function public.cancelar_reserva_con_reembolso(uuid, uuid, boolean)
+    is 'Verifica propietario y estado, cancela la reserva y reembolsa su pago en una transaccion; retorna {reserva, pago} o {error}.';
+
+-- Recibe el usuario y si es administrador como parametros: solo la invoca el backend con la clave de servicio.
+revoke execute on function public.cancelar_reserva_con_reembolso(uuid, uuid, boolean)
+    from public, anon, authenticated;
+grant execute on function public.cancelar_reserva_con_reembolso(uuid, uuid, boolean)
+    to service_role;
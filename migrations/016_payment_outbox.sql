@@ -0,0 +1,302 @@
+-- 016_payment_outbox.sql
+-- Cobro asincrono: la reserva y un pago "pendiente" se crean en una transaccion junto con
+-- una fila en payment_outbox; los workers del backend la reclaman, llaman a la pasarela y
+-- resuelven el pago sin que la solicitud de reserva espere al proveedor. Si la reserva se
+-- cancela mientras la pasarela cobra, el mismo intento pasa a operation = 'reembolso' y el
+-- worker devuelve el dinero antes de marcar el pago como reembolsado.
+
+create table if not exists public.payment_outbox (
+    id bigint generated always as identity primary key,
+    payment_id uuid not null unique references public.payments(id) on delete cascade,
+    status text not null default 'pendiente',
+    operation text not null default 'cobro',
+    attempts integer not null default 0,
+    available_at timestamptz not null default timezone('utc', now()),
+    locked_until timestamptz,
+    last_error text,
+    created_at timestamptz not null default timezone('utc', now()),
+    constraint payment_outbox_status_check check (status in ('pendiente', 'procesando', 'completado', 'fallido')),
+    constraint payment_outbox_operation_check check (operation in ('cobro', 'reembolso'))
+);
+
+create index if not exists payment_outbox_por_reclamar_idx
+    on public.payment_outbox (available_at)
+    where status in ('pendiente', 'procesando');
+
+comment on table public.payment_outbox is 'Intentos de cobro pendientes de enviar a la pasarela de pagos.';
+comment on column public.payment_outbox.locked_until is 'Mientras status = procesando, ningun otro worker reclama el intento antes de este instante.';
+comment on column public.payment_outbox.operation is 'cobro, o reembolso de un cobro aprobado cuya reserva se cancelo durante el procesamiento.';
+comment on column public.payment_outbox.available_at is 'Momento a partir del cual el intento puede reclamarse (reintentos con espera).';
+comment on column public.payments.status is 'Estado del pago: pendiente, pagado, fallido, cancelado (sin cobrar), reembolso_pendiente o reembolsado.';
+
+create or replace function public.crear_reserva_con_intento_pago(
+    p_vehicle_id uuid,
+    p_user_id uuid,
+    p_fecha_inicio date,
+    p_fecha_fin date,
+    p_comentarios text default null,
+    p_provider text default 'tarjeta',
+    p_reference text default null,
+    p_card_last4 text default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_resultado jsonb;
+    v_pago public.payments%rowtype;
+begin
+    -- Mismas validaciones y restriccion de exclusion que crear_reserva_con_pago (migracion 014).
+    v_resultado := public.crear_reserva_con_pago(
+        p_vehicle_id, p_user_id, p_fecha_inicio, p_fecha_fin,
+        p_comentarios, p_provider, p_reference, p_card_last4
+    );
+    if v_resultado ? 'error' then
+        return v_resultado;
+    end if;
+
+    update public.payments
+       set status = 'pendiente'
+     where id = (v_resultado->'pago'->>'id')::uuid
+    returning * into v_pago;
+
+    insert into public.payment_outbox (payment_id) values (v_pago.id);
+
+    return jsonb_set(v_resultado, '{pago}', to_jsonb(v_pago));
+end;
+$$;
+
+comment on function public.crear_reserva_con_intento_pago(uuid, uuid, date, date, text, text, text, text)
+    is 'Crea la reserva confirmada, su pago pendiente y el intento de cobro en una transaccion; retorna {reserva, pago, owner_id} o {error}.';
+
+create or replace function public.reclamar_intentos_pago(
+    p_limite integer default 10,
+    p_bloqueo_segundos integer default 60
+)
+returns jsonb
+language sql
+as $$
+    -- "skip locked" reparte los intentos entre workers concurrentes sin esperas; un intento
+    -- "procesando" cuyo bloqueo vencio (worker caido) vuelve a quedar disponible.
+    with elegidos as (
+        select o.id
+          from public.payment_outbox o
+         where (o.status = 'pendiente' and o.available_at <= now())
+            or (o.status = 'procesando' and o.locked_until < now())
+         order by o.available_at
+         limit p_limite
+           for update skip locked
+    ),
+    reclamados as (
+        update public.payment_outbox o
+           set status = 'procesando',
+               attempts = o.attempts + 1,
+               locked_until = now() + make_interval(secs => p_bloqueo_segundos)
+          from elegidos
+         where o.id = elegidos.id
+        returning o.*
+    )
+    select coalesce(
+        jsonb_agg(
+            jsonb_build_object(
+                'intento_id', r.id, 'operacion', r.operation, 'intentos', r.attempts, 'pago', to_jsonb(p)
+            )
+            order by r.id
+        ),
+        '[]'::jsonb
+    )
+      from reclamados r
+      join public.payments p on p.id = r.payment_id;
+$$;
+
+comment on function public.reclamar_intentos_pago(integer, integer)
+    is 'Marca como procesando hasta p_limite intentos disponibles y los retorna con su pago.';
+
+create or replace function public.resolver_intento_pago(
+    p_intento_id bigint,
+    p_resultado text,
+    p_reference text default null,
+    p_error text default null,
+    p_reintentar_en_segundos integer default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_intento public.payment_outbox%rowtype;
+    v_pago public.payments%rowtype;
+    v_reserva public.reservations%rowtype;
+    v_reserva_id uuid;
+begin
+    select * into v_intento from public.payment_outbox where id = p_intento_id for update;
+    if not found then
+        return jsonb_build_object('error', 'intento_no_encontrado');
+    end if;
+    select * into v_pago from public.payments where id = v_intento.payment_id for update;
+    v_reserva_id := v_pago.reservation_id;
+
+    if p_resultado = 'reintentar' then
+        update public.payment_outbox
+           set status = 'pendiente',
+               available_at = now() + make_interval(secs => coalesce(p_reintentar_en_segundos, 0)),
+               locked_until = null,
+               last_error = p_error
+         where id = p_intento_id;
+        return jsonb_build_object('pago', to_jsonb(v_pago));
+    end if;
+
+    if p_resultado = 'pagado' then
+        if v_pago.status = 'cancelado' then
+            -- La reserva se cancelo mientras se cobraba: el dinero ya se tomo y el mismo
+            -- intento vuelve a la cola como reembolso.
+            update public.payments
+               set status = 'reembolso_pendiente',
+                   reference = coalesce(p_reference, reference)
+             where id = v_pago.id
+            returning * into v_pago;
+            update public.payment_outbox
+               set status = 'pendiente', operation = 'reembolso', attempts = 0,
+                   available_at = now(), locked_until = null, last_error = null
+             where id = p_intento_id;
+            return jsonb_build_object('pago', to_jsonb(v_pago));
+        end if;
+        update public.payments
+           set status = 'pagado',
+               reference = coalesce(p_reference, reference)
+         where id = v_pago.id
+        returning * into v_pago;
+        update public.payment_outbox
+           set status = 'completado', locked_until = null, last_error = null
+         where id = p_intento_id;
+        return jsonb_build_object('pago', to_jsonb(v_pago));
+    end if;
+
+    if p_resultado = 'reembolsado' then
+        update public.payments
+           set status = 'reembolsado'
+         where id = v_pago.id and status = 'reembolso_pendiente'
+        returning * into v_pago;
+        update public.payment_outbox
+           set status = 'completado', locked_until = null, last_error = null
+         where id = p_intento_id;
+        return jsonb_build_object('pago', case when v_pago.id is null then null else to_jsonb(v_pago) end);
+    end if;
+
+    if p_resultado = 'rechazado' then
+        -- Un reembolso rechazado deja el pago en reembolso_pendiente para revision manual;
+        -- solo un cobro pendiente pasa a fallido y cancela la reserva.
+        update public.payments
+           set status = 'fallido'
+         where id = v_pago.id and status = 'pendiente'
+        returning * into v_pago;
+        -- Un cobro rechazado libera las fechas de la reserva.
+        if v_pago.id is not null then
+            update public.reservations
+               set status = 'cancelada'
+             where id = v_reserva_id and status = 'confirmada'
+            returning * into v_reserva;
+        end if;
+        update public.payment_outbox
+           set status = 'fallido', locked_until = null, last_error = p_error
+         where id = p_intento_id;
+        return jsonb_build_object(
+            'pago', case when v_pago.id is null then null else to_jsonb(v_pago) end,
+            'reserva', case when v_reserva.id is null then null else to_jsonb(v_reserva) end
+        );
+    end if;
+
+    return jsonb_build_object('error', 'resultado_invalido');
+end;
+$$;
+
+comment on function public.resolver_intento_pago(bigint, text, text, text, integer)
+    is 'Aplica el resultado de la pasarela (pagado, reembolsado, rechazado o reintentar) al pago, la reserva y el intento.';
+
+-- Un pago aun pendiente se cancela en lugar de reembolsarse. Si su intento ya esta
+-- "procesando", el worker reembolsa el cobro cuando la pasarela lo aprueba. Con
+-- p_reembolso_diferido un pago ya cobrado pasa a reembolso_pendiente y su intento vuelve a
+-- la cola como reembolso; sin el se marca reembolsado como en la migracion 015. La version
+-- de tres parametros se reemplaza para que las llamadas sin el nuevo parametro no sean ambiguas.
+drop function if exists public.cancelar_reserva_con_reembolso(uuid, uuid, boolean);
+
+create or replace function public.cancelar_reserva_con_reembolso(
+    p_reserva_id uuid,
+    p_user_id uuid,
+    p_es_admin boolean default false,
+    p_reembolso_diferido boolean default false
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_reserva public.reservations%rowtype;
+    v_pago public.payments%rowtype;
+begin
+    select * into v_reserva from public.reservations where id = p_reserva_id for update;
+    if not found then
+        return jsonb_build_object('error', 'reserva_no_encontrada');
+    end if;
+    if not p_es_admin and v_reserva.user_id is distinct from p_user_id then
+        return jsonb_build_object('error', 'sin_permiso');
+    end if;
+    if v_reserva.status <> 'confirmada' then
+        return jsonb_build_object('error', 'estado_invalido');
+    end if;
+
+    update public.reservations
+       set status = 'cancelada'
+     where id = p_reserva_id
+    returning * into v_reserva;
+
+    update public.payments
+       set status = case
+               when status = 'pendiente' then 'cancelado'
+               when status = 'pagado' and p_reembolso_diferido then 'reembolso_pendiente'
+               else 'reembolsado'
+           end
+     where id = (
+        select id from public.payments
+         where reservation_id = p_reserva_id
+         order by created_at
+         limit 1
+     )
+    returning * into v_pago;
+
+    if v_pago.status = 'cancelado' then
+        update public.payment_outbox
+           set status = 'fallido', last_error = 'reserva cancelada'
+         where payment_id = v_pago.id and status = 'pendiente';
+    elsif v_pago.status = 'reembolso_pendiente' then
+        -- Se reutiliza la fila del cobro (payment_id es unico) si el pago paso por la cola.
+        insert into public.payment_outbox (payment_id, operation, status)
+        values (v_pago.id, 'reembolso', 'pendiente')
+        on conflict (payment_id) do update
+           set operation = 'reembolso', status = 'pendiente', attempts = 0,
+               available_at = now(), locked_until = null, last_error = null;
+    end if;
+
+    return jsonb_build_object(
+        'reserva', to_jsonb(v_reserva),
+        'pago', case when v_pago.id is null then null else to_jsonb(v_pago) end
+    );
+end;
+$$;
+
+comment on function public.cancelar_reserva_con_reembolso(uuid, uuid, boolean, boolean)
+    is 'Cancela la reserva y reembolsa su pago (o lo encola como reembolso con p_reembolso_diferido); retorna {reserva, pago} o {error}.';
+
+-- Los workers del backend usan la clave de servicio; ningun otro rol modifica pagos.
+alter table public.payment_outbox enable row level security;
+
+revoke execute on function public.crear_reserva_con_intento_pago(uuid, uuid, date, date, text, text, text, text)
+    from public, anon, authenticated;
+grant execute on function public.crear_reserva_con_intento_pago(uuid, uuid, date, date, text, text, text, text)
+    to service_role;
+revoke execute on function public.reclamar_intentos_pago(integer, integer) from public, anon, authenticated;
+grant execute on function public.reclamar_intentos_pago(integer, integer) to service_role;
+revoke execute on function public.resolver_intento_pago(bigint, text, text, text, integer) from public, anon, authenticated;
+grant execute on function public.resolver_intento_pago(bigint, text, text, text, integer) to service_role;
+revoke execute on function public.cancelar_reserva_con_reembolso(uuid, uuid, boolean, boolean)
+    from public, anon, authenticated;
+grant execute on function public.cancelar_reserva_con_reembolso(uuid, uuid, boolean, boolean)
+    to service_role;
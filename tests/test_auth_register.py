@@ -119,3 +119,20 @@ def test_registro_usuario_rol_invalido(monkeypatch, test_client):
         data["error"]
         == "El rol seleccionado no es valido. Roles permitidos: cliente, anfitrion, administrador."
     )
+
+
+def test_registro_traduce_violacion_de_unicidad_sin_consulta_previa():
+    from app.repositories import RegistroDuplicadoError
+    from app.services import UserService
+
+    class UserRepoStub:
+        def obtener_por_email(self, email):
+            raise AssertionError("El registro no debe consultar el correo antes de insertar.")
+
+        def crear_usuario(self, email, password_hash, nombre=None, rol="cliente"):
+            assert email == "ana@example.com"
+            raise RegistroDuplicadoError("Ya existe un usuario con este correo electronico.")
+
+    with create_app(TestConfig).app_context():
+        with pytest.raises(UsuarioExistenteError):
+            UserService(UserRepoStub()).registrar_usuario("Ana", "Ana@Example.com", "ContrasenaSegura")
@@ -0,0 +1,231 @@
+from datetime import date
+
+from app.services.availability_index import AvailabilityIndex
+
+
+class ReservationRepoStub:
+    def __init__(self, registros):
+        self.registros = registros
+        self.cargas = 0
+
+    def listar_vigentes(self, desde):
+        self.cargas += 1
+        return list(self.registros)
+
+
+def _indice(registros, **kwargs):
+    indice = AvailabilityIndex(ReservationRepoStub(registros), **kwargs)
+    indice.cargar(desde=date(2025, 1, 1))
+    return indice
+
+
+def test_indice_responde_rangos_libres_y_ocupados():
+    indice = _indice(
+        [
+            {"id": "r1", "vehicle_id": "v1", "start_date": "2025-10-10", "end_date": "2025-10-12", "status": "confirmada"},
+            {"id": "r2", "vehicle_id": "v1", "start_date": "2025-10-13", "end_date": "2025-10-15", "status": "confirmada"},
+            {"id": "r3", "vehicle_id": "v2", "start_date": "2025-11-01", "end_date": "2025-11-03", "status": "confirmada"},
+        ]
+    )
+
+    assert indice.vehiculo_libre("v1", date(2025, 10, 14), date(2025, 10, 20)) is False
+    assert indice.vehiculo_libre("v1", date(2025, 10, 16), date(2025, 10, 20)) is True
+    assert indice.vehiculo_libre("v1", date(2025, 10, 1), date(2025, 10, 9)) is True
+    assert indice.vehiculos_libres(["v1", "v2", "v3"], date(2025, 10, 11), date(2025, 11, 1)) == {"v3"}
+
+
+def test_indice_se_actualiza_al_crear_y_cancelar():
+    indice = _indice([])
+
+    indice.registrar({"id": "r1", "vehicle_id": "v1", "start_date": "2025-12-01", "end_date": "2025-12-05"})
+    assert indice.vehiculo_libre("v1", date(2025, 12, 5), date(2025, 12, 6)) is False
+    assert indice.reservas_de_vehiculo("v1", date(2025, 1, 1)) == [
+        {"id": "r1", "start_date": "2025-12-01", "end_date": "2025-12-05", "status": "confirmada"}
+    ]
+
+    indice.eliminar("r1")
+    assert indice.vehiculo_libre("v1", date(2025, 12, 5), date(2025, 12, 6)) is True
+
+
+def test_indice_no_responde_rangos_anteriores_a_la_carga():
+    indice = _indice([])
+
+    assert indice.vehiculos_libres(["v1"], date(2024, 12, 30), date(2025, 1, 2)) is None
+
+
+def test_indice_se_recarga_al_vencer_el_ttl():
+    reloj = {"ahora": 0.0}
+    repo = ReservationRepoStub([])
+    indice = AvailabilityIndex(repo, ttl_seconds=10, clock=lambda: reloj["ahora"])
+
+    indice.vehiculos_libres(["v1"], date.today(), date.today())
+    indice.vehiculos_libres(["v1"], date.today(), date.today())
+    assert repo.cargas == 1
+
+    reloj["ahora"] = 11.0
+    indice.vehiculos_libres(["v1"], date.today(), date.today())
+    assert repo.cargas == 2
+
+
+def test_recarga_no_bloquea_consultas_ni_pierde_altas():
+    import threading
+
+    leyendo = threading.Event()
+    continuar = threading.Event()
+
+    class RepoLento(ReservationRepoStub):
+        def listar_vigentes(self, desde):
+            if self.cargas:
+                leyendo.set()
+                continuar.wait(5)
+            return super().listar_vigentes(desde)
+
+    reloj = {"ahora": 0.0}
+    repo = RepoLento([{"id": "r1", "vehicle_id": "v1", "start_date": "2025-10-10", "end_date": "2025-10-12"}])
+    indice = AvailabilityIndex(repo, ttl_seconds=10, clock=lambda: reloj["ahora"])
+    indice.cargar(desde=date(2025, 1, 1))
+
+    reloj["ahora"] = 11.0
+    hilo = threading.Thread(target=indice.cargar, kwargs={"desde": date(2025, 1, 1)})
+    hilo.start()
+    leyendo.wait(5)
+    # Durante la lectura se responde con la carga anterior y se registran altas.
+    assert indice.vehiculo_libre("v1", date(2025, 10, 11), date(2025, 10, 11)) is False
+    indice.registrar({"id": "r2", "vehicle_id": "v2", "start_date": "2025-10-10", "end_date": "2025-10-12"})
+    continuar.set()
+    hilo.join(5)
+
+    assert indice.vehiculos_libres(["v1", "v2", "v3"], date(2025, 10, 11), date(2025, 10, 11)) == {"v3"}
+
+
+def test_indice_se_descarta_si_las_recargas_fallan_demasiado():
+    class RepoCaido(ReservationRepoStub):
+        caido = False
+
+        def listar_vigentes(self, desde):
+            if self.caido:
+                raise RuntimeError("Supabase no disponible.")
+            return super().listar_vigentes(desde)
+
+    reloj = {"ahora": 0.0}
+    repo = RepoCaido([])
+    indice = AvailabilityIndex(repo, ttl_seconds=10, max_stale_seconds=30, clock=lambda: reloj["ahora"])
+    assert indice.vehiculo_libre("v1", date.today(), date.today()) is True
+
+    repo.caido = True
+    reloj["ahora"] = 11.0
+    # La recarga fallo pero la carga anterior sigue dentro del limite.
+    assert indice.vehiculo_libre("v1", date.today(), date.today()) is True
+    reloj["ahora"] = 31.0
+    assert indice.vehiculo_libre("v1", date.today(), date.today()) is None
+
+
+def test_vehicle_service_filtra_con_el_indice():
+    from app.models import Vehicle
+    from app.services.vehicle_service import VehicleService
+
+    class ReservationRepoFalla:
+        def obtener_reservas_en_rango(self, vehicle_ids, fecha_inicio, fecha_fin):
+            raise AssertionError("No deberia consultar la base cuando el indice responde.")
+
+    indice = _indice(
+        [{"id": "r1", "vehicle_id": "ocupado", "start_date": "2025-10-10", "end_date": "2025-10-12"}]
+    )
+    service = VehicleService(
+        repository=object(),
+        reservation_repository=ReservationRepoFalla(),
+        availability_index=indice,
+    )
+
+    libres = service._filtrar_por_disponibilidad(
+        [Vehicle(id="libre"), Vehicle(id="ocupado")],
+        date(2025, 10, 11),
+        date(2025, 10, 11),
+    )
+
+    assert [vehiculo.id for vehiculo in libres] == ["libre"]
+
+
+def test_disponibilidad_en_lote_con_una_consulta():
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoStub:
+        def __init__(self):
+            self.consultas = []
+
+        def obtener_reservas_de_vehiculos(self, vehicle_ids, *, desde=None, hasta=None):
+            self.consultas.append((list(vehicle_ids), desde, hasta))
+            return [
+                {"id": "r1", "vehicle_id": "v1", "start_date": "2025-10-10", "end_date": "2025-10-12", "status": "confirmada"},
+                {"id": "r2", "vehicle_id": "v2", "start_date": "2025-10-01", "end_date": "2025-10-02", "status": "confirmada"},
+            ]
+
+    repo = ReservationRepoStub()
+    service = ReservationService(reservation_repository=repo, vehicle_repository=object(), payment_service=object())
+
+    reservas = service.obtener_disponibilidad_vehiculos(["v1", "v2", "v3", "v1"], incluir_historial=True)
+    libres = service.obtener_disponibilidad_vehiculos(
+        ["v1", "v2", "v3"],
+        rangos=[("2025-10-11", "2025-10-11"), ("2025-10-03", "2025-10-09")],
+    )
+
+    assert [item["vehicle_id"] for item in reservas] == ["v1", "v2", "v3"]
+    assert reservas[0]["reservations"][0]["id"] == "r1"
+    assert reservas[2]["reservations"] == []
+    assert libres == [
+        {"vehicle_id": "v1", "libre": [False, True]},
+        {"vehicle_id": "v2", "libre": [True, True]},
+        {"vehicle_id": "v3", "libre": [True, True]},
+    ]
+    # Una sola consulta por lote; con rangos se leen del inicio mas antiguo al fin mas tardio.
+    assert repo.consultas == [
+        (["v1", "v2", "v3"], None, None),
+        (["v1", "v2", "v3"], date(2025, 10, 3), date(2025, 10, 11)),
+    ]
+
+
+def test_disponibilidad_en_lote_desde_el_indice(monkeypatch):
+    from app import create_app
+    from app.api import decorators as decorators_module
+    from app.api import vehicles as vehicles_module
+    from app.config import TestConfig
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoFalla:
+        def obtener_reservas_de_vehiculos(self, vehicle_ids, *, desde=None, hasta=None):
+            raise AssertionError("No deberia consultar la base cuando el indice responde.")
+
+    class UserRepoStub:
+        def obtener_por_id(self, user_id):
+            return {"id": user_id, "email": "usuario@example.com", "rol": "cliente"}
+
+    indice = _indice(
+        [{"id": "r1", "vehicle_id": "v1", "start_date": "2099-10-10", "end_date": "2099-10-12", "status": "confirmada"}]
+    )
+    service = ReservationService(
+        reservation_repository=ReservationRepoFalla(),
+        vehicle_repository=object(),
+        payment_service=object(),
+        availability_index=indice,
+    )
+    monkeypatch.setattr(vehicles_module, "reservation_service", service)
+    monkeypatch.setattr(decorators_module, "decode_token", lambda token: {"sub": "usuario-1"})
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: UserRepoStub())
+    client = create_app(TestConfig).test_client()
+
+    response = client.post(
+        "/api/vehicles/availability:batch",
+        headers={"Authorization": "Bearer token"},
+        json={"vehicle_ids": ["v1", "v2"], "ranges": [{"start_date": "2099-10-12", "end_date": "2099-10-14"}]},
+    )
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "items": [{"vehicle_id": "v1", "libre": [False]}, {"vehicle_id": "v2", "libre": [True]}]
+    }
+
+    demasiados = client.post(
+        "/api/vehicles/availability:batch",
+        headers={"Authorization": "Bearer token"},
+        json={"vehicle_ids": [f"v{indice}" for indice in range(101)]},
+    )
+    assert demasiados.status_code == 400
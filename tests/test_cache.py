@@ -0,0 +1,122 @@
+import pytest
+
+from app import cache as cache_module
+from app import create_app
+from app.cache import TTLCache
+from app.config import TestConfig
+
+
+def test_ttl_cache_expira_y_desaloja():
+    reloj = {"ahora": 0.0}
+    cache = TTLCache(2, 10, clock=lambda: reloj["ahora"])
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    reloj["ahora"] = 11.0
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["aciertos"] == 2
+    assert stats["fallos"] == 2
+    assert stats["desalojos"] == 1
+
+
+def test_ttl_cache_deshabilitada_no_guarda():
+    cache = TTLCache(10, 0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+@pytest.fixture
+def app_con_usuario(monkeypatch):
+    from app.api import decorators as decorators_module
+    from app.api import reservations as reservations_module
+
+    llamadas = {"repo": 0}
+
+    class RepoStub:
+        def obtener_por_id(self, user_id: str):
+            llamadas["repo"] += 1
+            return {"id": user_id, "email": "usuario@example.com", "rol": "cliente"}
+
+    class ServicioStub:
+        def listar_reservas(self, user_id, limit, offset, **kwargs):
+            return {"items": [], "total": 0}
+
+    monkeypatch.setattr(decorators_module, "decode_token", lambda token: {"sub": "usuario-1"})
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: RepoStub())
+    monkeypatch.setattr(reservations_module, "reservation_service", ServicioStub())
+
+    app = create_app(TestConfig)
+    return app, llamadas
+
+
+def test_require_auth_reutiliza_el_perfil_en_cache(app_con_usuario):
+    app, llamadas = app_con_usuario
+    client = app.test_client()
+
+    for _ in range(3):
+        response = client.get("/api/reservations", headers={"Authorization": "Bearer token"})
+        assert response.status_code == 200
+
+    assert llamadas["repo"] == 1
+    with app.app_context():
+        assert cache_module.estadisticas()["usuarios"]["aciertos"] == 2
+
+
+def test_cambio_de_rol_invalida_el_perfil(app_con_usuario):
+    from app.services import invalidar_usuario_en_cache
+
+    app, llamadas = app_con_usuario
+    client = app.test_client()
+
+    client.get("/api/reservations", headers={"Authorization": "Bearer token"})
+    with app.app_context():
+        invalidar_usuario_en_cache("usuario-1")
+    client.get("/api/reservations", headers={"Authorization": "Bearer token"})
+
+    assert llamadas["repo"] == 2
+
+
+def test_endpoint_de_cambio_de_rol_invalida_el_perfil(app_con_usuario, monkeypatch):
+    from app.api import auth as auth_module
+    from app.services import UserService
+
+    class RepoUsuariosStub:
+        def actualizar_rol(self, user_id, rol):
+            return {"id": user_id, "email": "usuario@example.com", "rol": rol}
+
+    app, llamadas = app_con_usuario
+    client = app.test_client()
+    monkeypatch.setattr(auth_module, "user_service", UserService(repository=RepoUsuariosStub()))
+
+    client.get("/api/reservations", headers={"Authorization": "Bearer token"})
+    with app.app_context():
+        cache_module.obtener_cache("usuarios").set("usuario-1", {"id": "usuario-1", "rol": "administrador"})
+    response = client.patch(
+        "/api/admin/users/usuario-1/role",
+        json={"rol": "anfitrion"},
+        headers={"Authorization": "Bearer token"},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["rol"] == "anfitrion"
+    with app.app_context():
+        assert cache_module.obtener_cache("usuarios").get("usuario-1") is None
+
+
+def test_ttl_cache_invalida_por_predicado():
+    cache = TTLCache(10, 60)
+    cache.set(("a", 1), "x")
+    cache.set(("a", 2), "y")
+    cache.set(("b", 1), "z")
+
+    assert cache.invalidar_donde(lambda clave: clave[0] == "a") == 2
+    assert cache.get(("b", 1)) == "z"
+    assert cache.stats()["invalidaciones"] == 2
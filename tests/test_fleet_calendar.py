@@ -0,0 +1,140 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app import create_app
+from app.config import TestConfig
+from app.services.fleet_calendar import FleetCalendar
+
+
+class ReservationRepoStub:
+    def __init__(self, registros):
+        self.registros = registros
+
+    def listar_vigentes(self, desde):
+        return list(self.registros)
+
+
+def _calendario(registros):
+    calendario = FleetCalendar(ReservationRepoStub(registros), horizon_days=90)
+    calendario.cargar(date(2025, 10, 1))
+    return calendario
+
+
+def test_calendario_filtra_vehiculos_libres_en_bloque():
+    calendario = _calendario(
+        [
+            {"id": "r1", "vehicle_id": "v1", "start_date": "2025-10-10", "end_date": "2025-10-12", "status": "confirmada"},
+            {"id": "r2", "vehicle_id": "v2", "start_date": "2025-10-20", "end_date": "2025-10-21", "status": "confirmada"},
+        ]
+    )
+
+    libres = calendario.vehiculos_libres(["v1", "v2", "v3"], date(2025, 10, 12), date(2025, 10, 19))
+
+    assert libres == {"v2", "v3"}
+    assert calendario.vehiculos_libres(["v1"], date(2025, 9, 30), date(2025, 10, 2)) is None
+    assert calendario.vehiculos_libres(["v1"], date(2025, 12, 25), date(2026, 1, 5)) is None
+
+
+def test_calendario_mensual_y_actualizaciones():
+    calendario = _calendario(
+        [{"id": "r1", "vehicle_id": "v1", "start_date": "2025-09-28", "end_date": "2025-10-02", "status": "confirmada"}]
+    )
+
+    assert calendario.calendario_mensual("v1", 2025, 10) == "11" + "0" * 29
+
+    calendario.registrar({"id": "r2", "vehicle_id": "v9", "start_date": "2025-11-30", "end_date": "2025-12-01"})
+    assert calendario.calendario_mensual("v9", 2025, 11).endswith("01")
+
+    calendario.eliminar("r1")
+    assert calendario.calendario_mensual("v1", 2025, 10) == "0" * 31
+
+
+def test_recarga_no_bloquea_consultas_ni_pierde_altas():
+    import threading
+
+    leyendo = threading.Event()
+    continuar = threading.Event()
+
+    class RepoLento(ReservationRepoStub):
+        cargas = 0
+
+        def listar_vigentes(self, desde):
+            self.cargas += 1
+            if self.cargas > 1:
+                leyendo.set()
+                continuar.wait(5)
+            return super().listar_vigentes(desde)
+
+    repo = RepoLento([{"id": "r1", "vehicle_id": "v1", "start_date": "2025-10-10", "end_date": "2025-10-12"}])
+    calendario = FleetCalendar(repo, horizon_days=90)
+    calendario.cargar(date(2025, 10, 1))
+
+    hilo = threading.Thread(target=calendario.cargar, args=(date(2025, 10, 1),))
+    hilo.start()
+    leyendo.wait(5)
+    # Durante la lectura se responde con la matriz anterior y se registran altas.
+    assert calendario.vehiculos_libres(["v1"], date(2025, 10, 11), date(2025, 10, 11)) == set()
+    calendario.registrar({"id": "r2", "vehicle_id": "v2", "start_date": "2025-10-10", "end_date": "2025-10-12"})
+    continuar.set()
+    hilo.join(5)
+
+    assert calendario.vehiculos_libres(["v1", "v2", "v3"], date(2025, 10, 11), date(2025, 10, 11)) == {"v3"}
+
+
+def test_calendario_se_descarta_si_las_recargas_fallan_demasiado():
+    class RepoCaido(ReservationRepoStub):
+        caido = False
+
+        def listar_vigentes(self, desde):
+            if self.caido:
+                raise RuntimeError("Supabase no disponible.")
+            return super().listar_vigentes(desde)
+
+    reloj = {"ahora": 0.0}
+    repo = RepoCaido([])
+    calendario = FleetCalendar(repo, horizon_days=90, ttl_seconds=10, max_stale_seconds=30, clock=lambda: reloj["ahora"])
+    hoy = date.today()
+    assert calendario.vehiculos_libres(["v1"], hoy, hoy) == {"v1"}
+
+    repo.caido = True
+    reloj["ahora"] = 11.0
+    # La recarga fallo pero la matriz anterior sigue dentro del limite.
+    assert calendario.vehiculos_libres(["v1"], hoy, hoy) == {"v1"}
+    reloj["ahora"] = 31.0
+    assert calendario.vehiculos_libres(["v1"], hoy, hoy) is None
+
+
+def test_disponibilidad_mensual_endpoint(monkeypatch):
+    from app.api import decorators as decorators_module
+    from app.api import vehicles as vehicles_module
+
+    class RepoStub:
+        def obtener_por_id(self, user_id: str):
+            return {"id": user_id, "email": "usuario@example.com", "rol": "cliente"}
+
+    class ServicioStub:
+        def obtener_calendario_mensual(self, vehicle_id, anio, mes):
+            assert (vehicle_id, anio, mes) == ("vehiculo-1", 2025, 2)
+            return "0" * 27 + "1"
+
+    monkeypatch.setattr(decorators_module, "decode_token", lambda token: {"sub": "usuario-1"})
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: RepoStub())
+    monkeypatch.setattr(vehicles_module, "reservation_service", ServicioStub())
+
+    client = create_app(TestConfig).test_client()
+    response = client.get(
+        "/api/vehicles/vehiculo-1/availability?mes=2025-02",
+        headers={"Authorization": "Bearer token"},
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {"vehicle_id": "vehiculo-1", "mes": "2025-02", "dias": "0" * 27 + "1"}
+
+    invalido = client.get(
+        "/api/vehicles/vehiculo-1/availability?mes=2025-13",
+        headers={"Authorization": "Bearer token"},
+    )
+    assert invalido.status_code == 400
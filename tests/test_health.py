@@ -13,3 +13,25 @@ def test_health_endpoint():
     assert payload["estado"] == "operativo"
     assert "supabase" in payload
     assert "marca_de_tiempo" in payload
+
+
+
+def test_metricas_requieren_administrador(monkeypatch):
+    from app.api import decorators as decorators_module
+
+    class RepoStub:
+        def obtener_por_id(self, user_id: str):
+            return {"id": user_id, "email": f"{user_id}@example.com", "rol": user_id}
+
+    # El token es el identificador del usuario y este coincide con su rol.
+    monkeypatch.setattr(decorators_module, "decode_token", lambda token: {"sub": token})
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: RepoStub())
+    client = create_app(TestConfig).test_client()
+
+    assert client.get("/api/health/metrics").status_code == 401
+    response = client.get("/api/health/metrics", headers={"Authorization": "Bearer cliente"})
+    assert response.status_code == 403
+
+    response = client.get("/api/health/metrics", headers={"Authorization": "Bearer administrador"})
+    assert response.status_code == 200
+    assert "caches" in response.get_json()
@@ -0,0 +1,42 @@
+from datetime import date
+from decimal import Decimal
+
+from app.models import Payment, Reservation, Vehicle
+from app.models.hydration import Hidratador
+
+
+def test_columnas_desconocidas_se_ignoran_y_se_registran():
+    hidratar = Hidratador(Vehicle)
+
+    vehiculo = hidratar({"id": "veh-1", "make": "Kia", "location_key": "bogota"})
+
+    assert vehiculo == Vehicle(id="veh-1", make="Kia")
+    assert vehiculo.images == []
+    assert hidratar.columnas_ignoradas == {"location_key"}
+
+
+def test_reservas_convierten_fechas_y_estado_por_defecto():
+    hidratar = Hidratador(Reservation, si_vacio={"status": "confirmada"})
+    filas = [
+        {"id": "res-1", "vehicle_id": "veh-1", "user_id": None, "start_date": "2025-03-01",
+         "end_date": "2025-03-04", "status": None, "vehicles": {"make": "Kia"}},
+        {"id": 2, "vehicle_id": "veh-1", "user_id": "u", "start_date": date(2025, 4, 1),
+         "end_date": "2025-04-02T00:00:00+00:00", "status": "cancelada"},
+    ]
+
+    primera, segunda = hidratar.lista(filas)
+
+    assert primera.start_date == date(2025, 3, 1) and primera.end_date == date(2025, 3, 4)
+    assert primera.status == "confirmada"
+    assert segunda.id == "2"
+    assert segunda.end_date == date(2025, 4, 2)
+    assert segunda.status == "cancelada" and segunda.comentarios is None
+
+
+def test_decimales_se_convierten():
+    pago = Hidratador(Payment)(
+        {"id": "p", "reservation_id": "r", "user_id": "u", "amount": 99.9, "currency": "USD",
+         "status": "aprobado", "provider": "simulado", "reference": "ref"}
+    )
+
+    assert pago.amount == Decimal("99.9")
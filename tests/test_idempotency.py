@@ -0,0 +1,218 @@
+import threading
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.models import Payment, Reservation, Vehicle
+from app.services.idempotency import (
+    AlmacenIdempotencia,
+    AlmacenIdempotenciaMemoria,
+    ClaveReutilizadaError,
+    RespuestaGuardada,
+    SolicitudEnCursoError,
+)
+
+
+@pytest.fixture
+def test_client():
+    app = create_app(TestConfig)
+    with app.test_client() as client:
+        yield client
+
+
+def _mock_auth(monkeypatch, rol: str, user_id: str = "usuario-1"):
+    from app.api import decorators as decorators_module
+
+    class RepoStub:
+        def obtener_por_id(self, user_id: str):
+            return {"id": user_id, "email": "usuario@example.com", "rol": rol}
+
+    monkeypatch.setattr(decorators_module, "decode_token", lambda token: {"sub": user_id})
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: RepoStub())
+
+
+class ServicioReservasStub:
+    def __init__(self):
+        self.llamadas = 0
+
+    def crear_reserva(self, **kwargs):
+        self.llamadas += 1
+        return {
+            "reserva": Reservation(
+                id=f"res-{self.llamadas}",
+                vehicle_id=kwargs["vehicle_id"],
+                user_id=kwargs["usuario_id"],
+                start_date=date(2025, 12, 1),
+                end_date=date(2025, 12, 5),
+                status="confirmada",
+            ),
+            "pago": Payment(
+                id=f"pay-{self.llamadas}",
+                reservation_id=f"res-{self.llamadas}",
+                user_id=kwargs["usuario_id"],
+                amount=Decimal("480.00"),
+                currency="USD",
+                status="pagado",
+                provider="tarjeta",
+                reference="PAY-1234567890",
+            ),
+        }
+
+
+def _crear_reserva(client, clave: str, vehicle_id: str = "vehiculo-1"):
+    return client.post(
+        "/api/reservations",
+        headers={"Authorization": "Bearer token", "Idempotency-Key": clave},
+        json={"vehicle_id": vehicle_id, "start_date": "2025-12-01", "end_date": "2025-12-05"},
+    )
+
+
+def test_reintento_de_reserva_repite_la_respuesta(monkeypatch, test_client):
+    from app.api import reservations as reservations_module
+
+    _mock_auth(monkeypatch, "cliente")
+    servicio = ServicioReservasStub()
+    monkeypatch.setattr(reservations_module, "reservation_service", servicio)
+
+    primera = _crear_reserva(test_client, "clave-1")
+    segunda = _crear_reserva(test_client, "clave-1")
+    otra_clave = _crear_reserva(test_client, "clave-2")
+
+    assert servicio.llamadas == 2
+    assert primera.status_code == segunda.status_code == 201
+    assert segunda.get_data() == primera.get_data()
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in primera.headers
+    assert otra_clave.get_json()["reserva"]["id"] == "res-2"
+
+
+def test_clave_reutilizada_con_otro_cuerpo(monkeypatch, test_client):
+    from app.api import reservations as reservations_module
+
+    _mock_auth(monkeypatch, "cliente")
+    servicio = ServicioReservasStub()
+    monkeypatch.setattr(reservations_module, "reservation_service", servicio)
+
+    assert _crear_reserva(test_client, "clave-1").status_code == 201
+    respuesta = _crear_reserva(test_client, "clave-1", vehicle_id="vehiculo-2")
+
+    assert respuesta.status_code == 422
+    assert servicio.llamadas == 1
+
+
+def test_errores_del_servidor_no_se_guardan(monkeypatch, test_client):
+    from app.api import reservations as reservations_module
+
+    _mock_auth(monkeypatch, "cliente")
+    servicio = ServicioReservasStub()
+    caido = {"activo": True}
+    original = servicio.crear_reserva
+
+    def crear_reserva(**kwargs):
+        if caido["activo"]:
+            raise RuntimeError("Supabase no disponible.")
+        return original(**kwargs)
+
+    monkeypatch.setattr(servicio, "crear_reserva", crear_reserva)
+    monkeypatch.setattr(reservations_module, "reservation_service", servicio)
+
+    assert _crear_reserva(test_client, "clave-1").status_code == 503
+    caido["activo"] = False
+    assert _crear_reserva(test_client, "clave-1").status_code == 201
+    assert servicio.llamadas == 1
+
+
+def test_registro_de_vehiculo_con_clave(monkeypatch, test_client):
+    from app.api import vehicles as vehicles_module
+
+    _mock_auth(monkeypatch, "administrador", user_id="admin-1")
+
+    class ServiceStub:
+        def __init__(self):
+            self.imagenes = []
+
+        def registrar_vehiculo(self, **kwargs):
+            self.imagenes.append(kwargs["images"][0].read())
+            return Vehicle(id="veh-1", license_plate="ABC123", status="inactivo")
+
+    servicio = ServiceStub()
+    monkeypatch.setattr(vehicles_module, "vehicle_service", servicio)
+
+    def registrar():
+        return test_client.post(
+            "/api/vehicles",
+            headers={"Authorization": "Bearer token", "Idempotency-Key": "vehiculo-abc123"},
+            data={"placa": "abc123", "images": (BytesIO(b"fake"), "foto.jpg")},
+            content_type="multipart/form-data",
+        )
+
+    primera = registrar()
+    segunda = registrar()
+
+    assert primera.status_code == segunda.status_code == 201
+    assert servicio.imagenes == [b"fake"]
+    assert segunda.get_json()["id"] == "veh-1"
+
+
+def test_almacen_espera_a_la_solicitud_en_curso():
+    almacen = AlmacenIdempotenciaMemoria()
+    assert almacen.iniciar("clave", "huella", ttl=60, espera=1) is None
+
+    resultados = []
+    hilo = threading.Thread(
+        target=lambda: resultados.append(almacen.iniciar("clave", "huella", ttl=60, espera=5))
+    )
+    hilo.start()
+    guardada = RespuestaGuardada(201, b"{}", "application/json")
+    almacen.completar("clave", guardada, ttl=60)
+    hilo.join(5)
+
+    assert resultados == [guardada]
+    with pytest.raises(ClaveReutilizadaError):
+        almacen.iniciar("clave", "otra-huella", ttl=60, espera=0)
+
+
+def test_almacen_expira_y_agota_la_espera():
+    ahora = [0.0]
+    almacen = AlmacenIdempotenciaMemoria(clock=lambda: ahora[0])
+    assert almacen.iniciar("clave", "huella", ttl=60, espera=0) is None
+
+    with pytest.raises(SolicitudEnCursoError):
+        almacen.iniciar("clave", "huella", ttl=60, espera=0)
+
+    almacen.completar("clave", RespuestaGuardada(201, b"{}"), ttl=60)
+    ahora[0] = 61.0
+    assert almacen.iniciar("clave", "huella", ttl=60, espera=0) is None
+
+
+def test_almacen_lleno_no_desaloja_solicitudes_en_curso():
+    almacen = AlmacenIdempotenciaMemoria(max_entradas=2)
+    assert almacen.iniciar("en-curso", "huella", ttl=60, espera=0) is None
+    assert almacen.iniciar("completa", "huella", ttl=60, espera=0) is None
+    almacen.completar("completa", RespuestaGuardada(201, b"{}"), ttl=60)
+
+    assert almacen.iniciar("nueva", "huella", ttl=60, espera=0) is None
+    assert almacen.iniciar("otra", "huella", ttl=60, espera=0) is None
+
+    # La respuesta completa se desalojo; las claves en curso siguen reservadas.
+    assert almacen.iniciar("completa", "huella", ttl=60, espera=0) is None
+    for clave in ("en-curso", "nueva", "otra"):
+        with pytest.raises(SolicitudEnCursoError):
+            almacen.iniciar(clave, "huella", ttl=60, espera=0)
+
+
+class AlmacenIncompleto(AlmacenIdempotencia):
+    def iniciar(self, clave, huella, *, ttl, espera):
+        return None
+
+
+def test_almacen_incompleto_falla_al_configurar():
+    class ConfigAlmacen(TestConfig):
+        IDEMPOTENCY_STORE = "tests.test_idempotency:AlmacenIncompleto"
+
+    with pytest.raises(TypeError):
+        create_app(ConfigAlmacen)
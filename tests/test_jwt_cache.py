@@ -0,0 +1,64 @@
+import pytest
+
+from app import create_app, security
+from app.config import TestConfig
+from app.security import JWTError, create_access_token, decode_token
+
+
+@pytest.fixture
+def app_context():
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield
+
+
+def test_token_repetido_no_se_verifica_de_nuevo(app_context, monkeypatch):
+    token = create_access_token("usuario-1", {"rol": "cliente"})
+    assert decode_token(token)["sub"] == "usuario-1"
+
+    def no_verificar(*args):
+        raise AssertionError("El token cacheado no debe volver a verificarse.")
+
+    monkeypatch.setattr(security, "_verificar", no_verificar)
+    payload = decode_token(token)
+
+    assert payload["rol"] == "cliente"
+    payload["rol"] = "administrador"
+    assert decode_token(token)["rol"] == "cliente"
+
+
+def test_token_cacheado_expira_por_su_claim(app_context, monkeypatch):
+    token = create_access_token("usuario-1")
+    exp = decode_token(token)["exp"]
+
+    monkeypatch.setattr(security.time, "time", lambda: exp)
+    with pytest.raises(JWTError, match="expirado"):
+        decode_token(token)
+
+
+def test_token_alterado_es_rechazado(app_context):
+    token = create_access_token("usuario-1")
+    decode_token(token)
+    cabecera, payload, firma = token.split(".")
+
+    with pytest.raises(JWTError):
+        decode_token(f"{cabecera}.{payload}.{firma[:-2]}xx")
+
+
+def test_cambio_de_secreto_invalida_el_material_de_firma():
+    app = create_app(TestConfig)
+    with app.app_context():
+        token = create_access_token("usuario-1")
+        app.config["JWT_SECRET"] = "otro-secreto"
+        with pytest.raises(JWTError):
+            decode_token(token)
+
+
+def test_token_cacheado_se_rechaza_tras_rotar_el_secreto():
+    app = create_app(TestConfig)
+    with app.app_context():
+        token = create_access_token("usuario-1")
+        assert decode_token(token)["sub"] == "usuario-1"
+        app.config["JWT_SECRET"] = "otro-secreto"
+        with pytest.raises(JWTError):
+            decode_token(token)
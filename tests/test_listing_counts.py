@@ -0,0 +1,65 @@
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.services.listing_counts import ConteoListado, invalidar_conteos
+
+
+def _respuesta(filas, count=None):
+    return type("Resp", (), {"data": filas, "count": count})()
+
+
+def _app(estrategia):
+    class Config(TestConfig):
+        LISTING_COUNT_STRATEGY = estrategia
+
+    return create_app(Config)
+
+
+def test_conteo_cacheado_solo_cuenta_la_primera_pagina():
+    with _app("cached").app_context():
+        primera = ConteoListado(("vehiculos", "bogota"))
+        assert primera.metodo == "exact"
+        assert primera.total(_respuesta([{}] * 20, count=95), [{}] * 20, limit=20, offset=0) == (95, "exact")
+
+        segunda = ConteoListado(("vehiculos", "bogota"))
+        assert segunda.metodo is None
+        assert segunda.total(_respuesta([{}] * 20), [{}] * 20, limit=20, offset=20) == (95, "cached")
+
+        invalidar_conteos(("vehiculos", "bogota"))
+        assert ConteoListado(("vehiculos", "bogota")).metodo == "exact"
+
+
+def test_conteo_estimado_y_pagina_incompleta():
+    with _app("planned").app_context():
+        conteo = ConteoListado(("reservas", "todas"))
+        assert conteo.metodo == "planned"
+        assert conteo.total(_respuesta([{}] * 10, count=1200), [{}] * 10, limit=10, offset=0) == (1200, "planned")
+        # Una pagina incompleta fija el total exacto aunque el planificador estime otra cosa.
+        assert conteo.total(_respuesta([{}] * 3, count=1200), [{}] * 3, limit=10, offset=40) == (43, "exact")
+
+
+@pytest.mark.parametrize("rol", ["administrador", "cliente"])
+def test_listar_reservas_informa_la_estrategia(rol):
+    from app.services import ReservationService
+
+    llamadas = []
+
+    class ReservationRepoStub:
+        def _listar(self, *args, **kwargs):
+            llamadas.append(kwargs["metodo_conteo"])
+            return _respuesta([], count=0)
+
+        listar_todas = listar_por_usuario = _listar
+
+    with _app("cached").app_context():
+        service = ReservationService(
+            reservation_repository=ReservationRepoStub(),
+            vehicle_repository=object(),
+            payment_service=object(),
+        )
+        resultado = service.listar_reservas("usuario-1", limit=20, offset=0, rol=rol)
+
+    assert llamadas == ["exact"]
+    assert resultado["total"] == 0
+    assert resultado["total_strategy"] == "exact"
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.services import ServicioSaturadoError
+from app.services.password_hasher import PasswordHasher
+
+
+def test_hasher_en_linea_genera_y_verifica():
+    hasher = PasswordHasher(workers=0, method="pbkdf2:sha256:1000")
+
+    password_hash = hasher.generar("ContrasenaSegura")
+
+    assert password_hash.startswith("pbkdf2:sha256:1000$")
+    assert hasher.verificar(password_hash, "ContrasenaSegura") is True
+    assert hasher.verificar(password_hash, "incorrecta") is False
+    assert hasher.metricas()["operaciones"] == 3
+
+
+def test_hasher_en_pool_de_procesos():
+    hasher = PasswordHasher(workers=1, method="pbkdf2:sha256:1000")
+    try:
+        password_hash = hasher.generar("ContrasenaSegura")
+        assert hasher.verificar(password_hash, "ContrasenaSegura") is True
+    finally:
+        hasher.cerrar()
+
+
+def test_hasher_rechaza_cuando_la_cola_esta_llena():
+    hasher = PasswordHasher(workers=0, max_pending=1, retry_after_seconds=3)
+    dentro = threading.Event()
+    liberar = threading.Event()
+
+    def ocupar():
+        dentro.set()
+        liberar.wait(5)
+
+    hilo = threading.Thread(target=hasher._ejecutar, args=(ocupar,))
+    hilo.start()
+    dentro.wait(5)
+    try:
+        with pytest.raises(ServicioSaturadoError) as excinfo:
+            hasher.generar("ContrasenaSegura")
+        assert excinfo.value.retry_after == 3
+        assert hasher.metricas()["en_curso"] == 1
+    finally:
+        liberar.set()
+        hilo.join()
+
+    assert hasher.metricas()["rechazos"] == 1
+
+
+def test_hasher_conserva_el_cupo_mientras_el_proceso_sigue_ocupado():
+    hasher = PasswordHasher(workers=1, max_pending=1, timeout_seconds=0.05)
+    try:
+        hasher._ejecutar(time.sleep, 0)
+        with pytest.raises(ServicioSaturadoError):
+            hasher._ejecutar(time.sleep, 0.5)
+        # El llamador dejo de esperar, pero el proceso del pool sigue calculando.
+        assert hasher.metricas()["en_curso"] == 1
+        with pytest.raises(ServicioSaturadoError):
+            hasher.generar("ContrasenaSegura")
+        assert hasher.metricas()["rechazos"] == 1
+
+        for _ in range(100):
+            if hasher.metricas()["en_curso"] == 0:
+                break
+            time.sleep(0.02)
+        assert hasher.metricas()["en_curso"] == 0
+    finally:
+        hasher.cerrar()
+
+
+def test_login_saturado_responde_503_con_retry_after(monkeypatch):
+    from app.api import auth as auth_module
+
+    class AuthServiceStub:
+        def autenticar(self, email: str, password: str):
+            raise ServicioSaturadoError("El servicio de autenticacion esta saturado.", retry_after=2)
+
+    monkeypatch.setattr(auth_module, "auth_service", AuthServiceStub())
+    client = create_app(TestConfig).test_client()
+
+    response = client.post("/api/auth/login", json={"email": "juan@example.com", "password": "x"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_hasher_detecta_parametros_desactualizados():
+    hasher = PasswordHasher(workers=0, method="pbkdf2:sha256:2000")
+
+    assert hasher.necesita_rehash(hasher.generar("ContrasenaSegura")) is False
+    assert hasher.necesita_rehash("pbkdf2:sha256:1000$sal$hash") is True
+    assert hasher.necesita_rehash("scrypt:32768:8:1$sal$hash") is True
+
+
+def test_login_actualiza_hash_con_parametros_antiguos():
+    from werkzeug.security import generate_password_hash
+
+    from app.services import AuthService
+
+    class UserRepoStub:
+        def __init__(self):
+            self.registro = {
+                "id": "u-1",
+                "email": "juan@example.com",
+                "nombre": "Juan",
+                "rol": "cliente",
+                "password_hash": generate_password_hash("ContrasenaSegura", method="pbkdf2:sha256:1000"),
+            }
+            self.actualizaciones = []
+
+        def obtener_por_email(self, email):
+            return dict(self.registro)
+
+        def actualizar_password_hash(self, user_id, anterior, nuevo):
+            assert anterior == self.registro["password_hash"]
+            self.actualizaciones.append((user_id, nuevo))
+            return True
+
+    class RefreshStub:
+        def emitir(self, user_id):
+            return "refresh"
+
+    class ConfigCosto(TestConfig):
+        PASSWORD_HASH_METHOD = "pbkdf2:sha256:2000"
+
+    repo = UserRepoStub()
+    with create_app(ConfigCosto).app_context():
+        AuthService(repo, RefreshStub()).autenticar("juan@example.com", "ContrasenaSegura")
+
+    assert len(repo.actualizaciones) == 1
+    user_id, nuevo = repo.actualizaciones[0]
+    assert user_id == "u-1"
+    assert nuevo.startswith("pbkdf2:sha256:2000$")
@@ -0,0 +1,300 @@
+import time
+from datetime import date
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.repositories import RpcNoDisponibleError
+from app.services.availability_index import AvailabilityIndex
+from app.services.payment_outbox import ProcesadorPagos
+from app.services.payment_service import PasarelaPagos, PasarelaSimulada, ResultadoCobro
+
+
+def _pago(pago_id: str, *, status: str = "pendiente", card_last4: str = "4242") -> dict:
+    return {
+        "id": pago_id,
+        "reservation_id": f"res-{pago_id}",
+        "user_id": "user-1",
+        "amount": 120.0,
+        "currency": "USD",
+        "status": status,
+        "provider": "tarjeta",
+        "reference": f"PAY-{pago_id}",
+        "card_last4": card_last4,
+    }
+
+
+class OutboxRepoStub:
+    def __init__(self, intentos):
+        self.intentos = list(intentos)
+        self.resueltos = []
+
+    def reclamar_intentos(self, limite, bloqueo_segundos):
+        lote, self.intentos = self.intentos[:limite], self.intentos[limite:]
+        return lote
+
+    def resolver_intento(self, intento_id, resultado, **kwargs):
+        self.resueltos.append((intento_id, resultado, kwargs))
+        if resultado == "rechazado":
+            return {
+                "pago": None,
+                "reserva": {"id": "res-2", "vehicle_id": "veh-1", "start_date": "2025-05-01", "end_date": "2025-05-03"},
+            }
+        return {"pago": None}
+
+
+@pytest.fixture
+def app():
+    return create_app(TestConfig)
+
+
+def test_procesador_cobra_rechaza_y_libera_las_fechas(app):
+    repo = OutboxRepoStub(
+        [
+            {"intento_id": 1, "intentos": 1, "pago": _pago("1")},
+            {"intento_id": 2, "intentos": 1, "pago": _pago("2", card_last4=PasarelaSimulada.TARJETA_RECHAZADA)},
+            {"intento_id": 3, "intentos": 1, "pago": _pago("3", status="cancelado")},
+        ]
+    )
+
+    class VigentesStub:
+        def listar_vigentes(self, desde):
+            return [{"id": "res-2", "vehicle_id": "veh-1", "start_date": "2025-05-01", "end_date": "2025-05-03"}]
+
+    indice = AvailabilityIndex(VigentesStub())
+    indice.cargar(date(2025, 1, 1))
+    app.extensions["availability_index"] = indice
+    procesador = ProcesadorPagos(app, pasarela=PasarelaSimulada(), repository=repo)
+
+    with app.app_context():
+        assert indice.vehiculo_libre("veh-1", date(2025, 5, 2), date(2025, 5, 2)) is False
+        assert procesador.procesar_lote() == 3
+        assert indice.vehiculo_libre("veh-1", date(2025, 5, 2), date(2025, 5, 2)) is True
+
+    assert repo.resueltos[0] == (1, "pagado", {"referencia": "PAY-1"})
+    assert repo.resueltos[1][:2] == (2, "rechazado")
+    assert "rechazada" in repo.resueltos[1][2]["error"]
+    assert repo.resueltos[2][:2] == (3, "rechazado")
+    assert procesador.metricas()["pagados"] == 1
+    assert procesador.metricas()["rechazados"] == 1
+
+
+def test_procesador_reintenta_fallas_transitorias(app):
+    class PasarelaCaida(PasarelaPagos):
+        def cobrar(self, pago):
+            raise TimeoutError("tiempo de espera agotado")
+
+        reembolsar = cobrar
+
+    repo = OutboxRepoStub(
+        [
+            {"intento_id": 1, "intentos": 3, "pago": _pago("1")},
+            {"intento_id": 2, "intentos": 5, "pago": _pago("2")},
+        ]
+    )
+    procesador = ProcesadorPagos(app, pasarela=PasarelaCaida(), repository=repo, max_intentos=5, espera_base_segundos=2)
+
+    with app.app_context():
+        procesador.procesar_lote()
+
+    assert repo.resueltos[0] == (1, "reintentar", {"error": "tiempo de espera agotado", "reintentar_en": 8})
+    assert repo.resueltos[1][:2] == (2, "rechazado")
+
+
+def test_procesador_reembolsa_cobros_de_reservas_canceladas(app):
+    class PasarelaRegistrada(PasarelaSimulada):
+        def __init__(self):
+            super().__init__()
+            self.reembolsos = []
+
+        def reembolsar(self, pago):
+            self.reembolsos.append(pago["id"])
+            if pago["id"] == "2":
+                return ResultadoCobro(aprobado=False, motivo="Reembolso no permitido.")
+            return super().reembolsar(pago)
+
+    repo = OutboxRepoStub(
+        [
+            {"intento_id": 1, "operacion": "reembolso", "intentos": 1, "pago": _pago("1", status="reembolso_pendiente")},
+            {"intento_id": 2, "operacion": "reembolso", "intentos": 1, "pago": _pago("2", status="reembolso_pendiente")},
+        ]
+    )
+    pasarela = PasarelaRegistrada()
+    procesador = ProcesadorPagos(app, pasarela=pasarela, repository=repo)
+
+    with app.app_context():
+        procesador.procesar_lote()
+
+    assert pasarela.reembolsos == ["1", "2"]
+    assert repo.resueltos[0] == (1, "reembolsado", {})
+    # Un reembolso rechazado no cancela nada mas: el pago queda para revision manual.
+    assert repo.resueltos[1] == (2, "rechazado", {"error": "Reembolso no permitido."})
+    assert procesador.metricas()["reembolsados"] == 1
+    assert procesador.metricas()["rechazados"] == 0
+
+
+def test_reserva_con_cobro_diferido(monkeypatch):
+    from app.services import reservation_service as reservation_module
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoStub:
+        def __init__(self):
+            self.llamadas = []
+
+        def crear_reserva_con_pago(self, **kwargs):
+            self.llamadas.append(kwargs.get("pago_diferido", False))
+            if kwargs.get("pago_diferido") and self.sin_migracion:
+                raise RpcNoDisponibleError("crear_reserva_con_intento_pago")
+            pago = _pago("9", status="pendiente" if kwargs.get("pago_diferido") else "pagado")
+            return {
+                "reserva": {"id": "res-9", "vehicle_id": "veh-1", "user_id": "user-1", "start_date": "2025-02-01",
+                            "end_date": "2025-02-03", "status": "confirmada"},
+                "pago": pago,
+                "owner_id": "owner-1",
+            }
+
+    class ProcesadorStub:
+        notificaciones = 0
+
+        def notificar(self):
+            self.notificaciones += 1
+
+    procesador = ProcesadorStub()
+    monkeypatch.setattr(reservation_module, "obtener_procesador_pagos", lambda: procesador)
+
+    repo = ReservationRepoStub()
+    repo.sin_migracion = False
+    service = ReservationService(reservation_repository=repo, vehicle_repository=object(), payment_service=object())
+    argumentos = {"usuario_id": "user-1", "vehicle_id": "veh-1", "start_date": "2025-02-01", "end_date": "2025-02-03"}
+
+    resultado = service.crear_reserva(**argumentos)
+    assert resultado["pago"].status == "pendiente"
+    assert repo.llamadas == [True]
+    assert procesador.notificaciones == 1
+
+    # Sin la migracion 016 se cobra en linea con la funcion de la migracion 014.
+    repo.sin_migracion = True
+    resultado = service.crear_reserva(**argumentos)
+    assert resultado["pago"].status == "pagado"
+    assert repo.llamadas == [True, True, False]
+    assert procesador.notificaciones == 1
+
+
+class PasarelaSinReembolso(PasarelaPagos):
+    def cobrar(self, pago):
+        return ResultadoCobro(aprobado=True)
+
+
+def test_pasarela_incompleta_falla_al_configurar():
+    class ConfigProveedor(TestConfig):
+        PAYMENT_ASYNC = True
+        PAYMENT_PROVIDER = "tests.test_payment_outbox:PasarelaSinReembolso"
+
+    with pytest.raises(TypeError):
+        create_app(ConfigProveedor)
+
+
+def test_cancelar_reserva_cobrada_reembolsa_por_la_pasarela(app, monkeypatch):
+    from app.services import reservation_service as reservation_module
+    from app.services.reservation_service import ReservationService
+
+    class BaseStub:
+        """Reservas, pagos y payment_outbox en memoria con la logica de la migracion 016."""
+
+        def __init__(self):
+            self.pago = None
+            self.reserva = None
+            self.outbox = None
+
+        def crear_reserva_con_pago(self, **kwargs):
+            assert kwargs["pago_diferido"] is True
+            self.reserva = {"id": "res-1", "vehicle_id": "veh-1", "user_id": "user-1", "start_date": "2025-02-01",
+                            "end_date": "2025-02-03", "status": "confirmada"}
+            self.pago = _pago("1")
+            self.outbox = {"operacion": "cobro", "status": "pendiente"}
+            return {"reserva": dict(self.reserva), "pago": dict(self.pago), "owner_id": "owner-1"}
+
+        def cancelar_con_reembolso(self, reserva_id, user_id, *, es_admin, reembolso_diferido=False):
+            assert reembolso_diferido is True
+            self.reserva["status"] = "cancelada"
+            assert self.pago["status"] == "pagado"
+            self.pago["status"] = "reembolso_pendiente"
+            self.outbox = {"operacion": "reembolso", "status": "pendiente"}
+            return {"reserva": dict(self.reserva), "pago": dict(self.pago)}
+
+        def reclamar_intentos(self, limite, bloqueo_segundos):
+            if self.outbox is None or self.outbox["status"] != "pendiente":
+                return []
+            self.outbox["status"] = "procesando"
+            return [{"intento_id": 1, "operacion": self.outbox["operacion"], "intentos": 1, "pago": dict(self.pago)}]
+
+        def resolver_intento(self, intento_id, resultado, **kwargs):
+            self.pago["status"] = resultado
+            self.outbox["status"] = "completado"
+            return {"pago": dict(self.pago)}
+
+    class PasarelaRegistrada(PasarelaSimulada):
+        def __init__(self):
+            super().__init__()
+            self.llamadas = []
+
+        def cobrar(self, pago):
+            self.llamadas.append(("cobrar", pago["id"]))
+            return super().cobrar(pago)
+
+        def reembolsar(self, pago):
+            self.llamadas.append(("reembolsar", pago["id"]))
+            return super().reembolsar(pago)
+
+    base = BaseStub()
+    pasarela = PasarelaRegistrada()
+    procesador = ProcesadorPagos(app, pasarela=pasarela, repository=base)
+    notificaciones = []
+    monkeypatch.setattr(procesador, "notificar", lambda: notificaciones.append(True))
+    monkeypatch.setattr(reservation_module, "obtener_procesador_pagos", lambda: procesador)
+    service = ReservationService(reservation_repository=base, vehicle_repository=object(), payment_service=object())
+
+    with app.app_context():
+        service.crear_reserva(usuario_id="user-1", vehicle_id="veh-1", start_date="2025-02-01", end_date="2025-02-03")
+        procesador.procesar_lote()
+        assert base.pago["status"] == "pagado"
+
+        resultado = service.cancelar_reserva("res-1", "user-1")
+        assert resultado["pago"].status == "reembolso_pendiente"
+        procesador.procesar_lote()
+
+    assert notificaciones == [True, True]
+    assert pasarela.llamadas == [("cobrar", "1"), ("reembolsar", "1")]
+    assert base.pago["status"] == "reembolsado"
+
+
+def test_pasarela_simulada():
+    pasarela = PasarelaSimulada()
+    assert pasarela.cobrar(_pago("1")) == ResultadoCobro(aprobado=True, referencia="PAY-1")
+    assert pasarela.cobrar(_pago("2", card_last4="0002")).aprobado is False
+
+
+def test_procesador_arranca_con_la_aplicacion(monkeypatch):
+    from app.services import payment_outbox as outbox_module
+
+    # Intento que quedo de un despliegue anterior: se cobra sin reservas nuevas ni notificaciones.
+    repo = OutboxRepoStub([{"intento_id": 1, "intentos": 1, "pago": _pago("1")}])
+    monkeypatch.setattr(outbox_module, "PaymentRepository", lambda: repo)
+
+    class AsyncConfig(TestConfig):
+        PAYMENT_ASYNC = True
+        PAYMENT_OUTBOX_WORKERS = 1
+        PAYMENT_OUTBOX_POLL_SECONDS = 60
+
+    app = create_app(AsyncConfig)
+    procesador = app.extensions["payment_outbox"]
+    try:
+        for _ in range(100):
+            if repo.resueltos:
+                break
+            time.sleep(0.02)
+        assert repo.resueltos == [(1, "pagado", {"referencia": "PAY-1"})]
+        assert procesador.metricas()["activos"] == 1
+    finally:
+        procesador.cerrar()
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.services import RefreshTokenInvalidoError, RefreshTokenService
+
+
+class RefreshRepoStub:
+    def __init__(self):
+        self.tokens = {}
+
+    def crear(self, *, user_id, family_id, token_hash, expires_at):
+        registro = {
+            "id": f"rt-{len(self.tokens) + 1}",
+            "user_id": user_id,
+            "family_id": family_id,
+            "token_hash": token_hash,
+            "expires_at": expires_at.isoformat(),
+            "revoked_at": None,
+        }
+        self.tokens[registro["id"]] = registro
+        return registro
+
+    def obtener_por_hash(self, token_hash):
+        for registro in self.tokens.values():
+            if registro["token_hash"] == token_hash:
+                usuario = {"id": registro["user_id"], "email": "juan@example.com", "rol": "cliente"}
+                return {**registro, "users": usuario}
+        return None
+
+    def revocar(self, token_id, *, replaced_by=None):
+        registro = self.tokens[token_id]
+        if registro["revoked_at"]:
+            return False
+        registro["revoked_at"] = "ahora"
+        registro["replaced_by"] = replaced_by
+        return True
+
+    def revocar_familia(self, family_id):
+        for registro in self.tokens.values():
+            if registro["family_id"] == family_id and not registro["revoked_at"]:
+                registro["revoked_at"] = "ahora"
+
+
+@pytest.fixture
+def app_context():
+    app = create_app(TestConfig)
+    with app.app_context():
+        yield
+
+
+def test_rotacion_emite_un_token_nuevo_en_la_misma_familia(app_context):
+    repo = RefreshRepoStub()
+    service = RefreshTokenService(repo)
+
+    primero = service.emitir("usuario-1")
+    usuario, segundo = service.rotar(primero)
+
+    assert usuario["id"] == "usuario-1"
+    assert segundo != primero
+    familias = {registro["family_id"] for registro in repo.tokens.values()}
+    assert len(familias) == 1
+    assert all(primero not in registro["token_hash"] for registro in repo.tokens.values())
+
+
+def test_reutilizar_un_token_rotado_revoca_la_familia(app_context):
+    repo = RefreshRepoStub()
+    service = RefreshTokenService(repo)
+
+    primero = service.emitir("usuario-1")
+    _, segundo = service.rotar(primero)
+
+    with pytest.raises(RefreshTokenInvalidoError):
+        service.rotar(primero)
+    with pytest.raises(RefreshTokenInvalidoError):
+        service.rotar(segundo)
+
+
+def test_token_expirado_es_rechazado(app_context):
+    repo = RefreshRepoStub()
+    service = RefreshTokenService(repo)
+    token = service.emitir("usuario-1")
+    for registro in repo.tokens.values():
+        registro["expires_at"] = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+
+    with pytest.raises(RefreshTokenInvalidoError):
+        service.rotar(token)
+
+
+def test_refresh_endpoint(monkeypatch):
+    from app.api import auth as auth_module
+
+    class AuthServiceStub:
+        def renovar(self, refresh_token):
+            if refresh_token != "valido":
+                raise RefreshTokenInvalidoError("El token de renovacion es invalido.")
+            return {"access_token": "nuevo-acceso", "refresh_token": "nuevo-refresh"}
+
+    monkeypatch.setattr(auth_module, "auth_service", AuthServiceStub())
+    client = create_app(TestConfig).test_client()
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": "valido"})
+    assert response.status_code == 200
+    assert response.get_json() == {"access_token": "nuevo-acceso", "refresh_token": "nuevo-refresh"}
+
+    rechazado = client.post("/api/auth/refresh", json={"refresh_token": "otro"})
+    assert rechazado.status_code == 401
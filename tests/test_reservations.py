@@ -5,6 +5,7 @@ import pytest
 from app import create_app
 from app.config import TestConfig
 from app.models import Payment, Reservation
+from app.repositories import RpcNoDisponibleError
 
 
 @pytest.fixture
@@ -127,6 +128,44 @@ def test_crear_reserva_exitoso(monkeypatch, test_client, mock_auth):
     assert data["pago"]["card_last4"] == "4242"
 
 
+def test_crear_reserva_con_cobro_pendiente(monkeypatch, test_client, mock_auth):
+    from app.api import reservations as reservations_module
+
+    pago = Payment(
+        id="pay-1", reservation_id="res-1", user_id="usuario-1", amount=Decimal("480.00"), currency="USD",
+        status="pendiente", provider="tarjeta", reference="PAY-1234567890",
+    )
+
+    class ServicioStub:
+        def crear_reserva(self, **kwargs):
+            reserva = Reservation(
+                id="res-1", vehicle_id="vehiculo-1", user_id="usuario-1",
+                start_date=date(2025, 12, 1), end_date=date(2025, 12, 5), status="confirmada",
+            )
+            return {"reserva": reserva, "pago": pago}
+
+        def obtener_pago(self, reserva_id, usuario_id, *, is_admin=False):
+            assert (reserva_id, usuario_id, is_admin) == ("res-1", "usuario-1", False)
+            return pago
+
+    monkeypatch.setattr(reservations_module, "reservation_service", ServicioStub())
+
+    response = test_client.post(
+        "/api/reservations",
+        headers={"Authorization": "Bearer token"},
+        json={"vehicle_id": "vehiculo-1", "start_date": "2025-12-01", "end_date": "2025-12-05"},
+    )
+
+    assert response.status_code == 202
+    assert response.get_json()["pago"]["status"] == "pendiente"
+    assert response.headers["Location"].endswith("/api/reservations/res-1/payment")
+
+    estado = test_client.get("/api/reservations/res-1/payment", headers={"Authorization": "Bearer token"})
+    assert estado.status_code == 200
+    datos = estado.get_json()["pago"]
+    assert (datos["status"], datos["amount"]) == ("pendiente", "480.00")
+
+
 def test_crear_reserva_conflicto(monkeypatch, test_client, mock_auth):
     from app.api import reservations as reservations_module
 
@@ -158,15 +197,27 @@ def test_cancelar_reserva_exitoso(monkeypatch, test_client, mock_auth):
             assert reserva_id == "res-1"
             assert user_id == "usuario-1"
             assert is_admin is False
-            return Reservation(
-                id=reserva_id,
-                vehicle_id="vehiculo-1",
-                user_id=user_id,
-                start_date=date(2025, 10, 10),
-                end_date=date(2025, 10, 12),
-                status="cancelada",
-                created_at="2025-01-01T00:00:00Z",
-            )
+            return {
+                "reserva": Reservation(
+                    id=reserva_id,
+                    vehicle_id="vehiculo-1",
+                    user_id=user_id,
+                    start_date=date(2025, 10, 10),
+                    end_date=date(2025, 10, 12),
+                    status="cancelada",
+                    created_at="2025-01-01T00:00:00Z",
+                ),
+                "pago": Payment(
+                    id="pay-1",
+                    reservation_id=reserva_id,
+                    user_id=user_id,
+                    amount=Decimal("360.00"),
+                    currency="USD",
+                    status="reembolsado",
+                    provider="tarjeta",
+                    reference="PAY-1",
+                ),
+            }
 
     monkeypatch.setattr(reservations_module, "reservation_service", ServicioStub())
 
@@ -178,6 +229,8 @@ def test_cancelar_reserva_exitoso(monkeypatch, test_client, mock_auth):
     assert response.status_code == 200
     data = response.get_json()
     assert data["status"] == "cancelada"
+    assert data["pago"]["status"] == "reembolsado"
+    assert data["pago"]["amount"] == "360.00"
 
 
 def test_cancelar_reserva_error(monkeypatch, test_client, mock_auth):
@@ -205,6 +258,9 @@ def test_reservation_service_rechaza_vehiculo_inactivo():
         def obtener_reservas_en_rango(self, vehicle_ids, fecha_inicio, fecha_fin):
             return type("Resp", (), {"data": []})()
 
+        def crear_reserva_con_pago(self, **kwargs):
+            raise RpcNoDisponibleError("crear_reserva_con_pago")
+
         def crear_reserva(self, payload):
             raise AssertionError("No deberia registrar reserva cuando el vehiculo esta inactivo.")
 
@@ -246,6 +302,9 @@ def test_reservation_service_ignora_reservas_canceladas(monkeypatch):
         def __init__(self):
             self.inserted = None
 
+        def crear_reserva_con_pago(self, **kwargs):
+            raise RpcNoDisponibleError("crear_reserva_con_pago")
+
         def obtener_reservas_en_rango(self, vehicle_ids, fecha_inicio, fecha_fin):
             return type("Resp", (), {"data": [{"vehicle_id": vehicle_ids[0], "status": "cancelada"}]})()
 
@@ -319,3 +378,129 @@ def test_reservations_supabase_no_configurada(monkeypatch, test_client):
 
 
 
+
+
+def test_reservation_service_reserva_en_una_llamada():
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoStub:
+        def __init__(self):
+            self.params = None
+
+        def crear_reserva_con_pago(self, **kwargs):
+            self.params = kwargs
+            return {
+                "reserva": {"id": "res-9", "vehicle_id": "veh-1", "user_id": "user-1", "start_date": "2025-02-01",
+                            "end_date": "2025-02-03", "status": "confirmada", "comentarios": None},
+                "pago": {"id": "pay-9", "reservation_id": "res-9", "user_id": "user-1", "amount": 300.0,
+                         "currency": "USD", "status": "pagado", "provider": "tarjeta",
+                         "reference": kwargs["reference"], "card_last4": "4242"},
+                "owner_id": "owner-1",
+            }
+
+        def obtener_reservas_en_rango(self, *args):
+            raise AssertionError("La funcion atomica reemplaza la consulta de conflictos.")
+
+    class SinLlamadas:
+        def __getattr__(self, nombre):
+            raise AssertionError(f"No deberia llamar a {nombre}.")
+
+    repo_stub = ReservationRepoStub()
+    service = ReservationService(
+        reservation_repository=repo_stub,
+        vehicle_repository=SinLlamadas(),
+        payment_service=SinLlamadas(),
+    )
+
+    resultado = service.crear_reserva(
+        usuario_id="user-1", vehicle_id="veh-1", start_date="2025-02-01", end_date="2025-02-03", card_last4="4242"
+    )
+
+    assert repo_stub.params["fecha_inicio"] == date(2025, 2, 1)
+    assert repo_stub.params["reference"].startswith("PAY-")
+    assert resultado["reserva"].id == "res-9"
+    assert resultado["pago"].amount == Decimal("300.0")
+
+
+@pytest.mark.parametrize(
+    "error, mensaje",
+    [("vehiculo_no_disponible", "disponible"), ("vehiculo_no_encontrado", "encontro")],
+)
+def test_reservation_service_errores_de_la_funcion_atomica(error, mensaje):
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoStub:
+        def crear_reserva_con_pago(self, **kwargs):
+            return {"error": error}
+
+    service = ReservationService(
+        reservation_repository=ReservationRepoStub(), vehicle_repository=object(), payment_service=object()
+    )
+
+    with pytest.raises(ValueError, match=mensaje):
+        service.crear_reserva(usuario_id="user-1", vehicle_id="veh-1", start_date="2025-02-01", end_date="2025-02-03")
+
+
+def test_reservation_repository_traduce_solapamiento():
+    from app.repositories import ReservaSolapadaError
+    from app.repositories.reservation_repository import ReservationRepository
+
+    class ExclusionError(Exception):
+        code = "23P01"
+
+    def rpc(funcion, params):
+        raise ExclusionError("conflicting key value violates exclusion constraint")
+
+    repo = ReservationRepository()
+    repo.rpc = rpc
+
+    with pytest.raises(ReservaSolapadaError, match="reservado"):
+        repo.crear_reserva_con_pago(
+            vehicle_id="veh-1", user_id="user-1", fecha_inicio=date(2025, 2, 1), fecha_fin=date(2025, 2, 3),
+            comentarios=None, provider="tarjeta", reference="PAY-1", card_last4=None,
+        )
+
+
+def test_reservation_service_cancela_y_reembolsa_en_una_llamada():
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoStub:
+        def cancelar_con_reembolso(self, reserva_id, user_id, *, es_admin):
+            assert (reserva_id, user_id, es_admin) == ("res-1", "user-1", False)
+            return {
+                "reserva": {"id": "res-1", "vehicle_id": "veh-1", "user_id": "user-1", "start_date": "2025-03-01",
+                            "end_date": "2025-03-02", "status": "cancelada"},
+                "pago": {"id": "pay-1", "reservation_id": "res-1", "user_id": "user-1", "amount": 90,
+                         "currency": "USD", "status": "reembolsado", "provider": "tarjeta", "reference": "PAY-1"},
+            }
+
+        def table(self):
+            raise AssertionError("La cancelacion atomica no consulta la tabla.")
+
+    class PaymentStub:
+        def marcar_reembolso(self, reserva_id):
+            raise AssertionError("El reembolso ocurre en la misma transaccion.")
+
+    service = ReservationService(
+        reservation_repository=ReservationRepoStub(), vehicle_repository=object(), payment_service=PaymentStub()
+    )
+
+    resultado = service.cancelar_reserva("res-1", "user-1")
+
+    assert resultado["reserva"].status == "cancelada"
+    assert resultado["pago"].status == "reembolsado"
+
+
+def test_reservation_service_cancelacion_atomica_sin_permiso():
+    from app.services.reservation_service import ReservationService
+
+    class ReservationRepoStub:
+        def cancelar_con_reembolso(self, reserva_id, user_id, *, es_admin):
+            return {"error": "sin_permiso"}
+
+    service = ReservationService(
+        reservation_repository=ReservationRepoStub(), vehicle_repository=object(), payment_service=object()
+    )
+
+    with pytest.raises(ValueError, match="permiso"):
+        service.cancelar_reserva("res-1", "otro-usuario")
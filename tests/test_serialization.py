@@ -0,0 +1,92 @@
+import json
+from dataclasses import asdict
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from app import create_app, serialization
+from app.config import TestConfig
+from app.models import Payment, Reservation, Vehicle
+from app.serialization import serializar, serializar_lista
+
+
+def _vehiculo(**extra):
+    datos = {
+        "id": "veh-1",
+        "make": "Renault",
+        "model": "Duster",
+        "year": 2022,
+        "price_per_day": 45.5,
+        "location": "Medellín",
+        "images": [{"path": "a.jpg", "url": "https://img/a.jpg"}],
+    }
+    datos.update(extra)
+    return Vehicle(**datos)
+
+
+def _reserva():
+    return Reservation(
+        id="res-1",
+        vehicle_id="veh-1",
+        user_id="user-1",
+        start_date=date(2024, 5, 1),
+        end_date=date(2024, 5, 3),
+        status="pendiente",
+    )
+
+
+def _pago():
+    return Payment(
+        id="pay-1",
+        reservation_id="res-1",
+        user_id="user-1",
+        amount=Decimal("91.00"),
+        currency="USD",
+        status="aprobado",
+        provider="simulado",
+        reference="ref-1",
+    )
+
+
+def _json_por_defecto(payload):
+    app = Flask(__name__)
+    with app.app_context():
+        return json.loads(jsonify(payload).get_data())
+
+
+@pytest.mark.parametrize("modelo", [_vehiculo, _reserva, _pago])
+def test_mismo_json_que_asdict(modelo):
+    obj = modelo()
+    app = create_app(TestConfig)
+
+    with app.app_context():
+        rapido = json.loads(jsonify(serializar(obj)).get_data())
+
+    assert rapido == _json_por_defecto(asdict(obj))
+
+
+def test_fechas_y_decimales_se_convierten_como_flask():
+    assert serializar(_reserva())["start_date"] == "Wed, 01 May 2024 00:00:00 GMT"
+    assert serializar(_pago())["amount"] == "91.00"
+
+
+def test_proyeccion_respeta_el_orden_y_rechaza_campos_desconocidos():
+    datos = serializar_lista([_vehiculo(), _vehiculo(id="veh-2")], ("id", "price_per_day", "make", "id"))
+
+    assert datos == [
+        {"id": "veh-1", "price_per_day": 45.5, "make": "Renault"},
+        {"id": "veh-2", "price_per_day": 45.5, "make": "Renault"},
+    ]
+    with pytest.raises(ValueError):
+        serializar(_vehiculo(), ("id", "password"))
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="orjson no esta instalado")
+def test_backend_rapido_se_puede_desactivar():
+    class SinBackendRapido(TestConfig):
+        JSON_FAST_BACKEND = False
+
+    assert isinstance(create_app(TestConfig).json, serialization.OrjsonProvider)
+    assert not isinstance(create_app(SinBackendRapido).json, serialization.OrjsonProvider)
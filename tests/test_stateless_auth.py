@@ -0,0 +1,147 @@
+import pytest
+
+from app import create_app
+from app.config import TestConfig
+from app.security import create_access_token
+from app.services.token_revocation import EXTENSION_KEY, TokenRevocationList
+
+
+class StatelessConfig(TestConfig):
+    JWT_STATELESS_AUTH = True
+
+
+class RevocationRepoStub:
+    def __init__(self, registros=None, falla=False):
+        self.registros = list(registros or [])
+        self.falla = falla
+
+    def listar_vigentes(self):
+        if self.falla:
+            raise RuntimeError("Cliente de Supabase no inicializado.")
+        return list(self.registros)
+
+    def registrar(self, **kwargs):
+        self.registros.append(kwargs)
+
+
+@pytest.fixture
+def stateless_app(monkeypatch):
+    from app.api import decorators as decorators_module
+    from app.api import reservations as reservations_module
+
+    class RepoFalla:
+        def obtener_por_id(self, user_id: str):
+            raise AssertionError("No deberia consultar la base en modo sin estado.")
+
+    class ServicioStub:
+        def listar_reservas(self, user_id, limit, offset, rol=None):
+            assert rol == "cliente"
+            return {"items": [], "total": 0}
+
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: RepoFalla())
+    monkeypatch.setattr(reservations_module, "reservation_service", ServicioStub())
+    return create_app(StatelessConfig)
+
+
+def _token(app, **claims):
+    with app.app_context():
+        return create_access_token("usuario-1", {"email": "usuario@example.com", "rol": "cliente", **claims})
+
+
+def test_autoriza_con_los_claims_sin_consultar_la_base(stateless_app):
+    stateless_app.extensions[EXTENSION_KEY] = TokenRevocationList(RevocationRepoStub())
+    token = _token(stateless_app)
+
+    response = stateless_app.test_client().get(
+        "/api/reservations", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+
+
+def test_rechaza_tokens_revocados(stateless_app):
+    revocaciones = TokenRevocationList(RevocationRepoStub())
+    stateless_app.extensions[EXTENSION_KEY] = revocaciones
+    token = _token(stateless_app)
+    client = stateless_app.test_client()
+
+    revocaciones.revocar_usuario("usuario-1")
+    response = client.get("/api/reservations", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+    assert "revocado" in response.get_json()["error"].lower()
+
+
+def test_consulta_la_base_si_la_lista_no_esta_disponible(stateless_app, monkeypatch):
+    from app.api import decorators as decorators_module
+
+    class RepoStub:
+        def obtener_por_id(self, user_id: str):
+            return {"id": user_id, "email": "usuario@example.com", "rol": "cliente"}
+
+    monkeypatch.setattr(decorators_module, "UserRepository", lambda: RepoStub())
+    stateless_app.extensions[EXTENSION_KEY] = TokenRevocationList(RevocationRepoStub(falla=True))
+    token = _token(stateless_app)
+
+    response = stateless_app.test_client().get(
+        "/api/reservations", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+
+
+def test_lista_revoca_por_jti_tras_refrescar():
+    repo = RevocationRepoStub(
+        [{"jti": "abc", "user_id": None, "not_before": None, "expires_at": "2999-01-01T00:00:00+00:00"}]
+    )
+    revocaciones = TokenRevocationList(repo)
+
+    assert revocaciones.esta_revocado({"sub": "u1", "jti": "abc", "iat": 1}) is True
+    assert revocaciones.esta_revocado({"sub": "u1", "jti": "otro", "iat": 1}) is False
+
+
+def test_revocar_usuario_respeta_tokens_emitidos_despues(monkeypatch):
+    from app.services import token_revocation as revocation_module
+
+    revocaciones = TokenRevocationList(RevocationRepoStub())
+    revocaciones.refrescar()
+    marca = revocation_module.datetime(2025, 5, 1, 10, 0, 0, 700000, tzinfo=revocation_module.timezone.utc)
+
+    class RelojFijo(revocation_module.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return marca
+
+    monkeypatch.setattr(revocation_module, "datetime", RelojFijo)
+    revocaciones.revocar_usuario("u1")
+
+    # Mismo segundo que la revocacion: antes se revoca, despues no.
+    assert revocaciones.esta_revocado({"sub": "u1", "iat": marca.timestamp() - 0.4}) is True
+    assert revocaciones.esta_revocado({"sub": "u1", "iat": marca.timestamp() + 0.2}) is False
+
+
+def test_logout_revoca_el_token_de_acceso(stateless_app, monkeypatch):
+    from app.api import auth as auth_module
+
+    class RefreshStub:
+        def revocar(self, token):
+            self.revocado = token
+
+    repo = RevocationRepoStub()
+    revocaciones = TokenRevocationList(repo)
+    stateless_app.extensions[EXTENSION_KEY] = revocaciones
+    refresh = RefreshStub()
+    monkeypatch.setattr(auth_module.auth_service, "_refresh_tokens", refresh)
+    token = _token(stateless_app)
+    client = stateless_app.test_client()
+    cabeceras = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/reservations", headers=cabeceras).status_code == 200
+    salida = client.post("/api/auth/logout", headers=cabeceras, json={"refresh_token": "refresh-1"})
+
+    assert salida.status_code == 204
+    assert refresh.revocado == "refresh-1"
+    assert repo.registros[0]["user_id"] == "usuario-1"
+    response = client.get("/api/reservations", headers=cabeceras)
+    assert response.status_code == 401
+    assert "revocado" in response.get_json()["error"].lower()
@@ -119,6 +119,42 @@ def test_vehicle_service_registrar_exitoso(app_context, monkeypatch):
     assert repo_stub.updated[0] == "veh-123"
 
 
+def test_vehicle_service_invalida_busquedas_tras_guardar_imagenes(app_context, monkeypatch):
+    from app.services import vehicle_service as vehicle_module
+
+    eventos: list[str] = []
+
+    class RepoStub:
+        def crear_vehiculo(self, payload):
+            eventos.append("crear")
+            return {**payload, "id": "veh-123"}
+
+        def actualizar_vehiculo(self, vehicle_id, payload):
+            eventos.append("actualizar")
+            return {"id": vehicle_id, "license_plate": "ABC123", "status": "inactivo", **payload}
+
+    monkeypatch.setattr(vehicle_module, "invalidar_busquedas", lambda *args: eventos.append("busquedas"))
+    monkeypatch.setattr(vehicle_module, "invalidar_catalogo_ciudades", lambda: eventos.append("ciudades"))
+    monkeypatch.setattr(
+        VehicleService,
+        "_subir_imagenes",
+        lambda self, **kwargs: [{"url": "https://cdn.example/01.jpg", "path": "vehicles/veh-123/01.jpg"}],
+    )
+
+    VehicleService(repository=RepoStub()).registrar_vehiculo(
+        license_plate="abc123",
+        make="Toyota",
+        model="RAV4",
+        year="2022",
+        vehicle_type="SUV",
+        price_per_day="120",
+        location="Bogota",
+        images=[_archivo_imagen(b"fake-image-data")],
+    )
+
+    assert eventos == ["crear", "actualizar", "busquedas", "ciudades"]
+
+
 def test_vehicle_service_respeta_anio_minimo(app_context):
     current_app.config["VEHICLE_MIN_YEAR"] = 2020
     service = VehicleService(repository=RepoNoOp())
@@ -5,6 +5,7 @@ import pytest
 from app import create_app
 from app.config import TestConfig
 from app.models import Vehicle
+from app.repositories import RpcNoDisponibleError
 
 
 @pytest.fixture
@@ -99,6 +100,9 @@ def test_vehicle_service_filtra_disponibilidad_con_paginacion():
         def __init__(self):
             self.last_call = {}
 
+        def buscar_disponibles(self, **kwargs):
+            raise RpcNoDisponibleError("buscar_vehiculos_disponibles")
+
         def search(self, **kwargs):
             self.last_call = kwargs
             assert kwargs.get("status") == "activo"
@@ -158,3 +162,380 @@ def test_vehicle_service_filtra_disponibilidad_con_paginacion():
     assert resultado["total"] == 1
     assert len(resultado["items"]) == 1
     assert resultado["items"][0].id == "vehiculo-libre"
+
+
+def test_vehicle_service_busca_disponibles_en_una_consulta():
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.llamada = None
+
+        def buscar_disponibles(self, **kwargs):
+            self.llamada = kwargs
+            return {
+                "items": [
+                    {
+                        "id": "vehiculo-libre",
+                        "make": "Toyota",
+                        "model": "RAV4",
+                        "vehicle_type": "suv",
+                        "price_per_day": 120.0,
+                        "status": "activo",
+                    }
+                ],
+                "total": 7,
+            }
+
+        def search(self, **kwargs):
+            raise AssertionError("No deberia traer todo el catalogo cuando la funcion remota existe.")
+
+    class ReservationRepoStub:
+        def obtener_reservas_en_rango(self, vehicle_ids, fecha_inicio, fecha_fin):
+            raise AssertionError("No deberia consultar reservas por separado.")
+
+    repo_stub = VehicleRepoStub()
+    service = VehicleService(repository=repo_stub, reservation_repository=ReservationRepoStub())
+
+    resultado = service.buscar_vehiculos(
+        ciudad="Bogota",
+        fecha_inicio=date(2025, 10, 10),
+        fecha_fin=date(2025, 10, 12),
+        limit=1,
+        offset=3,
+    )
+
+    assert repo_stub.llamada["limit"] == 1
+    assert repo_stub.llamada["offset"] == 3
+    assert repo_stub.llamada["ciudad"] == "Bogota"
+    assert resultado["total"] == 7
+    assert [vehiculo.id for vehiculo in resultado["items"]] == ["vehiculo-libre"]
+
+
+def test_vehicle_service_usa_respaldo_si_no_existe_la_funcion():
+    from app.repositories import RpcNoDisponibleError
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def buscar_disponibles(self, **kwargs):
+            raise RpcNoDisponibleError("La funcion buscar_vehiculos_disponibles no esta disponible.")
+
+        def search(self, **kwargs):
+            assert kwargs["limit"] is None
+            return type("Resp", (), {"data": [{"id": "vehiculo-1", "status": "activo"}]})()
+
+    class ReservationRepoStub:
+        def obtener_reservas_en_rango(self, vehicle_ids, fecha_inicio, fecha_fin):
+            return type("Resp", (), {"data": []})()
+
+    service = VehicleService(repository=VehicleRepoStub(), reservation_repository=ReservationRepoStub())
+
+    resultado = service.buscar_vehiculos(
+        fecha_inicio=date(2025, 10, 10),
+        fecha_fin=date(2025, 10, 12),
+    )
+
+    assert resultado["total"] == 1
+    assert resultado["items"][0].id == "vehiculo-1"
+
+
+def test_vehicle_service_pagina_por_cursor():
+    from app.pagination import codificar_cursor
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.llamada = None
+
+        def search(self, **kwargs):
+            self.llamada = kwargs
+            data = [
+                {"id": "vehiculo-3", "price_per_day": 120.0, "status": "activo"},
+                {"id": "vehiculo-4", "price_per_day": 130.0, "status": "activo"},
+            ]
+            return type("Resp", (), {"data": data, "count": None})()
+
+    repo_stub = VehicleRepoStub()
+    service = VehicleService(repository=repo_stub, reservation_repository=object())
+
+    resultado = service.buscar_vehiculos(limit=2, offset=40, cursor=codificar_cursor(120.0, "vehiculo-2"))
+
+    assert repo_stub.llamada["despues_de"] == (120.0, "vehiculo-2")
+    assert repo_stub.llamada["offset"] == 0
+    assert repo_stub.llamada["include_count"] is False
+    assert resultado["total"] is None
+    assert resultado["next_cursor"] == codificar_cursor(130.0, "vehiculo-4")
+
+
+def test_list_vehicles_cursor_invalido(test_client):
+    response = test_client.get("/api/vehicles?cursor=no-es-un-cursor")
+    assert response.status_code == 400
+    assert "cursor" in response.get_json()["error"].lower()
+
+
+def test_busquedas_cacheadas_se_invalidan_por_rango():
+    from app.services import invalidar_busquedas
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.llamadas = 0
+
+        def buscar_disponibles(self, **kwargs):
+            self.llamadas += 1
+            return {"items": [{"id": "vehiculo-1", "price_per_day": 80.0, "status": "activo"}], "total": 1}
+
+        def search(self, **kwargs):
+            self.llamadas += 1
+            return type("Resp", (), {"data": [{"id": "vehiculo-2", "status": "activo"}], "count": 1})()
+
+    repo_stub = VehicleRepoStub()
+    service = VehicleService(repository=repo_stub, reservation_repository=object())
+    por_fechas = {"fecha_inicio": date(2025, 10, 10), "fecha_fin": date(2025, 10, 12)}
+
+    with create_app(TestConfig).app_context():
+        service.buscar_vehiculos(ciudad="Bogota", **por_fechas)
+        service.buscar_vehiculos(ciudad="bogota", **por_fechas)
+        service.buscar_vehiculos(ciudad="Bogota")
+        assert repo_stub.llamadas == 2
+
+        invalidar_busquedas(date(2025, 10, 20), date(2025, 10, 22))
+        service.buscar_vehiculos(ciudad="Bogota", **por_fechas)
+        assert repo_stub.llamadas == 2
+
+        invalidar_busquedas(date(2025, 10, 12), date(2025, 10, 14))
+        service.buscar_vehiculos(ciudad="Bogota", **por_fechas)
+        service.buscar_vehiculos(ciudad="Bogota")
+        assert repo_stub.llamadas == 3
+
+        invalidar_busquedas()
+        service.buscar_vehiculos(ciudad="Bogota")
+        assert repo_stub.llamadas == 4
+
+
+def test_catalogo_de_ciudades_con_etag(monkeypatch, test_client):
+    from app.api import vehicles as vehicles_module
+    from app.services.vehicle_service import VehicleService, invalidar_catalogo_ciudades
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.llamadas = 0
+
+        def listar_catalogo_ciudades(self):
+            self.llamadas += 1
+            return [{"nombre": "Bogota", "vehiculos_activos": 3}, {"nombre": "Cali", "vehiculos_activos": 0}]
+
+    repo_stub = VehicleRepoStub()
+    monkeypatch.setattr(vehicles_module, "vehicle_service", VehicleService(repository=repo_stub, reservation_repository=object()))
+
+    response = test_client.get("/api/vehicles/cities")
+    assert response.status_code == 200
+    assert response.get_json()["items"] == ["Bogota", "Cali"]
+    assert response.get_json()["ciudades"][0] == {"nombre": "Bogota", "vehiculos_activos": 3}
+    etag = response.headers["ETag"]
+
+    revalidacion = test_client.get("/api/vehicles/cities", headers={"If-None-Match": etag})
+    assert revalidacion.status_code == 304
+    assert repo_stub.llamadas == 1
+
+    with test_client.application.app_context():
+        invalidar_catalogo_ciudades()
+    assert test_client.get("/api/vehicles/cities", headers={"If-None-Match": etag}).status_code == 304
+    assert repo_stub.llamadas == 2
+
+
+def test_trie_de_ciudades_sugiere_por_palabra_sin_acentos():
+    from app.services.city_suggestions import CityTrie
+
+    trie = CityTrie(
+        [
+            {"nombre": "Santa Marta", "vehiculos_activos": 2},
+            {"nombre": "San Andrés", "vehiculos_activos": 5},
+            {"nombre": "Bogotá", "vehiculos_activos": 9},
+            {"nombre": "Medellin", "vehiculos_activos": 4},
+        ]
+    )
+
+    assert [c["nombre"] for c in trie.sugerir("sa")] == ["San Andrés", "Santa Marta"]
+    assert [c["nombre"] for c in trie.sugerir("MAR")] == ["Santa Marta"]
+    assert [c["nombre"] for c in trie.sugerir("bogota")] == ["Bogotá"]
+    assert [c["nombre"] for c in trie.sugerir("san andres")] == ["San Andrés"]
+    assert trie.sugerir("x") == []
+    assert trie.sugerir("") == []
+
+
+def test_sugerencias_de_ciudades_endpoint(monkeypatch, test_client):
+    from app.api import vehicles as vehicles_module
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.llamadas = 0
+
+        def listar_catalogo_ciudades(self):
+            self.llamadas += 1
+            return [{"nombre": "Cali", "vehiculos_activos": 1}, {"nombre": "Cartagena", "vehiculos_activos": 6}]
+
+    repo_stub = VehicleRepoStub()
+    monkeypatch.setattr(vehicles_module, "vehicle_service", VehicleService(repository=repo_stub, reservation_repository=object()))
+
+    for prefijo in ("c", "ca", "car"):
+        response = test_client.get(f"/api/vehicles/cities/suggest?q={prefijo}")
+        assert response.status_code == 200
+
+    assert [c["nombre"] for c in response.get_json()["items"]] == ["Cartagena"]
+    assert repo_stub.llamadas == 1
+
+
+def test_search_usa_location_key_normalizada():
+    from app.repositories import VehicleRepository
+
+    class Consulta:
+        def __init__(self):
+            self.filtros = []
+
+        def __getattr__(self, nombre):
+            def registrar(*args, **kwargs):
+                self.filtros.append((nombre, args))
+                return self
+
+            return registrar
+
+    consulta = Consulta()
+
+    class RepoPrueba(VehicleRepository):
+        def table(self):
+            return consulta
+
+    RepoPrueba().search(ciudad="  Bogotá ", limit=5)
+
+    assert ("like", ("location_key", "%bogota%")) in consulta.filtros
+
+
+def test_list_vehicles_proyeccion_resumen_por_defecto(monkeypatch, test_client):
+    from app.api import vehicles as vehicles_module
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.columnas = []
+
+        def search(self, **kwargs):
+            self.columnas.append(kwargs["columnas"])
+            fila = {
+                "id": "vehiculo-1",
+                "make": "Mazda",
+                "price_per_day": 90.0,
+                "description": "Descripcion larga",
+                "images": [{"url": "https://example.com/1.jpg"}],
+                "status": "activo",
+            }
+            return type("Resp", (), {"data": [fila], "count": 1})()
+
+    repo_stub = VehicleRepoStub()
+    monkeypatch.setattr(vehicles_module, "vehicle_service", VehicleService(repository=repo_stub, reservation_repository=object()))
+
+    resumen = test_client.get("/api/vehicles").get_json()["items"][0]
+    assert "images" not in resumen and "description" not in resumen
+    assert resumen["make"] == "Mazda"
+    assert "images" not in repo_stub.columnas[0].split(",")
+
+    elegidos = test_client.get("/api/vehicles?fields=make,images").get_json()["items"][0]
+    assert set(elegidos) == {"id", "price_per_day", "make", "images"}
+    assert repo_stub.columnas[1] == "id,price_per_day,make,images,updated_at"
+
+    completo = test_client.get("/api/vehicles?fields=all").get_json()["items"][0]
+    assert completo["description"] == "Descripcion larga"
+    assert repo_stub.columnas[2] == "*"
+
+    invalido = test_client.get("/api/vehicles?fields=password_hash")
+    assert invalido.status_code == 400
+
+
+def test_list_vehicles_reenvia_el_json_de_postgrest(monkeypatch, test_client):
+    import json
+
+    from app.api import vehicles as vehicles_module
+    from app.pagination import codificar_cursor
+    from app.repositories.base import RespuestaCruda
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def __init__(self):
+            self.llamada = None
+
+        def search(self, **kwargs):
+            self.llamada = kwargs
+            assert kwargs["crudo"] is True
+            filas = [{"id": "vehiculo-1", "price_per_day": 80.0}, {"id": "vehiculo-2", "price_per_day": 95.5}]
+            return RespuestaCruda(json.dumps(filas).encode("utf-8"), count=7)
+
+    repo_stub = VehicleRepoStub()
+    monkeypatch.setattr(vehicles_module, "vehicle_service", VehicleService(repository=repo_stub, reservation_repository=object()))
+    monkeypatch.setitem(test_client.application.config, "VEHICLE_LIST_PASSTHROUGH", True)
+
+    response = test_client.get("/api/vehicles?fields=all&limit=2")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["items"] == [{"id": "vehiculo-1", "price_per_day": 80.0}, {"id": "vehiculo-2", "price_per_day": 95.5}]
+    assert data["total"] == 7
+    assert data["next_cursor"] == codificar_cursor(95.5, "vehiculo-2")
+    # Sin proyeccion se piden las columnas del modelo, nunca "*".
+    assert repo_stub.llamada["columnas"] == ",".join(VehicleService.CAMPOS_VEHICULO)
+
+
+def test_detalle_y_listado_responden_304_sin_serializar(monkeypatch, test_client):
+    from app.api import vehicles as vehicles_module
+    from app.services.vehicle_service import VehicleService
+
+    class VehicleRepoStub:
+        def get_by_id(self, vehicle_id):
+            return {"id": vehicle_id, "status": "activo", "price_per_day": 70.0, "updated_at": "2025-05-01T10:00:00Z"}
+
+        def search(self, **kwargs):
+            return type("Resp", (), {"data": [{"id": "vehiculo-1", "price_per_day": 70.0, "status": "activo"}], "count": 1})()
+
+    monkeypatch.setattr(vehicles_module, "vehicle_service", VehicleService(repository=VehicleRepoStub(), reservation_repository=object()))
+
+    detalle = test_client.get("/api/vehicles/vehiculo-1")
+    listado = test_client.get("/api/vehicles")
+    assert detalle.status_code == listado.status_code == 200
+    assert "public" in detalle.headers["Cache-Control"] and "Accept-Encoding" in detalle.headers["Vary"]
+
+    def no_serializar(*args, **kwargs):
+        raise AssertionError("Un 304 no debe serializar el cuerpo.")
+
+    monkeypatch.setattr(vehicles_module, "serializar", no_serializar)
+    monkeypatch.setattr(vehicles_module, "serializar_lista", no_serializar)
+
+    for ruta, previa in (("/api/vehicles/vehiculo-1", detalle), ("/api/vehicles", listado)):
+        revalidacion = test_client.get(ruta, headers={"If-None-Match": previa.headers["ETag"]})
+        assert revalidacion.status_code == 304
+        assert revalidacion.headers["ETag"] == previa.headers["ETag"]
+        assert revalidacion.get_data() == b""
+
+
+def test_etag_del_listado_se_deriva_de_updated_at(monkeypatch):
+    from app.services import vehicle_service as vehicle_module
+    from app.services.vehicle_service import VehicleService
+
+    filas = [{"id": "vehiculo-1", "price_per_day": 70.0, "status": "activo", "updated_at": "2025-05-01T10:00:00Z"}]
+
+    class VehicleRepoStub:
+        def search(self, **kwargs):
+            return type("Resp", (), {"data": [dict(fila) for fila in filas], "count": 1})()
+
+    def no_serializar(*args, **kwargs):
+        raise AssertionError("El ETag no debe serializar la pagina.")
+
+    monkeypatch.setattr(vehicle_module, "serializar_lista", no_serializar)
+    service = VehicleService(repository=VehicleRepoStub(), reservation_repository=object())
+    app = create_app(TestConfig)
+
+    with app.app_context():
+        primera = service.buscar_vehiculos(campos=("make",))["etag"]
+        assert service.buscar_vehiculos(campos=("make",))["etag"] == primera
+        filas[0]["updated_at"] = "2025-05-02T10:00:00Z"
+        vehicle_module.invalidar_busquedas()
+        assert service.buscar_vehiculos(campos=("make",))["etag"] != primera